@@ -0,0 +1,460 @@
+"""
+Analysis server that keeps warm engines resident and answers position
+queries over a local TCP or Unix socket.
+
+Clients send one JSON request per line and receive JSON lines tagged with
+the id of the request: an "info" line for every completed iteration of the
+iterative deepening search, then one "bestmove" line (or an "error" line).
+
+    {"id": 1, "engine": "custom", "state": [7, 7, 4, "0000...", [2, 3],
+     [4, 4], "knight"], "time": 500, "depth": 12}
+
+    {"id": 1, "type": "info", "depth": 1, "move": [0, 2], "score": 2.0,
+     "nodes": 9, "time": 0.4}
+    ...
+    {"id": 1, "type": "bestmove", "move": [0, 2], "score": 1.5, "depth": 9,
+     "nodes": 48213, "time": 498.7, "cached": false}
+
+The position is given either as "state", a `Board.serialize()` encoding
+with the cells as a hex string (see `selfplay.encode_state`), or as
+"width", "height" and the list of "moves" played from the empty board. The
+side to move is analysed; "time" (milliseconds) and "depth" bound the
+search, and "engine" names a score function of `heuristics.SCORE_FUNCTIONS`
+used by an alpha-beta `CustomPlayer`.
+
+Engines are created once and reused by later requests, so a query pays
+neither the interpreter start-up nor the construction of the move tables
+of the board size. The deepest completed result of every analysed position
+is kept in a bounded cache: a request that asks for no more depth than the
+cached result is answered at once, and a deeper request resumes iterative
+deepening after the cached depth with the cached best move searched first.
+
+Requests run in a bounded pool of worker threads (each with engines of its
+own), and requests on one connection are answered concurrently. A request
+is cancelled when its client disconnects.
+
+    python analysis_server.py serve --port 8765 --workers 2
+    python analysis_server.py serve --unix /tmp/isolation.sock
+    python analysis_server.py query --port 8765 --moves 2,3 4,4 --time 500
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import timeit
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from isolation import Board
+from isolation.rules import get_rules
+from game_agent import CustomPlayer
+from game_agent import Timeout
+from heuristics import SCORE_FUNCTIONS
+
+import selfplay
+
+
+DEFAULT_ENGINE = "custom"
+DEFAULT_TIME = 1000.
+CACHE_SIZE = 10000
+MAX_SIZE = 100
+
+# Stand-in for the opponent of the engine on the analysed boards
+OPPONENT = "opponent"
+
+
+def make_engine(name):
+    """ Return a new alpha-beta engine using the named score function. """
+    return CustomPlayer(score_fn=SCORE_FUNCTIONS[name], method="alphabeta",
+                        adaptive_time=False)
+
+
+def _check_size(width, height):
+    for name, value in (("width", width), ("height", height)):
+        if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= MAX_SIZE:
+            raise ValueError("{} must be an integer from 1 to {}".format(name, MAX_SIZE))
+
+
+def check_state(state):
+    """Raise ValueError unless `state` is a consistent `Board.serialize()`
+    encoding: the board size, move count, cells, rules and the locations
+    of both players must agree.
+    """
+    width, height, move_count, cells, loc1, loc2 = state[:6]
+    _check_size(width, height)
+    if len(cells) != width * height:
+        raise ValueError("cells must have {} values, not {}".format(width * height,
+                                                                   len(cells)))
+    if any(value not in (Board.BLANK, 1, 2) for value in cells):
+        raise ValueError("cells must be 0 (blank), 1 or 2")
+    if not isinstance(move_count, int) or \
+            move_count != sum(1 for value in cells if value != Board.BLANK):
+        raise ValueError("move_count must be the number of blocked cells")
+    for symbol, loc in ((1, loc1), (2, loc2)):
+        if loc is None:
+            if move_count >= symbol:
+                raise ValueError("player {} must have a location".format(symbol))
+            continue
+        if len(loc) != 2 or not all(isinstance(x, int) for x in loc) or \
+                not (0 <= loc[0] < height and 0 <= loc[1] < width) or \
+                cells[loc[0] * width + loc[1]] != symbol:
+            raise ValueError("invalid location of player {}: {}".format(symbol, list(loc)))
+    if len(state) > 6:
+        get_rules(state[6])
+
+
+def parse_position(request):
+    """Return the serialized state of the position in a request (see the
+    module documentation); raises ValueError for malformed positions.
+    """
+    if "state" in request:
+        try:
+            state = selfplay.decode_state(request["state"])
+            check_state(state)
+        except (TypeError, ValueError, IndexError, KeyError) as e:
+            raise ValueError("invalid state: {}".format(e))
+        return state
+    _check_size(request.get("width", 7), request.get("height", 7))
+    game = Board(1, 2, request.get("width", 7), request.get("height", 7))
+    for move in request.get("moves", []):
+        move = tuple(move)
+        if move not in game.get_legal_moves():
+            raise ValueError("illegal move: {}".format(list(move)))
+        game.apply_move(move)
+    return game.serialize()
+
+
+class AnalysisCache(object):
+    """Bounded LRU cache of the deepest completed result for every
+    (engine, position) pair.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The maximum number of positions kept.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ Return the cached (depth, move, score) of `key`, or None. """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, depth, move, score):
+        """ Keep the result of `key` unless a deeper one is cached. """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < depth:
+                self._entries[key] = (depth, move, score)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+class EngineSet(object):
+    """Warm engines checked out by the worker threads.
+
+    Engines are created on first use and returned to a free list after
+    every request, so there are at most as many engines of each kind as
+    worker threads.
+    """
+
+    def __init__(self):
+        self._free = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, name):
+        if name not in SCORE_FUNCTIONS:
+            raise ValueError("unknown engine: {!r}".format(name))
+        with self._lock:
+            free = self._free.setdefault(name, [])
+            if free:
+                return free.pop()
+        return make_engine(name)
+
+    def release(self, name, engine):
+        with self._lock:
+            self._free[name].append(engine)
+
+
+def analyse(engine, state, time_limit, max_depth=None, cached=None, stop=None, emit=None):
+    """Run an iterative deepening search of `state` for the side to move.
+
+    Parameters
+    ----------
+    engine : `game_agent.CustomPlayer`
+        An alpha-beta engine.
+
+    state : tuple
+        The position, encoded by `Board.serialize()`.
+
+    time_limit : float
+        The time budget in milliseconds.
+
+    max_depth : int (optional)
+        The deepest iteration; the search also stops when the result is
+        proven or when every cell would be filled.
+
+    cached : (int, (int, int), float) (optional)
+        A completed (depth, move, score) for the position; the search
+        resumes after that depth and searches that move first.
+
+    stop : `threading.Event` (optional)
+        Cancels the search when set.
+
+    emit : callable (optional)
+        Called with a dict for every completed iteration.
+
+    Returns
+    ----------
+    dict
+        The best move, its score, the depth of the deepest completed
+        iteration, the number of nodes and the elapsed time (ms).
+    """
+    start = timeit.default_timer()
+    elapsed = lambda: 1000 * (timeit.default_timer() - start)
+    if stop is None:
+        engine.time_left = lambda: time_limit - elapsed()
+    else:
+        engine.time_left = lambda: float("-inf") if stop.is_set() else time_limit - elapsed()
+
+    if state[2] % 2:
+        game = Board.deserialize(state, OPPONENT, engine)
+    else:
+        game = Board.deserialize(state, engine, OPPONENT)
+    limit = game.width * game.height - game.move_count
+    if max_depth is not None:
+        limit = min(limit, max_depth)
+
+    engine.nodes = 0
+    engine.root_results = {}
+    depth, move, score = 0, (-1, -1), float("-inf")
+    if cached is not None:
+        depth, move, score = cached
+    legal_moves = game.get_legal_moves()
+    if move == (-1, -1) and legal_moves:
+        move = legal_moves[0]
+
+    try:
+        # stop once the result is proven
+        while depth < limit and legal_moves and not (depth and abs(score) == float("inf")):
+            score, move = engine.search_root(game, depth + 1, move)
+            depth += 1
+            if emit is not None:
+                emit({"type": "info", "depth": depth, "move": move, "score": score,
+                      "nodes": engine.nodes, "time": elapsed()})
+    except Timeout:
+        pass
+    return {"move": move if legal_moves else (-1, -1), "score": score, "depth": depth,
+            "nodes": engine.nodes, "time": elapsed()}
+
+
+def _json_value(value):
+    if isinstance(value, float) and abs(value) == float("inf"):
+        return 1e9 if value > 0 else -1e9
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+class AnalysisServer(object):
+    """Asyncio server answering analysis requests with warm engines.
+
+    Parameters
+    ----------
+    workers : int (optional)
+        The number of requests searched at the same time; further requests
+        wait for a free worker.
+
+    cache_size : int (optional)
+        The number of positions kept in the analysis cache.
+    """
+
+    def __init__(self, workers=2, cache_size=CACHE_SIZE):
+        self.workers = workers
+        self.cache = AnalysisCache(cache_size)
+        self.engines = EngineSet()
+        self.requests = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._server = None
+
+    def _run(self, request, stop, emit):
+        """ Answer one request in a worker thread. """
+        name = request.get("engine", DEFAULT_ENGINE)
+        state = parse_position(request)
+        max_depth = request.get("depth")
+        key = (name, state)
+        cached = self.cache.get(key)
+        if cached is not None and (abs(cached[2]) == float("inf") or
+                                   max_depth is not None and cached[0] >= max_depth):
+            depth, move, score = cached
+            return {"move": move, "score": score, "depth": depth, "nodes": 0,
+                    "time": 0., "cached": True}
+
+        engine = self.engines.acquire(name)
+        try:
+            result = analyse(engine, state, float(request.get("time", DEFAULT_TIME)),
+                             max_depth, cached, stop, emit)
+        finally:
+            self.engines.release(name, engine)
+        if result["depth"] > 0:
+            self.cache.put(key, result["depth"], result["move"], result["score"])
+        result["cached"] = False
+        return result
+
+    async def _answer(self, request, writer, stop):
+        loop = asyncio.get_running_loop()
+
+        def send(message):
+            message = dict((k, _json_value(v)) for k, v in message.items())
+            message["id"] = request.get("id")
+            if not writer.is_closing():
+                writer.write((json.dumps(message) + "\n").encode())
+
+        emit = lambda message: loop.call_soon_threadsafe(send, message)
+        try:
+            result = await loop.run_in_executor(self._executor, self._run, request, stop, emit)
+        except (ValueError, TypeError, KeyError) as e:
+            send({"type": "error", "message": str(e)})
+        except Exception as e:
+            # every request gets a reply, whatever went wrong
+            send({"type": "error", "message": "{}: {}".format(type(e).__name__, e)})
+        else:
+            send(dict(result, type="bestmove"))
+        if not writer.is_closing():
+            await writer.drain()
+
+    async def handle(self, reader, writer):
+        """ Serve the requests of one connection. """
+        stop = threading.Event()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    writer.write((json.dumps({"type": "error", "message": str(e)}) +
+                                  "\n").encode())
+                    continue
+                self.requests += 1
+                task = asyncio.ensure_future(self._answer(request, writer, stop))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            # cancel the searches of a client that went away
+            stop.set()
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        """Start listening on a TCP port, or on the Unix socket `path`, and
+        return the bound address.
+        """
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self.handle, path)
+            return path
+        self._server = await asyncio.start_server(self.handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+
+
+def query(address, request, timeout=None):
+    """Send one request to a server and return the list of replies, the last
+    of which is the "bestmove" (or "error") line. `address` is a (host,
+    port) pair or the path of a Unix socket.
+    """
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    with sock:
+        sock.connect(address)
+        sock.sendall((json.dumps(request) + "\n").encode())
+        replies = []
+        with sock.makefile("r") as stream:
+            for line in stream:
+                replies.append(json.loads(line))
+                if replies[-1]["type"] != "info":
+                    break
+        return replies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm-engine analysis server.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    for name in ("serve", "query"):
+        sub = subparsers.add_parser(name)
+        sub.add_argument("--host", default="127.0.0.1")
+        sub.add_argument("--port", type=int, default=8765)
+        sub.add_argument("--unix", help="path of a Unix socket instead of TCP")
+        if name == "serve":
+            sub.add_argument("--workers", type=int, default=2)
+            sub.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+        else:
+            sub.add_argument("--engine", default=DEFAULT_ENGINE, choices=list(SCORE_FUNCTIONS))
+            sub.add_argument("--size", type=int, default=7)
+            sub.add_argument("--moves", nargs="*", default=[],
+                             help="moves from the empty board as row,col")
+            sub.add_argument("--time", type=float, default=DEFAULT_TIME)
+            sub.add_argument("--depth", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "query":
+        request = {"id": 1, "engine": args.engine, "width": args.size,
+                   "height": args.size, "time": args.time, "depth": args.depth,
+                   "moves": [[int(x) for x in m.split(",")] for m in args.moves]}
+        for reply in query(args.unix or (args.host, args.port), request):
+            print(json.dumps(reply))
+        return
+
+    async def serve():
+        server = AnalysisServer(args.workers, args.cache_size)
+        address = await server.start(args.host, args.port, args.unix)
+        print("listening on {}".format(address))
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
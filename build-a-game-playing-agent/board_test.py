@@ -0,0 +1,256 @@
+"""
+This file contains test cases for the `isolation` package: board encoding,
+worker process play and move generation.
+"""
+import gzip
+import os
+import random
+import tempfile
+import time
+import unittest
+
+import adjudication
+import isolation
+import perft
+import selfplay
+
+from isolation.rules import KING
+from isolation.rules import QUEEN
+from isolation.workers import ProcessPlayer
+from sample_players import GreedyPlayer
+from sample_players import RandomPlayer
+
+
+class HungPlayer(object):
+    """Player that never returns a move."""
+
+    def get_move(self, game, legal_moves, time_left):
+        while True:
+            time.sleep(1)
+
+
+class SerializeTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        """ A deserialized board encodes the same game state """
+        board = isolation.Board("p1", "p2", 6, 5)
+        for move in [(1, 2), (3, 3), (3, 1), (4, 5), (1, 0)]:
+            board.apply_move(move)
+        copy = isolation.Board.deserialize(board.serialize(), "p1", "p2")
+
+        self.assertEqual(copy.serialize(), board.serialize())
+        self.assertEqual(copy.active_player, board.active_player)
+        self.assertEqual(copy.get_legal_moves(), board.get_legal_moves())
+        self.assertEqual(copy.print_board(), board.print_board())
+
+    def test_empty_board(self):
+        """ Boards before the first moves can be encoded """
+        board = isolation.Board("p1", "p2")
+        copy = isolation.Board.deserialize(board.serialize(), "p1", "p2")
+        self.assertEqual(copy.active_player, "p1")
+        self.assertEqual(len(copy.get_legal_moves()), 49)
+
+
+class ProcessPlayerTest(unittest.TestCase):
+
+    def test_play_game(self):
+        """ Agents in worker processes play a complete game """
+        player_1 = ProcessPlayer(GreedyPlayer())
+        player_2 = ProcessPlayer(RandomPlayer())
+        try:
+            winner, history, termination = isolation.Board(
+                player_1, player_2, 5, 5).play(time_limit=1000)
+        finally:
+            player_1.close()
+            player_2.close()
+
+        self.assertIn(winner, (player_1, player_2))
+        self.assertEqual(termination, "illegal move")
+        self.assertEqual(len(player_1.stats), len(history))
+        self.assertTrue(all(s.cpu_ms is not None and not s.timeout
+                            for s in player_1.stats))
+
+    def test_hung_agent_times_out(self):
+        """ A hung agent is stopped at its deadline and loses on time """
+        player_1 = ProcessPlayer(HungPlayer())
+        player_2 = ProcessPlayer(RandomPlayer())
+        start = time.time()
+        try:
+            winner, _, termination = isolation.Board(
+                player_1, player_2).play(time_limit=100)
+        finally:
+            player_1.close()
+            player_2.close()
+
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(winner, player_2)
+        self.assertEqual(termination, "timeout")
+        self.assertTrue(player_1.stats[-1].timeout)
+        self.assertIsNone(player_1._process)
+
+
+class PerftTest(unittest.TestCase):
+
+    def test_reference_counts(self):
+        """ Every counting path reproduces the reference leaf counts """
+        positions = [p for p in perft.POSITIONS if p.name in perft.QUICK]
+        report = perft.run(positions)
+        failed = [(r["position"], r["path"], r["nodes"]) for r in report["results"]
+                  if not r["ok"]]
+        self.assertEqual(failed, [])
+
+
+class SelfPlayTest(unittest.TestCase):
+
+    def test_shards_are_deterministic(self):
+        """ Shards depend on the seed only, and resuming fills missing ones """
+        root = tempfile.mkdtemp()
+        args = (["mm3_open", "random"], 7, 2)
+        first = selfplay.generate(os.path.join(root, "a"), 3, *args, processes=1)
+        second = selfplay.generate(os.path.join(root, "b"), 5, *args, processes=2)
+        resumed = selfplay.generate(os.path.join(root, "a"), 5, *args, processes=1)
+
+        self.assertEqual((first["shards"], second["shards"], resumed["shards"]), (2, 3, 2))
+        for name in sorted(os.listdir(os.path.join(root, "b"))):
+            if name.endswith(".gz"):
+                with gzip.open(os.path.join(root, "a", name)) as a, \
+                        gzip.open(os.path.join(root, "b", name)) as b:
+                    self.assertEqual(a.read(), b.read())
+
+        positions = list(selfplay.load_positions([os.path.join(root, "a")]))
+        self.assertEqual(len(positions), second["positions"])
+        game, player, record = positions[0]
+        self.assertEqual(game.active_player, player)
+        self.assertIn(record["result"], (1, -1))
+
+    def test_fixed_depth_agents_ignore_time_limit(self):
+        """ Agents that do not use the clock play the same game under any limit """
+        games = []
+        for time_limit in (50., 0.):
+            random.seed(1)
+            games.append(selfplay.play_game(selfplay.AGENTS["ab5_improved"](),
+                                            selfplay.AGENTS["random"](), random.Random(2),
+                                            time_limit))
+        self.assertEqual(games[0], games[1])
+        self.assertFalse(selfplay.uses_clock(selfplay.AGENTS["ab5_improved"]()))
+        self.assertTrue(selfplay.uses_clock(selfplay.AGENTS["id_improved"]()))
+
+
+def slide_moves(board, loc, directions):
+    """Generate the moves of a slider by walking every direction."""
+    moves = []
+    for dr, dc in directions:
+        r, c = loc[0] + dr, loc[1] + dc
+        while board.move_is_legal((r, c)):
+            moves.append((r, c))
+            r, c = r + dr, c + dc
+    return moves
+
+
+class RulesTest(unittest.TestCase):
+
+    def random_game(self, rules, seed, width=9, height=7):
+        rng = random.Random(seed)
+        board = isolation.Board("p1", "p2", width, height, rules=rules)
+        for _ in range(rng.randint(2, 30)):
+            moves = board.get_legal_moves()
+            if not moves:
+                break
+            board.apply_move(rng.choice(moves))
+        return board
+
+    def test_queen_moves(self):
+        """ Queen moves stop at the edge and at the first blocked cell """
+        for seed in range(30):
+            board = self.random_game(QUEEN, seed)
+            for player in ("p1", "p2"):
+                loc = board.get_player_location(player)
+                self.assertEqual(sorted(board.get_legal_moves(player)),
+                                 sorted(slide_moves(board, loc, QUEEN.rays)))
+
+    def test_king_moves(self):
+        """ King moves reach the free neighbouring cells """
+        board = self.random_game(KING, 1)
+        loc = board.get_player_location(board.active_player)
+        expected = [(loc[0] + dr, loc[1] + dc) for dr, dc in KING.steps
+                    if board.move_is_legal((loc[0] + dr, loc[1] + dc))]
+        self.assertEqual(board.get_legal_moves(), expected)
+
+    def test_rules_are_serialized(self):
+        """ Copies and decoded boards keep the movement rule """
+        board = self.random_game(QUEEN, 3)
+        copy = isolation.Board.deserialize(board.serialize(), "p1", "p2")
+        self.assertIs(copy.rules, QUEEN)
+        self.assertIs(board.copy().rules, QUEEN)
+        self.assertEqual(copy.get_legal_moves(), board.get_legal_moves())
+        # encodings without the rule name are knight boards
+        old = isolation.Board.deserialize(board.serialize()[:6], "p1", "p2")
+        self.assertEqual(old.rules.name, "knight")
+
+
+class LargeBoardTest(unittest.TestCase):
+
+    def test_queen_moves_beyond_64_cells(self):
+        """ Slider moves are exact on boards with more than 64 cells """
+        board = RulesTest().random_game(QUEEN, 5, 31, 31)
+        loc = board.get_player_location(board.active_player)
+        self.assertEqual(sorted(board.get_legal_moves()),
+                         sorted(slide_moves(board, loc, QUEEN.rays)))
+
+    def test_blank_spaces_in_opening(self):
+        """ The cached blank cells match the board during the first moves """
+        board = isolation.Board("p1", "p2", 15, 15)
+        self.assertEqual(len(board.get_legal_moves()), 225)
+        child = board.forecast_move((3, 4))
+        blanks = child.get_legal_moves()
+        self.assertEqual(len(blanks), 224)
+        self.assertNotIn((3, 4), blanks)
+        grandchild = child.forecast_move(blanks[0])
+        self.assertEqual(grandchild.get_blank_spaces(),
+                         [(i, j) for j in range(15) for i in range(15)
+                          if (i, j) not in ((3, 4), blanks[0])])
+        self.assertEqual(len(board.get_blank_spaces()), 225)
+
+
+def mover_wins(board):
+    """ Solve a position by brute force. """
+    return any(not mover_wins(board.forecast_move(m)) for m in board.get_legal_moves())
+
+
+class AdjudicationTest(unittest.TestCase):
+
+    def test_adjudicated_results_are_exact(self):
+        """ Proven results on small boards match a brute-force solve """
+        rng = random.Random(3)
+        partitions = 0
+        for _ in range(20):
+            board = isolation.Board("p1", "p2", 5, 5)
+            adjudicator = adjudication.Adjudicator(max_blanks=12)
+            while board.get_legal_moves():
+                if board.move_count >= 8:
+                    winner = adjudicator(board)
+                    if winner is not None:
+                        self.assertEqual(winner == board.active_player, mover_wins(board))
+                        break
+                board.apply_move(rng.choice(board.get_legal_moves()))
+            partitions += adjudicator.partitions
+        self.assertGreater(partitions, 0)
+
+    def test_play_ends_adjudicated_games(self):
+        """ Board.play ends the game with the winner chosen by the hook """
+        board = isolation.Board(RandomPlayer(), RandomPlayer())
+        calls = []
+
+        def adjudicate(game):
+            calls.append(game.move_count)
+            return game.inactive_player if len(calls) == 5 else None
+
+        winner, history, termination = board.play(adjudicate=adjudicate)
+        self.assertEqual(termination, "adjudicated")
+        self.assertEqual(calls, [0, 1, 2, 3, 4])
+        self.assertIs(winner, board.inactive_player)
+        self.assertEqual(sum(len(turn) for turn in history), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,337 @@
+"""
+Distributed tournaments over a local TCP job queue.
+
+A coordinator serves match jobs to worker processes on any number of
+machines and collects their results. A job is one call of
+`tournament.play_match` between two agents of `selfplay.AGENTS`:
+
+    {"id": 12, "agents": ["ab5_improved", "mm3_open"], "opening": [[2, 3], [4, 4]],
+     "seed": 12}
+
+The worker seeds the random number generator with the seed of the job,
+builds both agents, plays the match and reports the wins of both agents.
+Matches between agents that do not use the clock (see
+`selfplay.uses_clock`: the fixed-depth "mm*" and "ab*" agents, the random
+and greedy agents) are played without a deadline, so these jobs give the
+same result on any worker and in the serial runner (`run_serial`). Matches
+with an iterative deepening agent are played under the tournament time
+limit and depend on the load of the worker.
+
+The protocol is one JSON object per line. A worker asks for a job with
+{"type": "request"} and reports {"type": "result", "id": ..., "wins":
+[w1, w2]}; the coordinator answers a request with {"type": "job", ...},
+{"type": "wait", "seconds": ...} while all remaining jobs are leased, or
+{"type": "done"}. A job leased to a worker returns to the queue when the
+worker disconnects or its lease expires, and results are idempotent: the
+first result of every job is kept and later ones are ignored.
+
+    python distributed.py coordinator --agents ab5_improved mm3_open random \\
+        --matches 10 --port 9100 --output results.json
+    python distributed.py worker --host coordinator-host --port 9100
+"""
+
+import argparse
+import itertools
+import json
+import random
+import socket
+import socketserver
+import threading
+import time
+import timeit
+
+import openings
+import selfplay
+import tournament
+
+
+LEASE = 600.
+WAIT = 0.5
+LINGER = 10.
+
+
+def make_jobs(agents, matches, seed=0, suite=None):
+    """Return the jobs of a tournament where every pair of agents plays
+    `matches` matches in both orders; match k of every pairing is seeded
+    with `seed` + k and starts from opening k of `suite`, if any.
+    """
+    jobs = []
+    for a, b in itertools.permutations(agents, 2):
+        for k in range(matches):
+            opening = [list(m) for m in suite[k % len(suite)].moves] if suite else None
+            jobs.append({"id": len(jobs), "agents": [a, b], "opening": opening,
+                         "seed": seed + k})
+    return jobs
+
+
+def play_job(job):
+    """ Play the match of a job and return the wins of both agents. """
+    random.seed(job["seed"])
+    players = [selfplay.AGENTS[name]() for name in job["agents"]]
+    opening = job.get("opening")
+    time_limit = tournament.TIME_LIMIT if any(selfplay.uses_clock(p) for p in players) \
+        else float("inf")
+    wins = tournament.play_match(players[0], players[1],
+                                 opening=[tuple(m) for m in opening] if opening else None,
+                                 time_limit=time_limit)
+    return list(wins)
+
+
+def run_serial(jobs):
+    """ Play the jobs in this process and return the results by job id. """
+    return dict((job["id"], play_job(job)) for job in jobs)
+
+
+def aggregate(jobs, results):
+    """Return the total wins of every ordered pair of agents, as a dict
+    {(agent_1, agent_2): [wins_1, wins_2]} with the pair in job order.
+    """
+    totals = {}
+    for job in jobs:
+        wins = totals.setdefault(tuple(job["agents"]), [0, 0])
+        wins[0] += results[job["id"]][0]
+        wins[1] += results[job["id"]][1]
+    return totals
+
+
+class JobQueue(object):
+    """Thread-safe queue of jobs with leases and idempotent results.
+
+    Parameters
+    ----------
+    jobs : list<dict>
+        The jobs, each with a unique "id".
+
+    lease : float (optional)
+        Seconds after which a job handed out without a result is handed
+        out again.
+    """
+
+    def __init__(self, jobs, lease=LEASE):
+        self.jobs = dict((job["id"], job) for job in jobs)
+        self.lease = lease
+        self.results = {}
+        self.retries = 0
+        self._pending = [job["id"] for job in jobs]
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not jobs:
+            self._done.set()
+
+    def acquire(self, owner):
+        """Lease the next job to `owner`; return the job, None if all jobs
+        have a result, or "wait" if the remaining jobs are all leased.
+        """
+        with self._lock:
+            now = time.monotonic()
+            for job_id, (_, expires) in list(self._leases.items()):
+                if expires < now:
+                    del self._leases[job_id]
+                    self._requeue(job_id)
+            while self._pending:
+                job_id = self._pending.pop(0)
+                if job_id not in self.results:
+                    self._leases[job_id] = (owner, now + self.lease)
+                    return self.jobs[job_id]
+            return None if len(self.results) == len(self.jobs) else "wait"
+
+    def _requeue(self, job_id):
+        if job_id not in self.results and job_id not in self._pending:
+            self._pending.insert(0, job_id)
+            self.retries += 1
+
+    def release(self, owner):
+        """ Return the jobs leased to `owner` (e.g., a dead worker) to the queue. """
+        with self._lock:
+            for job_id, (lessee, _) in list(self._leases.items()):
+                if lessee == owner:
+                    del self._leases[job_id]
+                    self._requeue(job_id)
+
+    def complete(self, job_id, result):
+        """ Record the result of a job; only the first result is kept. """
+        with self._lock:
+            if job_id not in self.jobs or job_id in self.results:
+                return
+            self.results[job_id] = result
+            self._leases.pop(job_id, None)
+            if len(self.results) == len(self.jobs):
+                self._done.set()
+
+    def wait(self, timeout=None):
+        """ Wait until every job has a result; return False on timeout. """
+        return self._done.wait(timeout)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        queue = self.server.queue
+        owner = object()
+        with self.server.connected:
+            self.server.connections += 1
+        try:
+            for line in self.rfile:
+                message = json.loads(line.decode())
+                if message.get("type") == "result":
+                    queue.complete(message["id"], message["wins"])
+                    continue
+                job = queue.acquire(owner)
+                if job is None:
+                    reply = {"type": "done"}
+                elif job == "wait":
+                    reply = {"type": "wait", "seconds": WAIT}
+                else:
+                    reply = dict(job, type="job")
+                self.wfile.write((json.dumps(reply) + "\n").encode())
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            queue.release(owner)
+            with self.server.connected:
+                self.server.connections -= 1
+                self.server.connected.notify_all()
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Coordinator(object):
+    """Serve the jobs of a `JobQueue` to workers over TCP.
+
+    Parameters
+    ----------
+    jobs : list<dict>
+        The jobs, see `make_jobs`.
+
+    host, port : str, int (optional)
+        The address to listen on; port 0 picks a free port.
+
+    lease : float (optional)
+        Seconds after which a job without a result is handed out again.
+    """
+
+    def __init__(self, jobs, host="127.0.0.1", port=0, lease=LEASE):
+        self.queue = JobQueue(jobs, lease)
+        self._server = _Server((host, port), _Handler)
+        self._server.queue = self.queue
+        self._server.connections = 0
+        self._server.connected = threading.Condition()
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def start(self):
+        """ Serve in a background thread and return the bound address. """
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self.address
+
+    def wait(self, timeout=None):
+        """ Wait for all the results and return them by job id. """
+        if not self.queue.wait(timeout):
+            raise RuntimeError("{} of {} jobs completed".format(len(self.queue.results),
+                                                                 len(self.queue.jobs)))
+        return dict(self.queue.results)
+
+    def close(self, linger=0.):
+        """ Stop serving, after waiting up to `linger` seconds for the
+        connected workers to ask for a job and be told that all are done.
+        """
+        with self._server.connected:
+            self._server.connected.wait_for(lambda: not self._server.connections, linger)
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def run_worker(address, max_jobs=None, retry=5.):
+    """Connect to a coordinator and play its jobs until there are none
+    left (or `max_jobs` were played), reconnecting for up to `retry`
+    seconds if the connection fails. Returns the number of jobs played.
+    """
+    played = 0
+    deadline = timeit.default_timer() + retry
+    while max_jobs is None or played < max_jobs:
+        try:
+            with socket.create_connection(address) as sock, sock.makefile("rw") as stream:
+                deadline = timeit.default_timer() + retry
+                while max_jobs is None or played < max_jobs:
+                    stream.write(json.dumps({"type": "request"}) + "\n")
+                    stream.flush()
+                    line = stream.readline()
+                    if not line:
+                        raise ConnectionError("coordinator closed the connection")
+                    reply = json.loads(line)
+                    if reply["type"] == "done":
+                        return played
+                    if reply["type"] == "wait":
+                        time.sleep(reply["seconds"])
+                        continue
+                    wins = play_job(reply)
+                    stream.write(json.dumps({"type": "result", "id": reply["id"],
+                                             "wins": wins}) + "\n")
+                    stream.flush()
+                    played += 1
+        except OSError:
+            if timeit.default_timer() > deadline:
+                raise
+            time.sleep(WAIT)
+    return played
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed tournament over TCP.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    for name in ("coordinator", "worker", "serial"):
+        sub = subparsers.add_parser(name)
+        if name != "serial":
+            sub.add_argument("--host", default="127.0.0.1")
+            sub.add_argument("--port", type=int, default=9100)
+        if name != "worker":
+            sub.add_argument("--agents", nargs="+", choices=sorted(selfplay.AGENTS),
+                             default=["ab5_improved", "mm3_improved", "random"])
+            sub.add_argument("--matches", type=int, default=10,
+                             help="matches of every ordered pair")
+            sub.add_argument("--seed", type=int, default=0)
+            sub.add_argument("--openings", help="file of openings generated by openings.py")
+            sub.add_argument("--output", help="write the results as JSON to this file")
+        else:
+            sub.add_argument("--max-jobs", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        played = run_worker((args.host, args.port), args.max_jobs)
+        print("played {} jobs".format(played))
+        return
+
+    suite = openings.load(args.openings) if args.openings else None
+    jobs = make_jobs(args.agents, args.matches, args.seed, suite)
+    if args.command == "serial":
+        results = run_serial(jobs)
+    else:
+        coordinator = Coordinator(jobs, args.host, args.port)
+        print("serving {} jobs on {}:{}".format(len(jobs), *coordinator.start()))
+        try:
+            results = coordinator.wait()
+        finally:
+            coordinator.close(linger=LINGER)
+        print("{} retries".format(coordinator.queue.retries))
+
+    totals = aggregate(jobs, results)
+    for (a, b), (wins_a, wins_b) in sorted(totals.items()):
+        print("{:<15} {:<15} {:>4} {:>4}".format(a, b, wins_a, wins_b))
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump({"jobs": jobs, "results": [results[job["id"]] for job in jobs]},
+                      stream)
+
+
+if __name__ == "__main__":
+    main()
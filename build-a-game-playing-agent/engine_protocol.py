@@ -0,0 +1,371 @@
+"""
+Line-based protocol to run Isolation agents as persistent engine processes,
+similar in spirit to UCI.
+
+The controller writes commands to the standard input of the engine and reads
+its answers from the standard output, one command per line:
+
+    isolation           engine answers "id name <name>" then "isolationok"
+    isready             engine answers "readyok"
+    newgame             the next position starts a new game
+    position <width> <height> <rules> <move_count> <cells> <loc1> <loc2>
+                        set the position to search; <cells> is the hex
+                        encoding of the cells of `Board.serialize()`, and the
+                        player locations are "row,col" or "-" if unplaced
+    go movetime <ms>    search the position for the side to move; the engine
+                        answers any number of "info" lines and one "bestmove"
+    stop                end the current search; "bestmove" follows at once
+    quit                exit
+
+    info depth <d> score <s> nodes <n> time <ms> move <row,col>
+    bestmove <row,col>  or "bestmove none" without legal moves
+
+The engine side is `EngineServer`, which exposes any player with a
+`get_move()` method and reports the iterations of `CustomPlayer` searches as
+info lines. Running this file starts a server for a `CustomPlayer` built
+from the command line. The controller side is `EnginePlayer`, a player that
+`Board.play` and `tournament.py` use like any in-process agent:
+
+    player_1 = EnginePlayer(engine_command("--score", "custom"))
+    player_2 = EnginePlayer(engine_command("--score", "improved"))
+    winner, history, termination = Board(player_1, player_2).play()
+    player_1.close()
+    player_2.close()
+
+Every engine runs in its own interpreter, started once and reused for every
+game, so engines do not compete for one GIL.
+"""
+
+import argparse
+import os
+import queue
+import subprocess
+import sys
+import threading
+import timeit
+
+from isolation import Board
+from game_agent import CustomPlayer
+from heuristics import SCORE_FUNCTIONS
+
+
+# Stand-in for the opponent of the engine on the boards rebuilt by the server
+OPPONENT = "opponent"
+
+# Milliseconds allowed after the deadline for the engine to answer "stop"
+STOP_TIMEOUT = 50.
+
+
+def format_position(state):
+    """ Return the "position" command for a `Board.serialize()` encoding. """
+    width, height, move_count, cells, loc1, loc2, rules = state
+    return "position {} {} {} {} {} {} {}".format(
+        width, height, rules, move_count, cells.hex(),
+        format_move(loc1, "-"), format_move(loc2, "-"))
+
+
+def parse_position(tokens):
+    """ Return the `Board.serialize()` encoding of a "position" command. """
+    if len(tokens) != 8 or tokens[0] != "position":
+        raise ValueError("malformed position: {}".format(" ".join(tokens)))
+    width, height, rules, move_count, cells, loc1, loc2 = tokens[1:]
+    return (int(width), int(height), int(move_count), bytes.fromhex(cells),
+            parse_move(loc1), parse_move(loc2), rules)
+
+
+def format_move(move, empty="none"):
+    if move is None or tuple(move) == Board.NOT_MOVED:
+        return empty
+    return "{},{}".format(*move)
+
+
+def parse_move(token):
+    if token in ("none", "-"):
+        return None
+    row, col = token.split(",")
+    return int(row), int(col)
+
+
+class EngineServer(object):
+    """Serve the engine protocol for a player.
+
+    Parameters
+    ----------
+    player : object
+        An object with a get_move() function. If it has an `info` attribute
+        (as `CustomPlayer` does) it is set to report the completed search
+        iterations as info lines.
+
+    name : str (optional)
+        The name reported to the controller.
+    """
+
+    def __init__(self, player, name=None):
+        self.player = player
+        self.name = name or type(player).__name__
+        self.state = None
+        self._output = None
+        self._lock = threading.Lock()
+        self._search = None
+        self._stop = threading.Event()
+
+    def send(self, line):
+        with self._lock:
+            self._output.write(line + "\n")
+            self._output.flush()
+
+    def run(self, input=sys.stdin, output=sys.stdout):
+        """ Answer the commands read from `input` until "quit" or EOF. """
+        self._output = output
+        for line in input:
+            tokens = line.split()
+            if not tokens:
+                continue
+            command = tokens[0]
+            if command == "quit":
+                break
+            elif command == "isolation":
+                self.send("id name {}".format(self.name))
+                self.send("isolationok")
+            elif command == "isready":
+                self.send("readyok")
+            elif command == "newgame":
+                self.stop()
+                self.state = None
+            elif command == "position":
+                self.stop()
+                try:
+                    self.state = parse_position(tokens)
+                except ValueError as e:
+                    self.send("info string {}".format(e))
+            elif command == "go":
+                self.go(tokens)
+            elif command == "stop":
+                self.stop()
+            else:
+                self.send("info string unknown command: {}".format(command))
+        self.stop()
+
+    def go(self, tokens):
+        """ Start searching the current position in a background thread. """
+        self.stop()
+        if self.state is None:
+            self.send("bestmove none")
+            return
+        movetime = float("inf")
+        if "movetime" in tokens[:-1]:
+            movetime = float(tokens[tokens.index("movetime") + 1])
+        self._stop.clear()
+        self._search = threading.Thread(target=self._run_search, args=(self.state, movetime))
+        self._search.start()
+
+    def stop(self):
+        """ Stop the running search and wait for its "bestmove". """
+        if self._search is not None:
+            self._stop.set()
+            self._search.join()
+            self._search = None
+
+    def _run_search(self, state, movetime):
+        if state[2] % 2:
+            game = Board.deserialize(state, OPPONENT, self.player)
+        else:
+            game = Board.deserialize(state, self.player, OPPONENT)
+        start = timeit.default_timer()
+        elapsed = lambda: 1000 * (timeit.default_timer() - start)
+        time_left = lambda: float("-inf") if self._stop.is_set() else movetime - elapsed()
+
+        def info(depth, move, score, nodes):
+            self.send("info depth {} score {} nodes {} time {:.1f} move {}".format(
+                depth, score, nodes, elapsed(), format_move(move)))
+
+        if hasattr(self.player, "info"):
+            self.player.info = info
+        try:
+            move = self.player.get_move(game, game.get_legal_moves(), time_left)
+        except Exception as e:
+            self.send("info string search failed: {!r}".format(e))
+            move = None
+        self.send("bestmove {}".format(format_move(move)))
+
+
+def engine_command(*args):
+    """ Return the command that starts this module as an engine server. """
+    return [sys.executable, os.path.abspath(__file__)] + list(args)
+
+
+def _read_lines(stream, lines):
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+
+class EnginePlayer(object):
+    """Player that forwards move requests to an engine process speaking the
+    engine protocol.
+
+    The process is started on the first move and kept for every following
+    move and game until `close()`. If the engine does not answer before the
+    deadline it is sent "stop"; an engine that does not answer "stop"
+    either is killed and restarted on the next move.
+
+    Parameters
+    ----------
+    command : list<str>
+        The command starting the engine, e.g., `engine_command()`.
+
+    latency : float (optional)
+        Milliseconds of the time left kept back from the engine for the
+        communication with the process.
+    """
+
+    def __init__(self, command, latency=5.):
+        self.command = list(command)
+        self.latency = latency
+        self.name = None
+        self.last_info = []
+        self._process = None
+        self._lines = None
+        self._move_count = None
+
+    def __str__(self):
+        return "EnginePlayer({})".format(self.name or " ".join(self.command))
+
+    def _send(self, line):
+        self._process.stdin.write(line + "\n")
+        self._process.stdin.flush()
+
+    def _readline(self, timeout=None):
+        """Return the next line of the engine (without the newline), None
+        at EOF, or "" if nothing arrived within `timeout` seconds.
+        """
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            return ""
+        return None if line is None else line.rstrip("\n")
+
+    def start(self):
+        """ Start the engine process and complete the handshake. """
+        if self._process is not None and self._process.poll() is None:
+            return
+        self._process = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE, universal_newlines=True,
+                                         bufsize=1)
+        self._lines = queue.Queue()
+        reader = threading.Thread(target=_read_lines, args=(self._process.stdout, self._lines))
+        reader.daemon = True
+        reader.start()
+        self._move_count = None
+        self._send("isolation")
+        while True:
+            line = self._readline()
+            if line is None:
+                raise RuntimeError("engine exited during the handshake: {}".format(
+                    " ".join(self.command)))
+            if line.startswith("id name "):
+                self.name = line[len("id name "):]
+            elif line == "isolationok":
+                break
+
+    def kill(self):
+        """ Stop the engine process immediately. """
+        if self._process is None:
+            return
+        self._process.kill()
+        self._process.wait()
+        self._process.stdin.close()
+        self._process = None
+
+    def close(self):
+        """ Ask the engine to exit, and stop it if it does not. """
+        if self._process is None:
+            return
+        try:
+            self._send("quit")
+            self._process.wait(1.)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+    def get_move(self, game, legal_moves, time_left):
+        """Send the position to the engine and return its best move, or
+        `Board.NOT_MOVED` if it did not answer. The info lines of the
+        search are kept in `last_info` as dicts.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        legal_moves : list<(int, int)>
+            A list containing legal moves. Moves are encoded as tuples of pairs
+            of ints defining the next (row, col) for the agent to occupy.
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        ----------
+        (int, int)
+            The move selected by the engine.
+        """
+        self.start()
+        self.last_info = []
+        if self._move_count is not None and game.move_count <= self._move_count:
+            self._send("newgame")
+        self._move_count = game.move_count
+        self._send(format_position(game.serialize()))
+        self._send("go movetime {:.0f}".format(max(0., time_left() - self.latency)))
+
+        stopped = False
+        while True:
+            remaining = time_left()
+            if remaining < 0 and not stopped:
+                self._send("stop")
+                stopped = True
+            timeout = STOP_TIMEOUT if stopped else remaining + 1.
+            line = self._readline(timeout / 1000.)
+            if line is None or (line == "" and stopped):
+                # the engine died or ignored "stop"
+                self.kill()
+                return Board.NOT_MOVED
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == "bestmove":
+                move = parse_move(tokens[1])
+                return Board.NOT_MOVED if move is None else move
+            if tokens[0] == "info" and len(tokens) % 2 == 1 and tokens[1] != "string":
+                info = dict(zip(tokens[1::2], tokens[2::2]))
+                if "move" in info:
+                    info["move"] = parse_move(info["move"])
+                self.last_info.append(info)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a CustomPlayer as an engine process.")
+    parser.add_argument("--score", default="custom", choices=list(SCORE_FUNCTIONS))
+    parser.add_argument("--method", default="alphabeta", choices=["minimax", "alphabeta"])
+    parser.add_argument("--depth", type=int, default=3,
+                        help="search depth with --fixed-depth")
+    parser.add_argument("--fixed-depth", action="store_true",
+                        help="fixed-depth search instead of iterative deepening")
+    parser.add_argument("--lmr", action="store_true")
+    parser.add_argument("--pvs", action="store_true")
+    parser.add_argument("--extend-forced", action="store_true")
+    parser.add_argument("--name")
+    args = parser.parse_args(argv)
+
+    player = CustomPlayer(args.depth, SCORE_FUNCTIONS[args.score], not args.fixed_depth,
+                          args.method, lmr=args.lmr, pvs=args.pvs,
+                          extend_forced=args.extend_forced)
+    name = args.name or "{}_{}".format(args.method, args.score)
+    EngineServer(player, name).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Fingerprints of agents and positions, for caches that outlive a process.
+
+The fingerprint of an agent is a hash of everything that determines its
+moves: the source code of its class, the source code (and parameters) of
+its score function, and its configuration (search depth, method, ...). Any
+edit to that code or change of parameters gives a new fingerprint, so
+cached results of the old version are never reused.
+
+The fingerprint of a position is a hash of `Board.serialize()`, which does
+not reference the player objects.
+"""
+
+import hashlib
+import inspect
+import pickle
+
+
+# Attributes of an agent that determine its moves, where present
+AGENT_ATTRIBUTES = ["search_depth", "iterative", "method", "TIMER_THRESHOLD", "lmr", "pvs",
+                    "extend_forced"]
+
+
+def _digest(*parts):
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _source(obj):
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        # built-in or interactively defined; fall back on the name
+        return getattr(obj, "__qualname__", repr(obj))
+
+
+def callable_fingerprint(fn):
+    """Return the fingerprint of a score function: its source, or for a
+    callable object the source of its class (and of the function it wraps,
+    if any) and its attributes.
+    """
+    if inspect.isfunction(fn) or inspect.ismethod(fn):
+        return _digest(_source(fn))
+    try:
+        state = pickle.dumps(sorted(vars(fn).items()), protocol=4)
+    except (TypeError, pickle.PicklingError, AttributeError):
+        state = repr(fn)
+    wrapped = getattr(fn, "__wrapped__", None)
+    return _digest(_source(type(fn)), state, _source(wrapped) if wrapped is not None else "")
+
+
+def agent_fingerprint(agent):
+    """ Return the fingerprint of an agent (see the module documentation). """
+    config = [(name, getattr(agent, name)) for name in AGENT_ATTRIBUTES if hasattr(agent, name)]
+    if getattr(agent, "time_manager", None) is not None:
+        config.append(("time_manager", type(agent.time_manager).__name__))
+    solver = getattr(agent, "solver", None)
+    if solver is not None:
+        config.append(("solver", type(solver).__name__, solver.max_nodes, solver.max_blanks))
+    score = getattr(agent, "score", None)
+    return _digest(_source(type(agent)), repr(config),
+                   callable_fingerprint(score) if score is not None else "")
+
+
+def position_fingerprint(game):
+    """ Return the fingerprint of the position on a board. """
+    return hashlib.sha1(repr(game.serialize()).encode()).hexdigest()
@@ -9,15 +9,24 @@ relative strength using tournament.py and include the results in your report.
 import random
 import math
 
+import search_trace
+
+from ponder import Ponderer
+from time_manager import TimeManager
+
 class Timeout(Exception):
     """Subclass base exception for code clarity."""
     pass
 
 
-def custom_score(game, player):
+def custom_score(game, player, overlap=1.5, distance=0.8, near=1. / 3, fill=1. / 3):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
 
+    The keyword parameters are the constants of the heuristic; they are
+    tuned through `heuristics.TunableScore` (see `tuning.py`), whose
+    defaults are read from this signature.
+
     Parameters
     ----------
     game : `isolation.Board`
@@ -28,6 +37,19 @@ def custom_score(game, player):
         A player instance in the current game (i.e., an object corresponding to
         one of the player objects `game.__player_1__` or `game.__player_2__`.)
 
+    overlap : float (optional)
+        Penalty for every move shared by both players.
+
+    distance : float (optional)
+        Bonus for being far from the opponent late in the game, and penalty
+        for being close early.
+
+    near : float (optional)
+        Distance threshold as a fraction of the board width.
+
+    fill : float (optional)
+        Fraction of blank cells separating the early and late game.
+
     Returns
     ----------
     float
@@ -50,7 +72,7 @@ def custom_score(game, player):
     # check for overlap between the players' possible moves
     for move in player_moves:
         if move in opponent_moves:
-            move_value -= 1.5
+            move_value -= overlap
 
     # check if players are close together.
     # Penalize if players are close but game board is less filled
@@ -58,16 +80,16 @@ def custom_score(game, player):
     player_pos = game.get_player_location(player)
     opponent_pos = game.get_player_location(game.get_opponent(player))
 
-    num_blank = len(game.get_blank_spaces())
     total_spaces = game.width * game.height
+    num_blank = total_spaces - game.move_count
 
     player_distance = math.sqrt((player_pos[0] - opponent_pos[0])**2 + \
         (player_pos[1] - opponent_pos[1])**2)
-    if player_distance < game.width / 3 and (num_blank > total_spaces / 3):
-        move_value -= 0.8
+    if player_distance < game.width * near and (num_blank > total_spaces * fill):
+        move_value -= distance
 
-    elif player_distance > game.width / 3 and (num_blank < total_spaces / 3):
-        move_value += 0.8
+    elif player_distance > game.width * near and (num_blank < total_spaces * fill):
+        move_value += distance
 
     return move_value
 
@@ -88,7 +110,9 @@ class CustomPlayer:
         current state.)
 
     score_fn : callable (optional)
-        A function to use for heuristic evaluation of game states.
+        A function to use for heuristic evaluation of game states. If it
+        has a `batch(games, player)` method returning a list of scores,
+        minimax and alpha-beta evaluate sibling leaves with one call.
 
     iterative : boolean (optional)
         Flag indicating whether to perform fixed-depth search (False) or
@@ -101,16 +125,98 @@ class CustomPlayer:
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
         timer expires.
+
+    trace : `search_trace.SearchTrace` (optional)
+        A tracer that records a bounded sample of the explored search tree
+        for offline analysis. Tracing is disabled when None.
+
+    adaptive_time : boolean (optional)
+        Flag indicating whether iterative deepening should use a
+        `time_manager.TimeManager` to stop before starting an iteration
+        that cannot finish in time.
+
+    ponder : boolean (optional)
+        Flag indicating whether the player should search the predicted
+        opponent reply in a background process during the opponent's turn
+        (see `ponder.Ponderer`). Pondering only happens when the game is
+        played with `Board.play(ponder=True)`, and it is disabled on
+        machines with fewer than two cores.
+
+    lmr : boolean (optional)
+        Alpha-beta only: search moves ordered after the first `LMR_MOVES`
+        one ply shallower, and re-search them to full depth if they improve
+        on the best score.
+
+    pvs : boolean (optional)
+        Alpha-beta only: search every move after the first with a null
+        window around the best score, and re-search it with the full window
+        only if it improves on the best score.
+
+    extend_forced : boolean (optional)
+        Alpha-beta only: do not reduce the depth below nodes where the side
+        to move has at most `FORCED_MOVES` legal moves, at most
+        `MAX_EXTENSIONS` times along a line.
+
+    info : callable (optional)
+        Called by get_move() with (depth, move, score, nodes) after every
+        completed search iteration, e.g., to report the progress of the
+        search.
+
+    move_cache : `move_cache.MoveCache` (optional)
+        Fixed-depth search only: a store of the moves chosen in previous
+        searches, looked up before searching and updated after every
+        completed search.
+
+    solver : `pn_search.ProofSolver` (optional)
+        A proof-number solver tried before searching in positions that
+        look decided, for at most `SOLVER_SHARE` of the time left; the
+        winning move of a proven win is played without searching.
     """
 
+    LMR_MOVES = 3
+    FORCED_MOVES = 2
+    MAX_EXTENSIONS = 4
+    NULL_WINDOW = 1e-6
+    SOLVER_SHARE = 0.25
+
     def __init__(self, search_depth=3, score_fn=custom_score,
-                 iterative=True, method='minimax', timeout=10.):
+                 iterative=True, method='minimax', timeout=10., trace=None,
+                 adaptive_time=True, ponder=False, lmr=False, pvs=False,
+                 extend_forced=False, info=None, move_cache=None, solver=None):
         self.search_depth = search_depth
         self.iterative = iterative
         self.score = score_fn
         self.method = method
         self.time_left = None
         self.TIMER_THRESHOLD = timeout - 2
+        self.trace = trace
+        self.time_manager = TimeManager() if adaptive_time else None
+        self.nodes = 0
+        self.ponderer = Ponderer(self) if ponder else None
+        self.root_results = {}
+        self.partial = None
+        self.last_depth = 0
+        self.last_score = None
+        self.lmr = lmr
+        self.pvs = pvs
+        self.extend_forced = extend_forced
+        self.info = info
+        self.move_cache = move_cache
+        self.solver = solver
+        self._extensions = 0
+        self._root_move = None
+
+    def ponder(self, game):
+        """Start searching on the opponent's time. `game` is the state after
+        this player's move, with the opponent holding initiative.
+        """
+        if self.ponderer is not None:
+            self.ponderer.start(game)
+
+    def stop_pondering(self):
+        """ Stop any background search started by `ponder()`. """
+        if self.ponderer is not None:
+            self.ponderer.stop()
 
     def get_move(self, game, legal_moves, time_left):
         """Search for the best move from the available legal moves and return a
@@ -150,16 +256,38 @@ class CustomPlayer:
 
         self.time_left = time_left
 
+        # collect the result of pondering on the opponent's time; it is only
+        # returned when the opponent played the predicted reply
+        pondered = None
+        if self.ponderer is not None:
+            pondered = self.ponderer.probe(game)
+
         # TODO: finish this function!
 
         # Perform any required initializations, including selecting an initial
         # move from the game board (i.e., an opening book), or returning
         # immediately if there are no legal moves
-        best_move = (-1, -1)
-        if len(game.get_legal_moves()) == 0:
-            return best_move
+        self.root_results = {}
+        self.partial = None
+        self.last_depth = 0
+        self.last_score = None
+        moves = game.get_legal_moves()
+        if len(moves) == 0:
+            return (-1, -1)
         if game.move_count == 0:
             return (int(game.width/2), int(game.height/2))
+        # a legal move is returned even if the search times out before its
+        # first iteration completes
+        best_move = moves[0]
+        if self.solver is not None and self.solver.decided(game):
+            # the solver stops after its share of the time left, so that an
+            # unproven position is still searched
+            budget = self.time_left() - self.TIMER_THRESHOLD
+            reserve = self.TIMER_THRESHOLD + (1 - self.SOLVER_SHARE) * budget
+            move = self.solver.winning_move(game, lambda: self.time_left() < reserve)
+            if move is not None:
+                self.last_score = float("inf")
+                return move
 
         
        
@@ -172,36 +300,178 @@ class CustomPlayer:
             # when the timer gets close to expiring
             # if use iterative deepening, use the method specified
             if self.iterative:
-                if self.method == "minimax":
-                    depth = 1
-                    while True:
-                        best_move = self.minimax(game, depth, True)[1];
-                        if best_move == (-1, -1):
+                manager = self.time_manager
+                if manager is not None:
+                    manager.start(game, legal_moves, time_left, self.TIMER_THRESHOLD)
+                depth = 1
+                if pondered is not None:
+                    depth, best_move, score = pondered[-1][:3]
+                    self.last_depth, self.last_score = depth, score
+                    if best_move == (-1, -1) or abs(score) == float("inf"):
+                        return best_move
+                    # the pondered iterations predict the cost of resuming
+                    # from the next depth
+                    if manager is not None:
+                        for ponder_depth, _, ponder_score, nodes, elapsed in pondered:
+                            manager.record(ponder_depth, elapsed, nodes, ponder_score)
+                        if not manager.should_continue():
                             return best_move
-                        depth += 1
-                if self.method == "alphabeta":
-                    depth = 1
-                    while True:
-                        best_move = self.alphabeta(game, depth)[1]
-                        if best_move == (-1, -1):
+                    depth += 1
+                while True:
+                    nodes = self.nodes
+                    score, best_move = self.search_root(game, depth, best_move)
+                    if self.info is not None:
+                        self.info(depth, best_move, score, self.nodes)
+                    if best_move == (-1, -1):
+                        return best_move
+                    if manager is not None:
+                        manager.complete(depth, self.nodes - nodes, score)
+                        # stop when the result is proven or when the next
+                        # iteration is not expected to finish in time
+                        if abs(score) == float("inf") or not manager.should_continue():
                             return best_move
-                        depth += 1
-                
+                    depth += 1
                 
             else:
-                if self.method == "minimax":
-                    best_move = self.minimax(game, self.search_depth, True)[1]
-                if self.method == "alphabeta":
-                    best_move = self.minimax(game, self.search_depth, True)[1]
+                if pondered is not None and pondered[-1][0] >= self.search_depth:
+                    return pondered[-1][1]
+                cache = self.move_cache
+                if cache is not None:
+                    cached = cache.get(self, game)
+                    if cached is not None:
+                        return cached
+                score, best_move = self.search_root(game, self.search_depth)
+                if self.info is not None:
+                    self.info(self.search_depth, best_move, score, self.nodes)
+                if cache is not None:
+                    cache.put(self, game, best_move)
                 return best_move
 
         except Timeout:
-            # Handle any actions required at timeout, if necessary
+            # Handle any actions required at timeout, if necessary; the
+            # unfinished iteration contributes a move once the best move of
+            # the previous iteration has been searched to the new depth
+            if self.partial is not None:
+                return self.partial[1]
             return best_move
 
         # Return the best move from the last completed search iteration
         raise NotImplementedError
 
+    def search_root(self, game, depth, previous_best=None):
+        """Search the root of the game tree to a fixed depth with the
+        configured search method, keeping the score and subtree node count
+        of every root move.
+
+        With alpha-beta search the root moves are searched in the order of
+        the previous iteration: its best move first, followed by the other
+        moves by decreasing score and subtree size. Minimax visits every
+        node regardless of the order, so the legal move order is kept.
+
+        The depth and score of the completed search are kept in
+        `self.last_depth` and `self.last_score`.
+
+        While the iteration runs, `self.partial` holds the best (score, move)
+        among the completed root moves as soon as `previous_best` has been
+        searched to the new depth, so that `get_move` can use the unfinished
+        iteration after a timeout.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            An instance of the Isolation game `Board` class representing the
+            current game state
+
+        depth : int
+            Depth is an integer representing the maximum number of plies to
+            search in the game tree before aborting
+
+        previous_best : tuple(int, int) (optional)
+            The best move of the previous iteration, if any
+
+        Returns
+        ----------
+        float
+            The score of the best move
+
+        tuple(int, int)
+            The best move; (-1, -1) for no legal moves
+        """
+        if self.trace is not None:
+            self.trace.begin(self.method, depth, game)
+        if self.time_left() < self.TIMER_THRESHOLD:
+            raise Timeout()
+        self.nodes += 1
+
+        self.partial = None
+        self._extensions = 0
+        moves = game.get_legal_moves()
+        if not moves:
+            return float("-inf"), (-1, -1)
+
+        alphabeta = self.method == "alphabeta"
+        if alphabeta:
+            results = self.root_results
+            moves.sort(key=lambda m: (m == previous_best,) + results.get(m, (float("-inf"), 0)),
+                       reverse=True)
+        if depth == 1 and not alphabeta:
+            self.nodes += len(moves)
+
+        results = {}
+        confirmed = previous_best is None
+        best_score, best_move = float("-inf"), moves[0]
+        selective = self.lmr or self.pvs
+        for index, move in enumerate(moves):
+            nodes = self.nodes
+            new_game = game.forecast_move(move)
+            if alphabeta and selective and index:
+                score = self.search_child(new_game, depth - 1, best_score, float("inf"),
+                                          1, index)
+            elif alphabeta:
+                score = -self._alphabeta(new_game, depth - 1, float("-inf"), -best_score, -1)
+            elif depth == 1:
+                score = self.score(new_game, self)
+            else:
+                score = -self._minimax(new_game, depth - 1, -1)
+            results[move] = (score, self.nodes - nodes)
+
+            # a later move that fails low only has an upper bound equal to
+            # best_score, so ties keep the move searched first
+            if score > best_score:
+                best_score, best_move = score, move
+            confirmed = confirmed or move == previous_best
+            if confirmed and previous_best is not None:
+                self.partial = best_score, best_move
+            if score == float("inf"):
+                break
+
+        if self.trace is not None:
+            self.trace.record(game, depth, None, None, best_score, search_trace.EXACT)
+        self.root_results = results
+        self.partial = None
+        self.last_depth, self.last_score = depth, best_score
+        return best_score, best_move
+
+    def search_child(self, game, depth, alpha, beta, color, index):
+        """Search `game`, the child at position `index` in the move order of
+        an alpha-beta node, with the enabled selective search options.
+
+        `alpha`, `beta` and `color` are the window and side of the parent
+        node in negamax form (see `_alphabeta`), and the score is returned
+        from the parent's point of view. A reduced (`lmr`) or null-window
+        (`pvs`) search that fails to raise alpha is returned as is;
+        otherwise the child is searched again to the full depth with the
+        full window.
+        """
+        reduce = self.lmr and index >= self.LMR_MOVES and depth >= 2
+        null = self.pvs and abs(alpha) != float("inf")
+        if reduce or null:
+            low = -alpha - self.NULL_WINDOW if null else -beta
+            score = -self._alphabeta(game, depth - 1 if reduce else depth, low, -alpha, -color)
+            if score <= alpha:
+                return score
+        return -self._alphabeta(game, depth, -beta, -alpha, -color)
+
     def minimax(self, game, depth, maximizing_player=True):
         """Implement the minimax search algorithm as described in the lectures.
 
@@ -227,57 +497,9 @@ class CustomPlayer:
         tuple(int, int)
             The best move for the current branch; (-1, -1) for no legal moves
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise Timeout()
-        
-        # create a list of queues
-        # get current_player's current position
-        # calculate one level down according to score function
-        # return the max or min
-        # if depth == 0:
-        #     return self.score(game, game.active_player()), game.get_player_location(game.inactive_player())
-        queue = game.get_legal_moves()
-        scores = []
-        game_queue = []
-        if len(queue) == 0:
-            if maximizing_player:
-                return float("-inf"), (-1, -1) 
-            else:
-                return float("inf"), (-1, -1)
-
-        if depth == 1:
-            for possible_move in queue:
-                new_game = game.forecast_move(possible_move)
-                scores.append(self.score(new_game,self))
-
-        # make a queue to store the possible moves
-        # for each move in the queue, make a deep copy of the game, then move the move,
-        # then recurse and depending on whether or not maximizing_player is True
-        # choose a possible move
-        if depth > 1:
-            for possible_move in queue:
-                new_game = game.forecast_move(possible_move)
-                new_score = self.minimax(new_game, int(depth) - 1, not maximizing_player)
-                game_queue.append(new_score[1])
-                scores.append(new_score[0])
-           
-        
-        if maximizing_player:
-            max = 0
-            for i in range(len(scores)):
-                if scores[i] > scores[max]:
-                    max = i
-            return scores[max], queue[max]
-        
-        else: 
-            min = 0
-            for i in range(len(scores)):
-                if scores[i] < scores[min]:
-                    min = i
-            return scores[min], queue[min]
-        
-        
-
+        color = 1 if maximizing_player else -1
+        score = self._minimax(game, depth, color, True)
+        return color * score, self._root_move
 
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf"), maximizing_player=True):
         """Implement minimax search with alpha-beta pruning as described in the
@@ -309,69 +531,143 @@ class CustomPlayer:
             The score for the current search branch
 
         tuple(int, int)
-            The best move for the current branch; (-1, -1) for no legal moves
+            The best move for the current branch; (-1, -1) for no legal
+            moves, and None at depth 0
         """
+        if maximizing_player:
+            return self._alphabeta(game, depth, alpha, beta, 1, True), self._root_move
+        return -self._alphabeta(game, depth, -beta, -alpha, -1, True), self._root_move
+
+    # The search cores use the negamax form: scores are from the point of
+    # view of the side to move, `color` is 1 when that is this player and -1
+    # otherwise, and a node returns only its score. With `root` set, the
+    # best move is stored in `self._root_move`, choosing among equal scores
+    # the move the max/min formulation picks (the last one on maximizing
+    # layers of alpha-beta, the first one otherwise).
+
+    def _minimax(self, game, depth, color, root=False):
+        """ Negamax form of `minimax`. """
         if self.time_left() < self.TIMER_THRESHOLD:
             raise Timeout()
-
-
-        # get a queue of the possible moves
-        queue = game.get_legal_moves()
-        scores = []
-
-        if len(queue) == 0:
-            if maximizing_player:
-                return float("-inf"), (-1, -1) 
+        self.nodes += 1
+
+        trace = self.trace
+        moves = game.get_legal_moves()
+        if not moves:
+            if root:
+                self._root_move = (-1, -1)
+            if trace is not None:
+                trace.record(game, depth, None, None, -color * float("inf"),
+                             search_trace.TERMINAL)
+            return float("-inf")
+
+        best, best_move = float("-inf"), moves[0]
+        if depth <= 1:
+            # evaluate the leaves inline; score functions with a batched
+            # path evaluate all siblings at once
+            self.nodes += len(moves)
+            score_fn = self.score
+            batch = getattr(score_fn, "batch", None)
+            if batch is not None or trace is not None:
+                children = [game.forecast_move(move) for move in moves]
+                scores = batch(children, self) if batch is not None else \
+                    [score_fn(child, self) for child in children]
+                for move, child, score in zip(moves, children, scores):
+                    if trace is not None:
+                        trace.record(child, 0, None, None, score, search_trace.LEAF)
+                    if color * score > best:
+                        best, best_move = color * score, move
             else:
-                return float("inf"), (-1, -1)
-
-        # base case: depth is 0
-        if depth == 0:
-            return self.score(game, self), 
-
-        # base case: if search more layers
+                for move in moves:
+                    score = color * score_fn(game.forecast_move(move), self)
+                    if score > best:
+                        best, best_move = score, move
         else:
-            # if maximizing_player is True
-            if maximizing_player:
-                new_alpha = alpha
-                for possible_move in queue:
-                    new_game = game.forecast_move(possible_move)
-                    score = self.alphabeta(new_game, int(depth) - 1, new_alpha, beta, not maximizing_player)
-                    if score[0] >= float(beta):
-                        return score[0], possible_move
-                    
-                    if score[0] > new_alpha:
-                        new_alpha = score[0]
-                    
-                    scores.append(score[0])
-                        
-                max = 0
-                for i in range(len(scores)):
-                    if scores[i] >= scores[max]:
-                        max = i
-                return scores[max], queue[max]
-
-            #if maximizing_player is False
-            else:
-                new_beta = beta
-                for possible_move in queue:
-                    new_game = game.forecast_move(possible_move)
-                    score = self.alphabeta(new_game, int(depth) - 1, alpha, new_beta, not maximizing_player)
-                    if score[0] <= alpha:
-                        return score[0], possible_move
-                    if score[0] < new_beta:
-                        new_beta = score[0]
-                    scores.append(score[0])
-
-                min = 0
-                for i in range(len(scores)):
-                    if scores[i] < scores[min]:
-                        min = i
-                return scores[min], queue[min]
-
-
-        
-
-
-        # TODO: finish this function!
-        raise NotImplementedError
+            for move in moves:
+                score = -self._minimax(game.forecast_move(move), depth - 1, -color)
+                if score > best:
+                    best, best_move = score, move
+
+        if root:
+            self._root_move = best_move
+        if trace is not None:
+            trace.record(game, depth, None, None, color * best, search_trace.EXACT)
+        return best
+
+    def _alphabeta(self, game, depth, alpha, beta, color, root=False):
+        """ Negamax form of `alphabeta` with the window (alpha, beta). """
+        if self.time_left() < self.TIMER_THRESHOLD:
+            raise Timeout()
+        self.nodes += 1
+
+        trace = self.trace
+        if trace is not None:
+            # the window in the max/min form, for the trace records
+            window = (alpha, beta) if color > 0 else (-beta, -alpha)
+        moves = game.get_legal_moves()
+        if not moves:
+            if root:
+                self._root_move = (-1, -1)
+            if trace is not None:
+                trace.record(game, depth, window[0], window[1], -color * float("inf"),
+                             search_trace.TERMINAL)
+            return float("-inf")
+
+        if depth <= 0:
+            if root:
+                self._root_move = None
+            score = self.score(game, self)
+            if trace is not None:
+                trace.record(game, depth, window[0], window[1], score, search_trace.LEAF)
+            return color * score
+
+        child_depth = depth - 1
+        extended = self.extend_forced and len(moves) <= self.FORCED_MOVES and \
+            self._extensions < self.MAX_EXTENSIONS
+        if extended:
+            # forced line: search the replies to the full remaining depth
+            child_depth += 1
+            self._extensions += 1
+        selective = self.lmr or self.pvs
+        prefer_last = root and color > 0
+        best, best_move = float("-inf"), moves[0]
+        # score functions with a batched path evaluate all the leaves of the
+        # node at once, including the ones after a cutoff
+        batch = getattr(self.score, "batch", None) if child_depth == 0 else None
+        if batch is not None:
+            children = [game.forecast_move(move) for move in moves]
+            leaf_scores = batch(children, self)
+            self.nodes += len(moves)
+        try:
+            for index, move in enumerate(moves):
+                if batch is not None:
+                    score = color * leaf_scores[index]
+                    if trace is not None:
+                        trace.record(children[index], 0, window[0], window[1],
+                                     leaf_scores[index], search_trace.LEAF)
+                elif selective and index:
+                    score = self.search_child(game.forecast_move(move), child_depth, alpha,
+                                              beta, color, index)
+                else:
+                    score = -self._alphabeta(game.forecast_move(move), child_depth, -beta,
+                                             -alpha, -color)
+                if score >= beta:
+                    if root:
+                        self._root_move = move
+                    if trace is not None:
+                        trace.record(game, depth, window[0], window[1], color * score,
+                                     search_trace.BETA if color > 0 else search_trace.ALPHA)
+                    return score
+                if score > best or (prefer_last and score == best):
+                    best, best_move = score, move
+                if score > alpha:
+                    alpha = score
+        finally:
+            if extended:
+                self._extensions -= 1
+
+        if root:
+            self._root_move = best_move
+        if trace is not None:
+            trace.record(game, depth, window[0], window[1], color * best, search_trace.EXACT)
+        return best
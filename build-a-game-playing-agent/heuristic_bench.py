@@ -0,0 +1,193 @@
+"""
+Cost versus strength report for the registered score functions.
+
+In a time-limited game a heavier heuristic pays for its information with
+search depth. For every score function in `heuristics.SCORE_FUNCTIONS` this
+script measures, side by side:
+
+    latency   the mean cost of one call over a sample of positions
+    node      the cost of one alpha-beta node with that heuristic
+              (move generation plus evaluation)
+    ebf       the effective branching factor of the alpha-beta search
+    depth     the depth an iterative deepening search completes within the
+              time budget, estimated as log(budget / node) / log(ebf), and
+              the depth lost relative to the deepest estimate
+    win rate  the win rate of an iterative deepening agent with that
+              heuristic in a short tournament against the other agents
+
+    python heuristic_bench.py --positions 2000 --matches 5 --output table.json
+"""
+
+import argparse
+import itertools
+import json
+import math
+import platform
+import random
+import timeit
+
+from isolation import Board
+from game_agent import CustomPlayer
+from heuristics import SCORE_FUNCTIONS
+
+import tournament
+
+
+BUDGET = tournament.TIME_LIMIT  # milliseconds per move
+SEARCH_DEPTH = 4
+
+
+def sample_positions(count, seed=0, width=7, height=7):
+    """Sample non-terminal positions from random games.
+
+    Every position is taken from a separate random game at a uniformly
+    drawn ply, so the sample covers the opening to the endgame.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = Board("player_1", "player_2", width, height)
+        stop = rng.randint(2, width * height // 2)
+        for _ in range(stop):
+            moves = game.get_legal_moves()
+            if not moves:
+                break
+            game.apply_move(rng.choice(moves))
+        if game.get_legal_moves():
+            positions.append(game)
+    return positions
+
+
+def measure_latency(score_fn, positions, repeat=3):
+    """ Return the mean time of one call of `score_fn` in microseconds. """
+    best = None
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        for game in positions:
+            score_fn(game, game.active_player)
+        elapsed = timeit.default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return 1e6 * best / len(positions)
+
+
+def measure_search(score_fn, positions, depth=SEARCH_DEPTH):
+    """Search every position with alpha-beta to depths 1 and `depth`.
+
+    Returns
+    ----------
+    (float, float)
+        The effective branching factor and the mean time per node in
+        microseconds at the deepest search.
+    """
+    player = CustomPlayer(depth, score_fn, False, "alphabeta")
+    player.time_left = lambda: float("inf")
+    nodes = {1: 0, depth: 0}
+    elapsed = 0.
+    for game in positions:
+        # search on behalf of the side to move
+        if game.active_player == game.__player_1__:
+            game = Board.deserialize(game.serialize(), player, "opponent")
+        else:
+            game = Board.deserialize(game.serialize(), "opponent", player)
+        for d in (1, depth):
+            player.nodes = 0
+            player.root_results = {}
+            start = timeit.default_timer()
+            player.search_root(game, d)
+            if d == depth:
+                elapsed += timeit.default_timer() - start
+            nodes[d] += player.nodes
+    ebf = (float(nodes[depth]) / nodes[1]) ** (1. / (depth - 1))
+    return ebf, 1e6 * elapsed / nodes[depth]
+
+
+def estimate_depth(node_us, ebf, budget=BUDGET):
+    """Estimate the depth completed within `budget` milliseconds when a
+    search to depth d visits ebf ** d nodes.
+    """
+    if ebf <= 1.:
+        return float("inf")
+    return math.log(1000. * budget / node_us) / math.log(ebf)
+
+
+def win_rates(names, num_matches=5, method="alphabeta"):
+    """Play a round robin between iterative deepening agents using the
+    given heuristics, and return the win rate (in percent) of each.
+    """
+    players = dict((name, CustomPlayer(score_fn=SCORE_FUNCTIONS[name], method=method,
+                                       iterative=True)) for name in names)
+    wins = dict((name, 0) for name in names)
+    games = dict((name, 0) for name in names)
+    for name_1, name_2 in itertools.combinations(names, 2):
+        for _ in range(num_matches):
+            score_1, score_2 = tournament.play_match(players[name_1], players[name_2])
+            wins[name_1] += score_1
+            wins[name_2] += score_2
+            games[name_1] += 2
+            games[name_2] += 2
+    return dict((name, 100. * wins[name] / games[name] if games[name] else None)
+                for name in names)
+
+
+def run(names=list(SCORE_FUNCTIONS), num_positions=1000, num_matches=5,
+        budget=BUDGET, seed=0):
+    """ Build the cost/strength table as a JSON-serializable report. """
+    positions = sample_positions(num_positions, seed)
+    search_positions = positions[:max(1, num_positions // 50)]
+    rows = []
+    for name in names:
+        score_fn = SCORE_FUNCTIONS[name]
+        ebf, node_us = measure_search(score_fn, search_positions)
+        rows.append({"heuristic": name,
+                     "latency_us": measure_latency(score_fn, positions),
+                     "node_us": node_us,
+                     "ebf": ebf,
+                     "depth": estimate_depth(node_us, ebf, budget)})
+    reference = max(row["depth"] for row in rows)
+    for row in rows:
+        row["depth_lost"] = reference - row["depth"]
+
+    rates = win_rates(names, num_matches) if num_matches else {}
+    for row in rows:
+        row["win_rate"] = rates.get(row["heuristic"])
+    return {"benchmark": "heuristics", "python": platform.python_version(),
+            "positions": num_positions, "matches": num_matches,
+            "budget_ms": budget, "results": rows}
+
+
+def table(report):
+    """ Return the report as a printable table. """
+    lines = ["{:<10}{:>12}{:>10}{:>8}{:>8}{:>12}{:>10}".format(
+        "heuristic", "latency_us", "node_us", "ebf", "depth", "depth_lost", "win_rate")]
+    for row in report["results"]:
+        rate = row["win_rate"]
+        lines.append("{:<10}{:>12.2f}{:>10.2f}{:>8.2f}{:>8.2f}{:>12.2f}{:>10}".format(
+            row["heuristic"], row["latency_us"], row["node_us"], row["ebf"], row["depth"],
+            row["depth_lost"], "-" if rate is None else "{:.1f}%".format(rate)))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cost/strength report of the heuristics.")
+    parser.add_argument("--heuristic", action="append", choices=list(SCORE_FUNCTIONS),
+                        help="heuristic to include (default: all)")
+    parser.add_argument("--positions", type=int, default=1000,
+                        help="number of sampled positions for the latency")
+    parser.add_argument("--matches", type=int, default=5,
+                        help="matches per pair of heuristics (0 skips the tournament)")
+    parser.add_argument("--budget", type=float, default=BUDGET,
+                        help="time budget per move in milliseconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = run(args.heuristic or list(SCORE_FUNCTIONS), args.positions, args.matches,
+                 args.budget, args.seed)
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump(report, stream, indent=1)
+    print(table(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
+import inspect
 import math
 
+from collections import OrderedDict
+
+from game_agent import custom_score
+from sample_players import improved_score
+from sample_players import null_score
+from sample_players import open_move_score
+
 def custom_score_1(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -93,8 +101,8 @@ def custom_score_2(game, player):
     player_pos = game.get_player_location(player)
     opponent_pos = game.get_player_location(game.get_opponent(player))
 
-    num_blank = len(game.get_blank_spaces())
     total_spaces = game.width * game.height
+    num_blank = total_spaces - game.move_count
 
     player_distance = math.sqrt((player_pos[0] - opponent_pos[0])**2 + \
         (player_pos[1] - opponent_pos[1])**2)
@@ -160,4 +168,56 @@ def custom_score_3(game, player):
         else:
             move_value -= 0.4
     
-    return move_value
\ No newline at end of file
+    return move_value
+
+
+class TunableScore(object):
+    """Picklable form of `game_agent.custom_score` whose constants are
+    parameters, for use by the weight tuner (see `tuning.py`).
+
+    The score is computed by `custom_score` itself, and the default
+    parameters are the defaults of its signature, so tuned values are
+    applied to the default agent by editing that signature.
+
+    Parameters
+    ----------
+    **params : float (optional)
+        Values of the parameters in `PARAMETERS` (see `custom_score`).
+    """
+
+    PARAMETERS = ("overlap", "distance", "near", "fill")
+    DEFAULTS = dict((name, parameter.default) for name, parameter
+                    in inspect.signature(custom_score).parameters.items()
+                    if parameter.default is not inspect.Parameter.empty)
+    # the fingerprint of a score (see `fingerprint.py`) covers the wrapped code
+    __wrapped__ = staticmethod(custom_score)
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.PARAMETERS)
+        if unknown:
+            raise TypeError("unknown parameters: {}".format(", ".join(sorted(unknown))))
+        for name in self.PARAMETERS:
+            setattr(self, name, params.get(name, self.DEFAULTS[name]))
+
+    def __repr__(self):
+        return "TunableScore({})".format(", ".join(
+            "{}={!r}".format(name, getattr(self, name)) for name in self.PARAMETERS))
+
+    def params(self):
+        """ Return the parameters as a dict. """
+        return dict((name, getattr(self, name)) for name in self.PARAMETERS)
+
+    def __call__(self, game, player):
+        return custom_score(game, player, self.overlap, self.distance, self.near, self.fill)
+
+
+# Registry of the score functions available to benchmarks and tools
+SCORE_FUNCTIONS = OrderedDict([
+    ("null", null_score),
+    ("open", open_move_score),
+    ("improved", improved_score),
+    ("custom", custom_score),
+    ("custom_1", custom_score_1),
+    ("custom_2", custom_score_2),
+    ("custom_3", custom_score_3),
+])
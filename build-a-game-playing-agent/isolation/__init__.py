@@ -11,6 +11,10 @@ import io
 
 # Make the Board class available at the root of the module for imports
 from .isolation import Board
+from .rules import MoveRules
+from .rules import KING
+from .rules import KNIGHT
+from .rules import QUEEN
 
 
 def game_as_text(winner, move_history, termination="", board=Board(1, 2)):
@@ -32,8 +36,8 @@ def game_as_text(winner, move_history, termination="", board=Board(1, 2)):
 
     termination : str
         String indicating the reason (if any) that the game was terminated.
-        Valid reasons for termination include "" (none), "timeout", and
-        "illegal move".
+        Valid reasons for termination include "" (none), "timeout",
+        "illegal move", and "adjudicated".
 
     board : isolation.Board
         An instance of `isolation.Board` encoding the game state (e.g., player
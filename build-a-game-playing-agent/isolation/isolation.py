@@ -1,7 +1,8 @@
 """
 This file contains the `Board` class, which implements the rules for the
 game Isolation as described in lecture, modified so that the players move
-like knights in chess rather than queens.
+like knights in chess rather than queens by default (see `rules.py` for the
+other movement rules).
 
 You MAY use and modify this class, however ALL function signatures must
 remain compatible with the defaults provided, and none of your changes will
@@ -10,9 +11,11 @@ be available to project reviewers.
 
 import timeit
 
-from copy import deepcopy
 from copy import copy
 
+from .rules import KNIGHT
+from .rules import get_rules
+
 
 TIME_LIMIT_MILLIS = 200
 
@@ -37,19 +40,32 @@ class Board(object):
 
     height : int (optional)
         The number of rows that the board should have.
+
+    rules : `isolation.rules.MoveRules` (optional)
+        The movement rule of both players; knight moves by default.
     """
     BLANK = 0
     NOT_MOVED = None
 
-    def __init__(self, player_1, player_2, width=7, height=7):
+    def __init__(self, player_1, player_2, width=7, height=7, rules=KNIGHT):
         self.width = width
         self.height = height
+        self.rules = rules
+        self.__leaps__ = rules.leap_table(width, height)
+        self.__rays__ = rules.ray_table(width, height) if rules.rays else None
+        # bitmask of the blocked cells, maintained for slider rules only and
+        # valid while __blocked_count__ equals move_count
+        self.__blocked__ = 0
+        self.__blocked_count__ = 0
+        # (move_count, blank cells) while a player has not been placed, see
+        # get_blank_spaces()
+        self.__blank_spaces__ = None
         self.move_count = 0
         self.__player_1__ = player_1
         self.__player_2__ = player_2
         self.__active_player__ = player_1
         self.__inactive_player__ = player_2
-        self.__board_state__ = [[Board.BLANK for i in range(width)] for j in range(height)]
+        self.__board_state__ = [[Board.BLANK] * width for j in range(height)]
         self.__last_player_move__ = {player_1: Board.NOT_MOVED, player_2: Board.NOT_MOVED}
         self.__player_symbols__ = {Board.BLANK: Board.BLANK, player_1: 1, player_2: 2}
 
@@ -93,15 +109,74 @@ class Board(object):
 
     def copy(self):
         """ Return a deep copy of the current board. """
-        new_board = Board(self.__player_1__, self.__player_2__, width=self.width, height=self.height)
+        new_board = Board(self.__player_1__, self.__player_2__, width=self.width,
+                          height=self.height, rules=self.rules)
         new_board.move_count = self.move_count
+        new_board.__blocked__ = self.__blocked__
+        new_board.__blocked_count__ = self.__blocked_count__
+        new_board.__blank_spaces__ = self.__blank_spaces__
         new_board.__active_player__ = self.__active_player__
         new_board.__inactive_player__ = self.__inactive_player__
         new_board.__last_player_move__ = copy(self.__last_player_move__)
         new_board.__player_symbols__ = copy(self.__player_symbols__)
-        new_board.__board_state__ = deepcopy(self.__board_state__)
+        # the rows only hold ints, so copying every row is a deep copy
+        new_board.__board_state__ = [row[:] for row in self.__board_state__]
         return new_board
 
+    def serialize(self):
+        """
+        Return a compact encoding of the game state that does not reference
+        the player objects. The encoding is a hashable tuple of immutable
+        values, so it can be sent to other processes or used as a key in a
+        dictionary.
+
+        Returns
+        ----------
+        tuple
+            (width, height, move_count, cells, player 1 location, player 2
+            location, rules), where `cells` is a bytes object with the
+            contents of the board in row-major order and `rules` is the name
+            of the movement rule.
+        """
+        cells = bytes(value for row in self.__board_state__ for value in row)
+        return (self.width, self.height, self.move_count, cells,
+                self.__last_player_move__[self.__player_1__],
+                self.__last_player_move__[self.__player_2__], self.rules.name)
+
+    @classmethod
+    def deserialize(cls, state, player_1, player_2):
+        """
+        Create a board from an encoding returned by `serialize()`.
+
+        Parameters
+        ----------
+        state : tuple
+            A game state encoded by `serialize()`.
+
+        player_1 : object
+            The object to register as the first player.
+
+        player_2 : object
+            The object to register as the second player.
+
+        Returns
+        ----------
+        `isolation.Board`
+            A board encoding the same game state.
+        """
+        width, height, move_count, cells, loc1, loc2 = state[:6]
+        # encodings without the rule name predate the movement rules
+        rules = get_rules(state[6]) if len(state) > 6 else KNIGHT
+        board = cls(player_1, player_2, width=width, height=height, rules=rules)
+        board.move_count = move_count
+        board.__board_state__ = [list(cells[i * width:(i + 1) * width])
+                                 for i in range(height)]
+        board.__last_player_move__ = {player_1: loc1, player_2: loc2}
+        if move_count % 2:
+            board.__active_player__ = player_2
+            board.__inactive_player__ = player_1
+        return board
+
     def forecast_move(self, move):
         """
         Return a deep copy of the current game with an input move applied to
@@ -145,9 +220,19 @@ class Board(object):
     def get_blank_spaces(self):
         """
         Return a list of the locations that are still available on the board.
+
+        The list is cached and updated incrementally by `apply_move()` until
+        both players are placed, so the first moves of a game (where every
+        blank cell is a legal move) do not scan the whole board at every
+        node. The number of blank cells is always width * height -
+        move_count.
         """
-        return [(i, j) for j in range(self.width) for i in range(self.height)
-            if self.__board_state__[i][j] == Board.BLANK]
+        cache = self.__blank_spaces__
+        if cache is None or cache[0] != self.move_count:
+            blanks = [(i, j) for j in range(self.width) for i in range(self.height)
+                      if self.__board_state__[i][j] == Board.BLANK]
+            cache = self.__blank_spaces__ = (self.move_count, blanks)
+        return cache[1][:]
 
     def get_player_location(self, player):
         """
@@ -200,6 +285,21 @@ class Board(object):
         None
         """
         row, col = move
+        if self.__rays__ is not None and self.__blocked_count__ == self.move_count:
+            self.__blocked__ |= 1 << (row * self.width + col)
+            self.__blocked_count__ += 1
+        cache = self.__blank_spaces__
+        if cache is not None:
+            if cache[0] == self.move_count and self.move_count < 2:
+                # copies share the cached list, so it is never modified
+                blanks = cache[1][:]
+                try:
+                    blanks.remove(move)
+                    self.__blank_spaces__ = (self.move_count + 1, blanks)
+                except ValueError:
+                    self.__blank_spaces__ = None
+            else:
+                self.__blank_spaces__ = None
         self.__last_player_move__[self.active_player] = move
         self.__board_state__[row][col] = self.__player_symbols__[self.active_player]
         self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
@@ -249,22 +349,51 @@ class Board(object):
 
     def __get_moves__(self, move):
         """
-        Generate the list of possible moves for an L-shaped motion (like a
-        knight in chess).
+        Generate the list of possible moves from `move` under the movement
+        rule of the board: the leaper moves (an L-shaped motion like a
+        knight in chess by default) followed by the slider moves.
         """
 
         if move == Board.NOT_MOVED:
             return self.get_blank_spaces()
 
         r, c = move
-
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2),  (1, 2), (2, -1),  (2, 1)]
-
-        valid_moves = [(r+dr,c+dc) for dr, dc in directions if self.move_is_legal((r+dr, c+dc))]
-
+        state = self.__board_state__
+        valid_moves = [(tr, tc) for tr, tc in self.__leaps__[r][c] if not state[tr][tc]]
+        if self.__rays__ is not None:
+            valid_moves.extend(self.__slides__(r, c))
         return valid_moves
 
+    def __slides__(self, r, c):
+        """
+        Generate the slider moves from (r, c): the cells of every ray up to
+        the first blocked cell, found from the bitmask of blocked cells.
+        """
+        if self.__blocked_count__ != self.move_count:
+            # the bitmask is stale (e.g., the board state was set directly)
+            blocked = 0
+            for i, row in enumerate(self.__board_state__):
+                for j, value in enumerate(row):
+                    if value:
+                        blocked |= 1 << (i * self.width + j)
+            self.__blocked__, self.__blocked_count__ = blocked, self.move_count
+
+        blocked = self.__blocked__
+        moves = []
+        for cells, mask, origin, stride in self.__rays__[r][c]:
+            hits = mask & blocked
+            if not hits:
+                moves.extend(cells)
+                continue
+            # the nearest blocked cell is the lowest set bit on rays with
+            # increasing bit indices and the highest one otherwise
+            if hits & -hits > 1 << origin:
+                first = (hits & -hits).bit_length() - 1
+            else:
+                first = hits.bit_length() - 1
+            moves.extend(cells[:abs(first - origin) // stride - 1])
+        return moves
+
     def print_board(self):
         """
         Generate a string representation of the current game state, marking
@@ -296,7 +425,7 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, ponder=False, adjudicate=None):
         """
         Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
@@ -307,6 +436,18 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        ponder : bool (optional)
+            Flag indicating whether players that implement `ponder()` may
+            search during their opponent's turn. Pondering is started before
+            the opponent's clock starts, and players must stop it (with
+            `stop_pondering()`) during their own turn.
+
+        adjudicate : callable (optional)
+            Called with the board before every move; if it returns a player
+            (e.g., the proven winner, see `adjudication.py`), the game ends
+            with that player as the winner and the termination
+            "adjudicated".
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -314,14 +455,32 @@ class Board(object):
             move history, and a string indicating the reason for losing
             (e.g., timeout or invalid move).
         """
+        try:
+            return self.__play__(time_limit, ponder, adjudicate)
+        finally:
+            if ponder:
+                for player in (self.__player_1__, self.__player_2__):
+                    if hasattr(player, "stop_pondering"):
+                        player.stop_pondering()
+
+    def __play__(self, time_limit, ponder, adjudicate=None):
+        """ Implement the game loop of `play()`. """
         move_history = []
 
         curr_time_millis = lambda: 1000 * timeit.default_timer()
 
         while True:
 
+            if adjudicate is not None:
+                winner = adjudicate(self)
+                if winner is not None:
+                    return winner, move_history, "adjudicated"
+
             legal_player_moves = self.get_legal_moves()
 
+            if ponder and hasattr(self.inactive_player, "ponder"):
+                self.inactive_player.ponder(self.copy())
+
             game_copy = self.copy()
 
             move_start = curr_time_millis()
@@ -0,0 +1,111 @@
+"""
+This file contains the movement rules available to `isolation.Board`.
+
+A rule combines leaper steps (fixed offsets, like the knight or the king in
+chess) with slider rays (directions along which a piece moves any distance
+until it reaches the edge of the board or a blocked cell, like the queen).
+
+The targets of every cell are computed once per board size and cached on
+the rule, so move generation only has to filter precomputed lists. Rays are
+stored with a bitmask of their cells, using the bit index row * width + col,
+so that `Board` finds the first blocked cell of a ray with a single AND
+against its mask of blocked cells instead of testing every cell.
+"""
+
+
+class MoveRules(object):
+    """
+    Movement rule for the pieces of an Isolation board.
+
+    Parameters
+    ----------
+    name : str
+        A unique name for the rule; boards record the rule by name when
+        they are serialized.
+
+    steps : list<(int, int)> (optional)
+        The (row, column) offsets of the leaper moves, in the order in which
+        the moves are generated.
+
+    rays : list<(int, int)> (optional)
+        The (row, column) directions of the slider moves.
+    """
+
+    def __init__(self, name, steps=(), rays=()):
+        self.name = name
+        self.steps = tuple(steps)
+        self.rays = tuple(rays)
+        self._leaps = {}
+        self._rays = {}
+
+    def __repr__(self):
+        return "MoveRules({!r})".format(self.name)
+
+    def __reduce__(self):
+        # registered rules are unpickled as the shared instance, so that
+        # their tables are reused
+        if RULES.get(self.name) is self:
+            return (get_rules, (self.name,))
+        return (MoveRules, (self.name, self.steps, self.rays))
+
+    def leap_table(self, width, height):
+        """
+        Return the leaper targets of every cell: table[row][col] is the list
+        of (row, col) cells on the board reached with one step.
+        """
+        table = self._leaps.get((width, height))
+        if table is None:
+            table = [[[(r + dr, c + dc) for dr, dc in self.steps
+                       if 0 <= r + dr < height and 0 <= c + dc < width]
+                      for c in range(width)] for r in range(height)]
+            self._leaps[(width, height)] = table
+        return table
+
+    def ray_table(self, width, height):
+        """
+        Return the rays of every cell: table[row][col] is a list of (cells,
+        mask, origin, stride) for every direction with at least one cell on
+        the board, where `cells` lists the cells of the ray from the nearest
+        one outward, `mask` has the bits of those cells set, `origin` is the
+        bit index of (row, col) and `stride` the absolute difference of bit
+        indices between consecutive cells.
+        """
+        table = self._rays.get((width, height))
+        if table is None:
+            table = [[self._cell_rays(r, c, width, height) for c in range(width)]
+                     for r in range(height)]
+            self._rays[(width, height)] = table
+        return table
+
+    def _cell_rays(self, row, col, width, height):
+        rays = []
+        for dr, dc in self.rays:
+            cells = []
+            r, c = row + dr, col + dc
+            while 0 <= r < height and 0 <= c < width:
+                cells.append((r, c))
+                r, c = r + dr, c + dc
+            if cells:
+                mask = 0
+                for r, c in cells:
+                    mask |= 1 << (r * width + c)
+                rays.append((cells, mask, row * width + col, abs(dr * width + dc)))
+        return rays
+
+
+KING_STEPS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+KNIGHT = MoveRules("knight", steps=[(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                                    (1, -2), (1, 2), (2, -1), (2, 1)])
+KING = MoveRules("king", steps=KING_STEPS)
+QUEEN = MoveRules("queen", rays=KING_STEPS)
+
+RULES = {rules.name: rules for rules in (KNIGHT, KING, QUEEN)}
+
+
+def get_rules(name):
+    """ Return the registered rule with the given name. """
+    try:
+        return RULES[name]
+    except KeyError:
+        raise ValueError("Unknown movement rules: {!r}".format(name))
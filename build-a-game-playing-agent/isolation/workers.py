@@ -0,0 +1,165 @@
+"""
+This file contains the `ProcessPlayer` class, which runs an agent in a
+persistent worker process so that the per-move time limit of `Board.play`
+is enforced even when the agent hangs.
+
+`Board.play` only measures the time taken by `get_move` after it returns, so
+a slow or hung agent blocks the whole match. A `ProcessPlayer` is registered
+on the board in place of the agent. For every move it sends the serialized
+board to the worker, waits at most until the deadline, and stops the worker
+if no move arrived in time (the worker is restarted on the next move). The
+CPU time used by the worker for every move is recorded in `stats`.
+
+    player_1 = ProcessPlayer(CustomPlayer(score_fn=improved_score))
+    player_2 = ProcessPlayer(CustomPlayer(score_fn=open_move_score))
+    winner, history, termination = Board(player_1, player_2).play()
+    player_1.close()
+    player_2.close()
+"""
+
+import multiprocessing
+import time
+import timeit
+
+from collections import namedtuple
+
+from .isolation import Board
+
+
+MoveStats = namedtuple("MoveStats", ["cpu_ms", "wall_ms", "timeout"])
+
+# Stand-in for the opponent of the agent on the boards rebuilt in the worker
+OPPONENT = "opponent"
+
+
+def _worker(agent, conn):
+    """Serve move requests for `agent` until the connection is closed."""
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        state, seat, time_limit = request
+        start_wall = timeit.default_timer()
+        start_cpu = time.process_time()
+        time_left = lambda: time_limit - 1000 * (timeit.default_timer() - start_wall)
+
+        if seat == 1:
+            game = Board.deserialize(state, agent, OPPONENT)
+        else:
+            game = Board.deserialize(state, OPPONENT, agent)
+        move = agent.get_move(game, game.get_legal_moves(), time_left)
+
+        conn.send((move, 1000 * (time.process_time() - start_cpu),
+                   1000 * (timeit.default_timer() - start_wall)))
+
+
+class ProcessPlayer(object):
+    """Proxy player that runs `agent.get_move` in a persistent worker process
+    and enforces the time limit of each move.
+
+    Parameters
+    ----------
+    agent : object
+        An object with a get_move() function. With the "spawn" start method
+        the agent must be picklable.
+
+    start_method : str (optional)
+        The multiprocessing start method used for the worker; None uses the
+        platform default.
+    """
+
+    def __init__(self, agent, start_method=None):
+        self.agent = agent
+        self.stats = []
+        self._ctx = multiprocessing.get_context(start_method)
+        self._process = None
+        self._conn = None
+
+    def __str__(self):
+        return "ProcessPlayer({!s})".format(self.agent)
+
+    def start(self):
+        """ Start the worker process if it is not running. """
+        if self._process is not None and self._process.is_alive():
+            return
+        self._conn, child_conn = self._ctx.Pipe()
+        self._process = self._ctx.Process(target=_worker, args=(self.agent, child_conn))
+        self._process.daemon = True
+        self._process.start()
+        child_conn.close()
+
+    def kill(self):
+        """ Stop the worker process immediately. """
+        if self._process is None:
+            return
+        self._process.terminate()
+        self._process.join()
+        self._conn.close()
+        self._process = self._conn = None
+
+    def close(self):
+        """ Ask the worker process to exit, and stop it if it does not. """
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(1.)
+        self.kill()
+
+    def get_move(self, game, legal_moves, time_left):
+        """Forward the move request to the worker process and return its
+        answer, or `Board.NOT_MOVED` if it did not answer before the timer
+        expired.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        legal_moves : list<(int, int)>
+            A list containing legal moves. Moves are encoded as tuples of pairs
+            of ints defining the next (row, col) for the agent to occupy.
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        ----------
+        (int, int)
+            The move selected by the agent in the worker process.
+        """
+        self.start()
+        start = timeit.default_timer()
+        seat = 1 if game.__player_1__ is self else 2
+        self._conn.send((game.serialize(), seat, time_left()))
+
+        # wait until the deadline has passed, so that Board.play always
+        # scores a missing answer as a timeout
+        remaining = time_left()
+        while remaining >= 0 and not self._conn.poll(remaining / 1000. + 1e-3):
+            remaining = time_left()
+
+        if remaining < 0 and not self._conn.poll():
+            self.kill()
+            wall_ms = 1000 * (timeit.default_timer() - start)
+            self.stats.append(MoveStats(None, wall_ms, True))
+            return Board.NOT_MOVED
+
+        try:
+            move, cpu_ms, wall_ms = self._conn.recv()
+        except EOFError:
+            # the worker died (e.g., the agent raised an exception)
+            self.kill()
+            self.stats.append(MoveStats(None, 1000 * (timeit.default_timer() - start), False))
+            return Board.NOT_MOVED
+        self.stats.append(MoveStats(cpu_ms, wall_ms, time_left() < 0))
+        return move
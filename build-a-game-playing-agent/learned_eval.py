@@ -0,0 +1,342 @@
+"""
+Learned evaluation function: a linear model or a small multilayer perceptron
+trained offline with NumPy on positions from recorded games.
+
+Every position is described by the features in `FEATURES`, computed from the
+point of view of the player being scored with the movement rule of the
+board, and the model predicts the final result of the game for that player
+(+1 win, -1 loss). Search scores positions for the player that just moved
+as well as for the side to move, so the features include whose turn it is
+and every training position is used from the point of view of both
+players. Models are stored in a
+compact .npz weights file and loaded as a `LearnedScore`, which can be used
+as the `score_fn` of `CustomPlayer`:
+
+    python learned_eval.py train games.jsonl --model mlp --output eval.npz
+    python learned_eval.py bench eval.npz
+
+    player = CustomPlayer(score_fn=LearnedScore.load("eval.npz"))
+
+Recorded games are JSON lines {"width": 7, "height": 7, "moves": [[r, c],
+...], "winner": 1}, where "winner" is the seat (1 or 2) of the winner.
+Position records written by `selfplay.py` are read with --selfplay.
+
+`LearnedScore.batch` evaluates a list of sibling positions with one matrix
+product; minimax and alpha-beta use it for the leaves below depth-1 nodes
+(alpha-beta then evaluates every leaf of the node, including the ones a
+cutoff would have skipped). The `bench`
+command reports the cost per leaf of the single and batched paths next to
+`custom_score`, so that the gain in accuracy can be weighed against the
+search depth lost to the slower evaluation.
+"""
+
+import argparse
+import gzip
+import json
+import math
+import random
+import timeit
+
+import numpy as np
+
+from isolation import Board
+from game_agent import custom_score
+
+import selfplay
+
+
+FEATURES = ["own_moves", "opp_moves", "own_moves_2", "opp_moves_2", "overlap",
+            "distance", "own_region", "opp_region", "blank_fraction", "to_move"]
+
+# Flood fills stop after this many cells; larger regions are equivalent
+# for the purpose of evaluation
+REGION_LIMIT = 24
+
+
+def _second_order(game, moves):
+    """ Number of distinct blank cells reachable in two moves. """
+    reach = set()
+    for move in moves:
+        reach.update(game.__get_moves__(move))
+    return len(reach)
+
+
+def _region(game, loc):
+    """ Number of blank cells reachable from `loc`, up to REGION_LIMIT. """
+    seen = set()
+    frontier = [loc]
+    while frontier and len(seen) < REGION_LIMIT:
+        for cell in game.__get_moves__(frontier.pop()):
+            if cell not in seen:
+                seen.add(cell)
+                frontier.append(cell)
+    return min(len(seen), REGION_LIMIT)
+
+
+def features(game, player):
+    """Return the feature vector of `game` from the point of view of
+    `player`, as a list in the order of `FEATURES`.
+    """
+    opponent = game.get_opponent(player)
+    own_moves = game.get_legal_moves(player)
+    opp_moves = game.get_legal_moves(opponent)
+    own_loc = game.get_player_location(player)
+    opp_loc = game.get_player_location(opponent)
+    total = game.width * game.height
+    to_move = 1. if player == game.active_player else 0.
+
+    if own_loc is None or opp_loc is None:
+        # before both players are placed every blank cell is reachable
+        blank = total - game.move_count
+        return [len(own_moves), len(opp_moves), blank, blank, 0., 0.,
+                REGION_LIMIT, REGION_LIMIT, float(blank) / total, to_move]
+
+    overlap = len(set(own_moves) & set(opp_moves))
+    distance = math.sqrt((own_loc[0] - opp_loc[0]) ** 2 + (own_loc[1] - opp_loc[1]) ** 2)
+    return [len(own_moves), len(opp_moves),
+            _second_order(game, own_moves), _second_order(game, opp_moves),
+            overlap, distance,
+            _region(game, own_loc), _region(game, opp_loc),
+            float(total - game.move_count) / total, to_move]
+
+
+def feature_matrix(samples):
+    """Extract the features of a batch of (game, player) pairs as an
+    array of shape (len(samples), len(FEATURES)).
+    """
+    return np.array([features(game, player) for game, player in samples], dtype=float)
+
+
+def replay(record):
+    """Replay a recorded game and yield (game, player, result) for every
+    position after both players are placed, where `result` is +1 if
+    `player` (the side to move) won the game and -1 otherwise.
+    """
+    game = Board(1, 2, record["width"], record["height"])
+    for move in record["moves"]:
+        game.apply_move(tuple(move))
+        if game.move_count >= 2:
+            player = game.active_player
+            yield game.copy(), player, 1. if player == record["winner"] else -1.
+
+
+def both_sides(positions):
+    """Yield every (game, player, result) of `positions` followed by the
+    same position from the point of view of the opponent of `player`.
+    """
+    for game, player, result in positions:
+        yield game, player, result
+        yield game, game.get_opponent(player), -result
+
+
+def read_games(path):
+    """ Read recorded games from a JSON lines file (gzip if *.gz). """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as stream:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class LearnedScore(object):
+    """Evaluation function backed by a trained linear model or a small MLP.
+
+    Parameters
+    ----------
+    weights : dict
+        The model arrays: "mean" and "std" to standardize the features, and
+        "w1", "b1" (linear model), plus "w2", "b2" for the MLP whose hidden
+        layer uses tanh.
+    """
+
+    def __init__(self, weights):
+        self.weights = dict((k, np.asarray(v, dtype=float)) for k, v in weights.items())
+        self.mlp = "w2" in self.weights
+        # the single-position path of the linear model is a plain Python dot
+        # product, which is faster than NumPy for a handful of features
+        if not self.mlp:
+            w = self.weights["w1"].ravel() / self.weights["std"]
+            self._coef = w.tolist()
+            self._bias = float(self.weights["b1"].ravel()[0] -
+                               np.dot(w, self.weights["mean"]))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(dict(data.items()))
+
+    def save(self, path):
+        np.savez_compressed(path, **self.weights)
+
+    def _forward(self, x):
+        h = (x - self.weights["mean"]) / self.weights["std"]
+        h = np.dot(h, self.weights["w1"]) + self.weights["b1"]
+        if self.mlp:
+            h = np.dot(np.tanh(h), self.weights["w2"]) + self.weights["b2"]
+        return h[:, 0]
+
+    def __call__(self, game, player):
+        if game.is_loser(player):
+            return float("-inf")
+        if game.is_winner(player):
+            return float("inf")
+        x = features(game, player)
+        if not self.mlp:
+            return self._bias + sum(c * v for c, v in zip(self._coef, x))
+        return float(self._forward(np.array([x], dtype=float))[0])
+
+    def batch(self, games, player):
+        """ Score a list of sibling positions with one forward pass. """
+        scores = [None] * len(games)
+        rows, index = [], []
+        for i, game in enumerate(games):
+            if game.is_loser(player):
+                scores[i] = float("-inf")
+            elif game.is_winner(player):
+                scores[i] = float("inf")
+            else:
+                rows.append(features(game, player))
+                index.append(i)
+        if rows:
+            for i, score in zip(index, self._forward(np.array(rows, dtype=float)).tolist()):
+                scores[i] = score
+        return scores
+
+
+def train(x, y, model="linear", hidden=16, epochs=200, learning_rate=0.01,
+          batch_size=256, seed=0):
+    """Fit a model to predict `y` from the feature matrix `x` by minimizing
+    the mean squared error with Adam.
+
+    Parameters
+    ----------
+    model : {'linear', 'mlp'} (optional)
+        A linear model or a perceptron with one tanh hidden layer.
+
+    Returns
+    ----------
+    `LearnedScore`
+    """
+    rng = np.random.RandomState(seed)
+    y = np.asarray(y, dtype=float).reshape(-1, 1)
+    mean, std = x.mean(axis=0), x.std(axis=0)
+    std[std == 0] = 1.
+    z = (x - mean) / std
+
+    n_in = x.shape[1]
+    if model == "mlp":
+        params = {"w1": rng.randn(n_in, hidden) / math.sqrt(n_in), "b1": np.zeros(hidden),
+                  "w2": rng.randn(hidden, 1) / math.sqrt(hidden), "b2": np.zeros(1)}
+    else:
+        params = {"w1": np.zeros((n_in, 1)), "b1": np.zeros(1)}
+    moments = dict((k, (np.zeros_like(v), np.zeros_like(v))) for k, v in params.items())
+
+    step = 0
+    for _ in range(epochs):
+        order = rng.permutation(len(z))
+        for start in range(0, len(z), batch_size):
+            idx = order[start:start + batch_size]
+            xb, yb = z[idx], y[idx]
+            if model == "mlp":
+                a = np.tanh(np.dot(xb, params["w1"]) + params["b1"])
+                err = 2. * (np.dot(a, params["w2"]) + params["b2"] - yb) / len(idx)
+                da = np.dot(err, params["w2"].T) * (1. - a * a)
+                grads = {"w2": np.dot(a.T, err), "b2": err.sum(axis=0),
+                         "w1": np.dot(xb.T, da), "b1": da.sum(axis=0)}
+            else:
+                err = 2. * (np.dot(xb, params["w1"]) + params["b1"] - yb) / len(idx)
+                grads = {"w1": np.dot(xb.T, err), "b1": err.sum(axis=0)}
+
+            step += 1
+            for k, g in grads.items():
+                m, v = moments[k]
+                m[:] = 0.9 * m + 0.1 * g
+                v[:] = 0.999 * v + 0.001 * g * g
+                m_hat, v_hat = m / (1. - 0.9 ** step), v / (1. - 0.999 ** step)
+                params[k] -= learning_rate * m_hat / (np.sqrt(v_hat) + 1e-8)
+
+    params.update({"mean": mean, "std": std})
+    return LearnedScore(params)
+
+
+def benchmark(score, positions, repeat=3):
+    """Measure the cost per leaf of `custom_score` and of the single and
+    batched paths of `score` (in microseconds).
+
+    `positions` is a list of (game, player) pairs; consecutive positions are
+    grouped as batches of the size of a typical sibling list.
+    """
+    def best_of(fn):
+        times = []
+        for _ in range(repeat):
+            start = timeit.default_timer()
+            fn()
+            times.append(timeit.default_timer() - start)
+        return 1e6 * min(times) / len(positions)
+
+    batches = [positions[i:i + 8] for i in range(0, len(positions), 8)]
+    return {
+        "custom_score": best_of(lambda: [custom_score(g, p) for g, p in positions]),
+        "learned": best_of(lambda: [score(g, p) for g, p in positions]),
+        "learned_batch": best_of(lambda: [score.batch([g for g, _ in b], b[0][1])
+                                          for b in batches]),
+    }
+
+
+def sample_positions(count, seed=0, width=7, height=7):
+    """ Sample (game, player) pairs from random games. """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = Board(1, 2, width, height)
+        for _ in range(rng.randint(2, width * height // 2)):
+            moves = game.get_legal_moves()
+            if not moves:
+                break
+            game.apply_move(rng.choice(moves))
+        if game.get_legal_moves() and game.move_count >= 2:
+            positions.append((game, game.active_player))
+    return positions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and benchmark learned evaluators.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    train_parser = subparsers.add_parser("train", help="train a model on recorded games")
+    train_parser.add_argument("games", nargs="*", help="JSON lines files of recorded games")
+    train_parser.add_argument("--selfplay", nargs="+", default=[],
+                              help="shard files or directories written by selfplay.py")
+    train_parser.add_argument("--model", choices=["linear", "mlp"], default="linear")
+    train_parser.add_argument("--hidden", type=int, default=16)
+    train_parser.add_argument("--epochs", type=int, default=200)
+    train_parser.add_argument("--output", default="eval.npz")
+
+    bench_parser = subparsers.add_parser("bench", help="benchmark the cost per leaf")
+    bench_parser.add_argument("weights")
+    bench_parser.add_argument("--positions", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        positions = [position for path in args.games for record in read_games(path)
+                     for position in replay(record)]
+        positions.extend((game, player, float(record["result"])) for game, player, record
+                         in selfplay.load_positions(args.selfplay))
+        samples, targets = [], []
+        for game, player, result in both_sides(positions):
+            samples.append((game, player))
+            targets.append(result)
+        score = train(feature_matrix(samples), targets, args.model, args.hidden, args.epochs)
+        score.save(args.output)
+        print("trained {} model on {} positions: {}".format(args.model, len(samples),
+                                                            args.output))
+        return
+
+    score = LearnedScore.load(args.weights)
+    for name, cost in sorted(benchmark(score, sample_positions(args.positions)).items()):
+        print("{:<15}{:>10.2f} us/leaf".format(name, cost))
+
+
+if __name__ == "__main__":
+    main()
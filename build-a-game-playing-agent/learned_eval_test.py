@@ -0,0 +1,79 @@
+"""
+This file contains test cases for the learned evaluation functions of
+`learned_eval`, which require NumPy.
+"""
+import os
+import tempfile
+import unittest
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import isolation
+import game_agent
+import learned_eval
+
+
+def training_set(count=200):
+    """ Positions of random games from both sides, labelled with a mobility proxy. """
+    positions = learned_eval.sample_positions(count, seed=1)
+    samples, targets = [], []
+    for game, player in positions:
+        for side in (player, game.get_opponent(player)):
+            own = len(game.get_legal_moves(side))
+            opp = len(game.get_legal_moves(game.get_opponent(side)))
+            samples.append((game, side))
+            targets.append(1. if own > opp else -1.)
+    return samples, targets
+
+
+class LearnedEvalTest(unittest.TestCase):
+
+    def test_features_follow_rules_and_side(self):
+        """ Features use the movement rule of the board and tell whose turn it is """
+        for rules in (isolation.KNIGHT, isolation.KING, isolation.QUEEN):
+            game = isolation.Board(1, 2, 5, 5, rules=rules)
+            game.apply_move((2, 2))
+            game.apply_move((0, 0))
+            for player in (1, 2):
+                x = learned_eval.features(game, player)
+                self.assertEqual(len(x), len(learned_eval.FEATURES))
+                named = dict(zip(learned_eval.FEATURES, x))
+                self.assertEqual(named["own_moves"], len(game.get_legal_moves(player)))
+                self.assertEqual(named["to_move"], 1. if player == game.active_player else 0.)
+
+    def test_train_save_load_and_batch(self):
+        """ Trained models fit their data, survive a round trip and score
+        batches like single positions """
+        samples, targets = training_set()
+        x = learned_eval.feature_matrix(samples)
+        for model in ("linear", "mlp"):
+            score = learned_eval.train(x, targets, model, hidden=8, epochs=30)
+            predicted = [score(game, player) for game, player in samples]
+            accuracy = np.mean(np.sign(predicted) == np.sign(targets))
+            self.assertGreater(accuracy, 0.8)
+
+            path = os.path.join(tempfile.mkdtemp(), "eval.npz")
+            score.save(path)
+            loaded = learned_eval.LearnedScore.load(path)
+            games = [game for game, _ in samples[:16]]
+            player = samples[0][1]
+            single = [loaded(game, player) for game in games]
+            np.testing.assert_allclose(loaded.batch(games, player), single)
+            np.testing.assert_allclose(single, [score(game, player) for game in games])
+
+    def test_player_uses_learned_score(self):
+        """ Alpha-beta with a learned score plays a legal move through the batched path """
+        samples, targets = training_set(50)
+        score = learned_eval.train(learned_eval.feature_matrix(samples), targets, epochs=5)
+        agent = game_agent.CustomPlayer(3, score, False, "alphabeta")
+        game = isolation.Board(agent, "opponent")
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        move = agent.get_move(game, game.get_legal_moves(), lambda: 1e3)
+        self.assertIn(move, game.get_legal_moves())
+
+
+if __name__ == '__main__':
+    unittest.main()
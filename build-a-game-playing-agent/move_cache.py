@@ -0,0 +1,101 @@
+"""
+Persistent cache of the moves of deterministic agents.
+
+A fixed-depth `CustomPlayer` always plays the same move in the same
+position, yet tournaments make it repeat its search every time a position
+recurs. `MoveCache` stores the move chosen by such an agent in a SQLite
+database, keyed by the fingerprint of the agent and of the position (see
+`fingerprint.py`), so the search runs once across all games, runs and
+worker processes sharing the file:
+
+    cache = MoveCache("moves.sqlite")
+    player = CustomPlayer(5, improved_score, False, "alphabeta", move_cache=cache)
+
+Only completed searches are stored: a search that timed out returns
+whatever move it had, which depends on the machine load. Agents searching
+with iterative deepening are never cached, since their moves depend on the
+time limit.
+"""
+
+import os
+import sqlite3
+
+import fingerprint
+
+
+class MoveCache(object):
+    """SQLite-backed store of the moves of deterministic agents.
+
+    The database is opened lazily in every process that uses the cache, so
+    a cache can be shared with worker processes (forked or pickled). Moves
+    looked up or stored by a process are also kept in memory.
+
+    Parameters
+    ----------
+    path : str
+        The database file; ":memory:" keeps the cache in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._memory = {}
+        self._agents = {}
+        self._db = None
+        self._pid = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.update(_db=None, _pid=None, _agents={})
+        return state
+
+    def _connect(self):
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30.)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS moves (agent TEXT, position TEXT, "
+                             "row INTEGER, col INTEGER, PRIMARY KEY (agent, position))")
+            self._db.commit()
+            self._pid = os.getpid()
+        return self._db
+
+    def _key(self, agent, game):
+        # the fingerprint of an agent is computed once per agent object
+        agent_key = self._agents.get(id(agent))
+        if agent_key is None or agent_key[0] is not agent:
+            agent_key = (agent, fingerprint.agent_fingerprint(agent))
+            self._agents[id(agent)] = agent_key
+        return agent_key[1], fingerprint.position_fingerprint(game)
+
+    def get(self, agent, game):
+        """ Return the cached move of `agent` in `game`, or None. """
+        key = self._key(agent, game)
+        move = self._memory.get(key)
+        if move is None:
+            row = self._connect().execute(
+                "SELECT row, col FROM moves WHERE agent = ? AND position = ?", key).fetchone()
+            if row is not None:
+                move = self._memory[key] = tuple(row)
+        if move is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return move
+
+    def put(self, agent, game, move):
+        """ Store the move of `agent` in `game`. """
+        key = self._key(agent, game)
+        self._memory[key] = tuple(move)
+        db = self._connect()
+        db.execute("INSERT OR REPLACE INTO moves VALUES (?, ?, ?, ?)", key + tuple(move))
+        db.commit()
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM moves").fetchone()[0]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,267 @@
+"""
+Suite of balanced openings for tournaments.
+
+`tournament.play_match` starts every pair of games from two random opening
+moves (the placements of both players), and many of those positions favor
+one side, so the results of a match depend on the draw as much as on the
+agents. Search scores do not tell these openings apart (a deep alpha-beta
+score of almost every opening is 0), so this tool plays sampled games from
+every candidate opening instead: both sides are fixed-depth alpha-beta
+agents that play a random move with a small probability, and the score of
+an opening is the mean result of its games for the player to move (+1 for a
+win, -1 for a loss). The openings whose score is closest to equal are kept,
+one per class of openings equivalent under the symmetries of the board.
+
+The suite is stored as a small text file, one opening per line with its
+moves and score:
+
+    # openings depth=3 games=20 height=7 noise=0.1 score=improved width=7
+    0,2 5,3 0
+    1,2 2,1 -0.1
+    ...
+
+and `tournament.py --openings FILE` plays match k of every pairing from
+opening k of the suite, so every agent is tested on the same positions.
+`compare` measures the spread of the scores of a suite with new games, next
+to the spread of as many random openings:
+
+    python openings.py generate --count 100 --output openings.txt
+    python openings.py compare openings.txt
+    python tournament.py --openings openings.txt
+"""
+
+import argparse
+import multiprocessing
+import random
+import statistics
+
+from collections import namedtuple
+
+from isolation import Board
+from game_agent import CustomPlayer
+from heuristics import SCORE_FUNCTIONS
+
+
+Opening = namedtuple("Opening", ["moves", "score"])
+
+GAMES = 20
+DEPTH = 3
+NOISE = 0.1
+MAX_SCORE = 0.2
+
+
+def symmetries(width, height):
+    """ Return the functions mapping a cell to its images under the symmetries of the board. """
+    maps = [lambda r, c: (r, c),
+            lambda r, c: (height - 1 - r, c),
+            lambda r, c: (r, width - 1 - c),
+            lambda r, c: (height - 1 - r, width - 1 - c)]
+    if width == height:
+        maps += [lambda r, c: (c, r),
+                 lambda r, c: (width - 1 - c, r),
+                 lambda r, c: (c, height - 1 - r),
+                 lambda r, c: (width - 1 - c, height - 1 - r)]
+    return maps
+
+
+def canonical_openings(width=7, height=7):
+    """Return one opening (a pair of placements) of every class of openings
+    that are equivalent under the symmetries of the board.
+    """
+    maps = symmetries(width, height)
+    cells = [(r, c) for r in range(height) for c in range(width)]
+    openings = set()
+    for first in cells:
+        for second in cells:
+            if first != second:
+                openings.add(min(tuple(f(*m) for m in (first, second)) for f in maps))
+    return sorted(openings)
+
+
+class NoisyPlayer(CustomPlayer):
+    """Fixed-depth alpha-beta player that plays a random move from `rng`
+    with probability `noise`, so that games from one opening differ.
+    """
+
+    def __init__(self, depth, score_fn, noise, rng):
+        CustomPlayer.__init__(self, depth, score_fn, False, "alphabeta")
+        self.noise = noise
+        self.rng = rng
+
+    def get_move(self, game, legal_moves, time_left):
+        if legal_moves and self.rng.random() < self.noise:
+            return self.rng.choice(legal_moves)
+        return CustomPlayer.get_move(self, game, legal_moves, time_left)
+
+
+def play_opening(job):
+    """Return the score of an opening for the player to move after it: the
+    mean result (+1 for a win, -1 for a loss) of `games` games played from
+    it by two `NoisyPlayer` agents. The games are seeded with `seed` and
+    the opening.
+    """
+    moves, games, depth, noise, score_name, width, height, seed = job
+    rng = random.Random("{}:{}".format(seed, moves))
+    score_fn = SCORE_FUNCTIONS[score_name]
+    total = 0
+    for _ in range(games):
+        game = Board(NoisyPlayer(depth, score_fn, noise, rng),
+                     NoisyPlayer(depth, score_fn, noise, rng), width, height)
+        for move in moves:
+            game.apply_move(move)
+        mover = game.active_player
+        winner, _, _ = game.play(time_limit=float("inf"))
+        total += 1 if winner is mover else -1
+    return total / float(games)
+
+
+def _play_openings(pool, games, depth, noise, score_name, width, height, seed, processes):
+    jobs = [(moves, games, depth, noise, score_name, width, height, seed) for moves in pool]
+    if processes == 1:
+        return list(map(play_opening, jobs))
+    workers = multiprocessing.Pool(processes)
+    try:
+        return workers.map(play_opening, jobs)
+    finally:
+        workers.close()
+        workers.join()
+
+
+def generate(count, games=GAMES, depth=DEPTH, noise=NOISE, max_score=MAX_SCORE,
+             candidates=None, score_name="improved", width=7, height=7, seed=0,
+             processes=None):
+    """Play games from candidate openings and return the `count` most
+    balanced ones.
+
+    Parameters
+    ----------
+    count : int
+        The size of the suite; openings scoring more than `max_score` away
+        from equal are dropped even if the suite ends up smaller.
+
+    games, depth, noise : int, int, float (optional)
+        The number of games played from every candidate, and the search
+        depth and random move probability of the agents playing them (see
+        `play_opening`).
+
+    candidates : int (optional)
+        The number of symmetry classes sampled (with `seed`) and played;
+        all of them by default.
+
+    seed : int (optional)
+        Seeds the sample of candidates, their games and the order of the
+        openings with equal scores.
+
+    Returns
+    ----------
+    list<`Opening`>
+        The openings sorted from the most balanced.
+    """
+    # openings with equal scores are kept in a random order, so that the
+    # suite does not favor some region of the board
+    pool = canonical_openings(width, height)
+    random.Random(seed).shuffle(pool)
+    if candidates is not None:
+        pool = pool[:candidates]
+    scores = _play_openings(pool, games, depth, noise, score_name, width, height, seed,
+                            processes)
+    openings = [Opening(moves, score) for moves, score in zip(pool, scores)
+                if abs(score) <= max_score]
+    openings.sort(key=lambda o: abs(o.score))
+    return openings[:count]
+
+
+def compare(suite, games=GAMES, depth=DEPTH, noise=NOISE, score_name="improved", width=7,
+            height=7, seed=1, processes=None):
+    """Return the variance of the scores of the openings of `suite` and of
+    as many random openings, all measured with new games (seeded with
+    `seed`, which should differ from the seed of the suite).
+
+    The score of a random opening varies with the advantage it gives, the
+    score of a balanced opening only with the noise of the games.
+    """
+    rng = random.Random(seed)
+    cells = [(r, c) for r in range(height) for c in range(width)]
+    pool = [tuple(opening.moves) for opening in suite]
+    pool += [tuple(rng.sample(cells, 2)) for _ in suite]
+    scores = _play_openings(pool, games, depth, noise, score_name, width, height, seed,
+                            processes)
+    return (statistics.pvariance(scores[:len(suite)]),
+            statistics.pvariance(scores[len(suite):]))
+
+
+def save(path, openings, **settings):
+    """ Write a suite, with the settings used to generate it as a header. """
+    with open(path, "w") as stream:
+        stream.write("# openings " + " ".join("{}={}".format(k, v)
+                                              for k, v in sorted(settings.items())) + "\n")
+        for opening in openings:
+            stream.write(" ".join("{},{}".format(*m) for m in opening.moves))
+            stream.write(" {!r}\n".format(opening.score))
+
+
+def load(path):
+    """ Read a suite written by `save()`. """
+    openings = []
+    with open(path) as stream:
+        for line in stream:
+            if not line.strip() or line.startswith("#"):
+                continue
+            fields = line.split()
+            moves = tuple(tuple(int(x) for x in field.split(",")) for field in fields[:-1])
+            openings.append(Opening(moves, float(fields[-1])))
+    return openings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a suite of balanced openings.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    gen = subparsers.add_parser("generate")
+    gen.add_argument("--count", type=int, default=100)
+    gen.add_argument("--max-score", type=float, default=MAX_SCORE,
+                     help="largest absolute score of a kept opening")
+    gen.add_argument("--candidates", type=int,
+                     help="number of sampled candidates (default: all)")
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--output", default="openings.txt")
+    cmp = subparsers.add_parser("compare")
+    cmp.add_argument("path")
+    cmp.add_argument("--seed", type=int, default=1)
+    for sub in (gen, cmp):
+        sub.add_argument("--games", type=int, default=GAMES,
+                         help="games played from every opening")
+        sub.add_argument("--depth", type=int, default=DEPTH)
+        sub.add_argument("--noise", type=float, default=NOISE,
+                         help="probability of a random move")
+        sub.add_argument("--score", default="improved", choices=list(SCORE_FUNCTIONS))
+        sub.add_argument("--size", type=int, default=7)
+        sub.add_argument("--processes", type=int)
+    show = subparsers.add_parser("show")
+    show.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        openings = load(args.path)
+        for opening in openings:
+            print(" ".join("{},{}".format(*m) for m in opening.moves), opening.score)
+        return
+
+    if args.command == "compare":
+        suite = load(args.path)
+        balanced, unbalanced = compare(suite, args.games, args.depth, args.noise, args.score,
+                                       args.size, args.size, args.seed, args.processes)
+        print("score variance over {} openings: suite {:.3f}, random openings {:.3f}".format(
+            len(suite), balanced, unbalanced))
+        return
+
+    openings = generate(args.count, args.games, args.depth, args.noise, args.max_score,
+                        args.candidates, args.score, args.size, args.size, args.seed,
+                        args.processes)
+    save(args.output, openings, width=args.size, height=args.size, games=args.games,
+         depth=args.depth, noise=args.noise, score=args.score)
+    print("{} openings written to {}".format(len(openings), args.output))
+
+
+if __name__ == "__main__":
+    main()
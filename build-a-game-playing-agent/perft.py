@@ -0,0 +1,173 @@
+"""
+Perft-style benchmark of move generation in `isolation.Board`.
+
+For each position of a fixed suite the benchmark counts the leaf nodes of
+the game tree to a fixed depth (the number of move sequences of exactly
+that length; games that end earlier contribute no leaves), checks the count
+against a stored reference value, and reports nodes per second. Every
+counting method ("path") must reproduce the reference counts, so the suite
+verifies correctness and speed at the same time:
+
+    forecast  get_legal_moves() and forecast_move() at every node
+    bulk      like forecast, but the leaves are counted from the length of
+              the legal move list one ply above the horizon
+
+The results are printed as JSON so that runs can be stored and compared
+across releases:
+
+    python perft.py                 # full suite
+    python perft.py --quick         # the fastest positions only
+    python perft.py --output perft.json
+    python perft.py --compare perft.json   # speed relative to a stored run
+"""
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+from collections import namedtuple
+
+from isolation import Board
+
+
+Position = namedtuple("Position", ["name", "width", "height", "moves", "depth", "nodes"])
+
+# Fixed positions with the reference leaf counts at the given depth. The
+# moves are applied alternately by both players from an empty board.
+POSITIONS = [
+    Position("5x5-open", 5, 5, [], 4, 7712),
+    Position("5x5-mid", 5, 5, [(2, 2), (0, 0), (0, 1), (1, 2)], 10, 1999),
+    Position("7x7-open", 7, 7, [], 4, 52672),
+    Position("7x7-early", 7, 7, [(3, 3), (0, 0)], 7, 16440),
+    Position("7x7-mid", 7, 7, [(3, 3), (0, 0), (1, 2), (2, 1), (0, 4), (4, 2),
+                               (2, 5), (6, 3)], 9, 75708),
+    Position("9x9-early", 9, 9, [(4, 4), (0, 0)], 6, 11524),
+    Position("11x11-early", 11, 11, [(5, 5), (10, 10)], 6, 17104),
+]
+
+# Positions that run in well under a second, for use in tests
+QUICK = ["5x5-open", "5x5-mid", "7x7-early", "9x9-early"]
+
+
+def perft_forecast(game, depth):
+    """ Count the leaves with `forecast_move` at every node. """
+    if depth == 0:
+        return 1
+    return sum(perft_forecast(game.forecast_move(move), depth - 1)
+               for move in game.get_legal_moves())
+
+
+def perft_bulk(game, depth):
+    """ Count the leaves with `forecast_move`, using the number of legal
+    moves one ply above the horizon. """
+    moves = game.get_legal_moves()
+    if depth == 1:
+        return len(moves)
+    if depth == 0:
+        return 1
+    return sum(perft_bulk(game.forecast_move(move), depth - 1) for move in moves)
+
+
+PATHS = {"forecast": perft_forecast, "bulk": perft_bulk}
+
+
+def make_board(position):
+    """ Create the board of a suite position. """
+    board = Board("player_1", "player_2", position.width, position.height)
+    for move in position.moves:
+        board.apply_move(move)
+    return board
+
+
+def run(positions=POSITIONS, paths=sorted(PATHS), repeat=1):
+    """Run the benchmark on the given positions and counting paths.
+
+    Parameters
+    ----------
+    positions : list<Position> (optional)
+        The positions to count.
+
+    paths : list<str> (optional)
+        The names of the counting methods in `PATHS` to run.
+
+    repeat : int (optional)
+        The number of times each count is timed; the fastest run is kept.
+
+    Returns
+    ----------
+    dict
+        A JSON-serializable report with one entry per position and path.
+    """
+    results = []
+    for position in positions:
+        board = make_board(position)
+        for path in paths:
+            perft = PATHS[path]
+            best = None
+            for _ in range(repeat):
+                start = timeit.default_timer()
+                nodes = perft(board, position.depth)
+                elapsed = timeit.default_timer() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results.append({
+                "position": position.name,
+                "size": "{}x{}".format(position.width, position.height),
+                "path": path,
+                "depth": position.depth,
+                "nodes": nodes,
+                "expected": position.nodes,
+                "ok": nodes == position.nodes,
+                "seconds": round(best, 6),
+                "nodes_per_second": round(nodes / best) if best else None,
+            })
+    return {
+        "benchmark": "perft",
+        "python": platform.python_version(),
+        "ok": all(r["ok"] for r in results),
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    """Add the speed of every result relative to a stored report as the
+    "speedup" field (greater than 1 is faster than the baseline).
+    """
+    previous = dict(((r["position"], r["path"]), r) for r in baseline["results"])
+    for result in report["results"]:
+        old = previous.get((result["position"], result["path"]))
+        if old and old["nodes_per_second"] and result["nodes_per_second"]:
+            result["speedup"] = round(float(result["nodes_per_second"]) /
+                                      old["nodes_per_second"], 3)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft benchmark for isolation.Board.")
+    parser.add_argument("--quick", action="store_true",
+                        help="only run the fastest positions: " + ", ".join(QUICK))
+    parser.add_argument("--path", action="append", choices=sorted(PATHS),
+                        help="counting path to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of a previous run to compare with")
+    args = parser.parse_args(argv)
+
+    positions = [p for p in POSITIONS if not args.quick or p.name in QUICK]
+    report = run(positions, args.path or sorted(PATHS), args.repeat)
+    if args.compare:
+        with open(args.compare) as stream:
+            compare(report, json.load(stream))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as stream:
+            stream.write(text + "\n")
+    print(text)
+    if not report["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
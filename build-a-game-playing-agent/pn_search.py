@@ -0,0 +1,233 @@
+"""
+Proof-number search for forced wins and losses.
+
+Alpha-beta search only sees a forced win once its depth reaches the end of
+the game. `ProofSolver` proves or disproves that the player to move wins by
+depth-first proof-number search (df-pn): it expands the node that is
+cheapest to prove or disprove, as measured by proof and disproof numbers,
+so it follows the narrow forcing lines of Isolation endgames instead of
+searching every move to a fixed depth. Positions are kept in a
+transposition table, keyed by the blocked cells and the locations of the
+player to move and its opponent, so positions reached by different move
+orders are solved once.
+
+The table holds at most `max_entries` positions: when it is full, the half
+of the entries with the smallest solved subtrees is dropped. Every call of
+`solve` or `winning_move` searches at most `max_nodes` nodes, and results
+found by earlier calls are reused.
+
+    solver = ProofSolver()
+    solver.solve(game)         # True, False or None if not proven in time
+    solver.winning_move(game)  # a move that keeps a proven win, or None
+
+`CustomPlayer(solver=ProofSolver())` tries the solver before searching when
+the position looks decided (see `ProofSolver.decided`) and plays the
+winning move of a proven win.
+"""
+
+import adjudication
+
+
+INF = 1 << 30
+
+
+class _Budget(Exception):
+    """ The node budget of a search ran out, or the search was stopped. """
+
+
+class ProofSolver(object):
+    """Depth-first proof-number search with a transposition table.
+
+    Parameters
+    ----------
+    max_nodes : int (optional)
+        The node budget of every call of `solve` or `winning_move`; None
+        searches until the position is solved.
+
+    max_entries : int (optional)
+        The maximum number of positions in the transposition table.
+
+    max_blanks : int (optional)
+        The largest number of blank cells of a position that `decided`
+        considers worth solving (partitioned positions are always tried).
+    """
+
+    def __init__(self, max_nodes=200000, max_entries=1 << 20, max_blanks=24):
+        self.max_nodes = max_nodes
+        self.max_entries = max_entries
+        self.max_blanks = max_blanks
+        self.table = {}
+        self.nodes = 0
+        self._graphs = {}
+        self._limit = 0
+        self._stop = None
+
+    def _graph(self, game):
+        """ Return the move targets of every cell of the board, by bit index. """
+        size = (game.width, game.height, game.rules.name)
+        graph = self._graphs.get(size)
+        if graph is None:
+            width = game.width
+            leaps = [[r * width + c for r, c in targets]
+                     for row in game.rules.leap_table(game.width, game.height)
+                     for targets in row]
+            rays = None
+            if game.rules.rays:
+                rays = [[([r * width + c for r, c in cells], mask, origin, stride)
+                         for cells, mask, origin, stride in cell_rays]
+                        for row in game.rules.ray_table(game.width, game.height)
+                        for cell_rays in row]
+            graph = self._graphs[size] = (game.width * game.height, leaps, rays)
+        return graph
+
+    def _key(self, game):
+        width = game.width
+        blocked = 0
+        for cell in range(game.width * game.height):
+            if not game.move_is_legal((cell // width, cell % width)):
+                blocked |= 1 << cell
+        locs = []
+        for player in (game.active_player, game.inactive_player):
+            loc = game.get_player_location(player)
+            locs.append(-1 if loc is None else loc[0] * width + loc[1])
+        return blocked, locs[0], locs[1]
+
+    def _moves(self, graph, blocked, loc):
+        cells, leaps, rays = graph
+        if loc < 0:
+            return [cell for cell in range(cells) if not blocked >> cell & 1]
+        moves = [cell for cell in leaps[loc] if not blocked >> cell & 1]
+        if rays is not None:
+            # the nearest blocked cell of a ray, as in `Board.__slides__`
+            for targets, mask, origin, stride in rays[loc]:
+                hits = mask & blocked
+                if not hits:
+                    moves.extend(targets)
+                elif hits & -hits > 1 << origin:
+                    moves.extend(targets[:((hits & -hits).bit_length() - 1 - origin) //
+                                         stride - 1])
+                else:
+                    moves.extend(targets[:(origin - hits.bit_length() + 1) // stride - 1])
+        return moves
+
+    def _store(self, key, pn, dn, work):
+        table = self.table
+        if len(table) >= self.max_entries and key not in table:
+            # keep the half of the entries with the largest solved subtrees
+            entries = sorted(table.items(), key=lambda item: item[1][2])
+            self.table = table = dict(entries[len(entries) // 2:])
+        table[key] = (pn, dn, work)
+
+    def _reset_budget(self):
+        self._limit = float("inf") if self.max_nodes is None else self.nodes + self.max_nodes
+
+    def _mid(self, graph, key, thpn, thdn):
+        """Search `key` until its proof number reaches `thpn` or its
+        disproof number reaches `thdn`, in the negamax form of df-pn: the
+        proof number of a node is the smallest disproof number of its
+        children and its disproof number the sum of their proof numbers.
+        """
+        self.nodes += 1
+        if self.nodes > self._limit or (self._stop is not None and not self.nodes & 255
+                                        and self._stop()):
+            raise _Budget()
+        start = self.nodes
+        blocked, mover, other = key
+        moves = self._moves(graph, blocked, mover)
+        if not moves:
+            self._store(key, INF, 0, 1)
+            return
+
+        # children are initialized with a proof number of 1 and the number
+        # of moves of their player as the disproof number, so replies that
+        # leave the opponent the fewest moves are tried first
+        children = []
+        for move in moves:
+            child_blocked = blocked | 1 << move
+            child = (child_blocked, other, move)
+            count = len(self._moves(graph, child_blocked, other))
+            children.append((child, (1, count) if count else (INF, 0)))
+
+        table = self.table
+        while True:
+            pn, dn = INF, 0
+            best, best_pn, second = None, 0, INF
+            for child, initial in children:
+                child_pn, child_dn = table.get(child, initial)[:2]
+                dn += child_pn
+                if child_dn < pn:
+                    second = pn
+                    pn, best, best_pn = child_dn, child, child_pn
+                elif child_dn < second:
+                    second = child_dn
+            dn = min(dn, INF)
+            if pn >= thpn or dn >= thdn:
+                break
+            self._mid(graph, best, min(INF, thdn - dn + best_pn), min(thpn, second + 1))
+            table = self.table
+        self._store(key, pn, dn, self.nodes - start + 1)
+
+    def _solve(self, game, stop):
+        graph = self._graph(game)
+        key = self._key(game)
+        entry = self.table.get(key)
+        if entry is None or (entry[0] and entry[1]):
+            self._reset_budget()
+            self._stop = stop
+            try:
+                self._mid(graph, key, INF, INF)
+            except _Budget:
+                return None
+            finally:
+                self._stop = None
+            entry = self.table.get(key)
+        return graph, key, entry[0] == 0
+
+    def solve(self, game, stop=None):
+        """Return True if the player to move in `game` wins under perfect
+        play, False if it loses, or None if the node budget ran out or
+        `stop()` returned True.
+        """
+        result = self._solve(game, stop)
+        return None if result is None else result[2]
+
+    def winning_move(self, game, stop=None):
+        """Return a move that wins `game` for the player to move under
+        perfect play, or None if the position is lost or not proven.
+        """
+        result = self._solve(game, stop)
+        if result is None or not result[2]:
+            return None
+        graph, (blocked, mover, other), _ = result
+        width = game.width
+        for move in self._moves(graph, blocked, mover):
+            child = (blocked | 1 << move, other, move)
+            entry = self.table.get(child)
+            if entry is None:
+                # dropped from the table; solving the child again is cheap
+                # next to the proof of the root
+                self._reset_budget()
+                try:
+                    self._mid(graph, child, INF, INF)
+                except _Budget:
+                    return None
+                entry = self.table[child]
+            if entry[1] == 0:
+                return move // width, move % width
+        return None
+
+    def decided(self, game):
+        """Return True if the position looks decided enough to try the
+        solver: few blank cells, or players that can no longer meet.
+        """
+        if game.width * game.height - game.move_count <= self.max_blanks:
+            return True
+        loc_active = game.get_player_location(game.active_player)
+        loc_inactive = game.get_player_location(game.inactive_player)
+        if loc_active is None or loc_inactive is None or game.rules.rays:
+            return False
+        return not adjudication.region(game, loc_active) & \
+            adjudication.region(game, loc_inactive)
+
+    def clear(self):
+        self.table = {}
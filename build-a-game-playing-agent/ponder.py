@@ -0,0 +1,204 @@
+"""
+This file contains the `Ponderer` class that lets a `CustomPlayer` search on
+the opponent's time.
+
+While the opponent is thinking, the ponderer predicts the opponent's reply
+and runs an iterative deepening search of the resulting position in a
+background process. When the opponent plays the predicted move the next
+call to `get_move` starts from the deepest completed result instead of
+depth 1 (a "ponder hit"); otherwise the result is discarded.
+
+The background process competes for the CPU with the opponent's timed
+search, so pondering is only fair when it can run on a core of its own.
+Pondering is therefore disabled on machines with fewer than two available
+cores. Where the platform supports it, the worker is pinned to a single
+core and runs at a lower scheduling priority. The worker is stopped at the
+start of the pondering player's own turn, so the cost of stopping it is
+charged to that player's clock.
+"""
+
+import multiprocessing
+import os
+import timeit
+
+
+PONDER_NICENESS = 5
+MIN_CPUS = 2
+
+
+def available_cpus():
+    """ Return the number of cores the current process may run on. """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _ponder_worker(player, game, stop, conn):
+    """Search `game` with iterative deepening until the stop flag is set,
+    sending (depth, move, score, nodes, elapsed) for every completed
+    iteration, where `elapsed` is in milliseconds.
+    """
+    try:
+        os.nice(PONDER_NICENESS)
+    except (AttributeError, OSError):
+        pass
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, cpus[-1:])
+    except (AttributeError, OSError):
+        pass
+
+    # The search checks the timer at every node, so setting the stop flag
+    # makes the search raise `Timeout` almost immediately. The flag is a
+    # shared value read without taking a lock.
+    player.time_left = lambda: float("-inf") if stop.value else float("inf")
+    search = player.alphabeta if player.method == "alphabeta" else player.minimax
+    max_depth = game.width * game.height - game.move_count
+
+    try:
+        for depth in range(1, max_depth + 1):
+            nodes = player.nodes
+            start = timeit.default_timer()
+            score, move = search(game, depth)
+            elapsed = 1000 * (timeit.default_timer() - start)
+            conn.send((depth, move, score, player.nodes - nodes, elapsed))
+            if move == (-1, -1) or abs(score) == float("inf"):
+                break
+    except Exception:
+        # Timeout (or any other failure) simply ends the pondering search
+        pass
+    finally:
+        conn.close()
+
+
+def same_position(game_a, game_b):
+    """ Return True if both boards encode the same game state. """
+    return game_a.move_count == game_b.move_count and \
+        game_a.active_player == game_b.active_player and \
+        game_a.get_player_location(game_a.active_player) == \
+        game_b.get_player_location(game_b.active_player) and \
+        game_a.get_player_location(game_a.inactive_player) == \
+        game_b.get_player_location(game_b.inactive_player) and \
+        game_a.__board_state__ == game_b.__board_state__
+
+
+class Ponderer(object):
+    """Background search of the predicted position on the opponent's time.
+
+    Pondering needs the "fork" start method to hand the board and player to
+    the worker without pickling them, and at least `MIN_CPUS` available
+    cores; otherwise `enabled` is False and pondering does nothing.
+
+    Parameters
+    ----------
+    player : `game_agent.CustomPlayer`
+        The player that ponders. The worker uses its search method and
+        heuristic.
+
+    join_timeout : float (optional)
+        Seconds to wait for the worker to stop cooperatively before it is
+        terminated.
+    """
+
+    def __init__(self, player, join_timeout=0.005):
+        self.player = player
+        self.join_timeout = join_timeout
+        self.enabled = "fork" in multiprocessing.get_all_start_methods() and \
+            available_cpus() >= MIN_CPUS
+        self.position = None
+        self.hits = 0
+        self.misses = 0
+        self._process = None
+        self._stop = None
+        self._conn = None
+        self._results = []
+
+    def predict_reply(self, game):
+        """Predict the opponent's reply in `game` (the opponent is the active
+        player) as the move that minimizes the player's heuristic score.
+        """
+        best_move, best_score = None, float("inf")
+        for move in game.get_legal_moves():
+            score = self.player.score(game.forecast_move(move), self.player)
+            if best_move is None or score < best_score:
+                best_move, best_score = move, score
+        return best_move
+
+    def start(self, game):
+        """Start pondering on the position that follows the predicted
+        opponent reply in `game`.
+        """
+        self.stop()
+        if not self.enabled or game.inactive_player != self.player:
+            return
+        reply = self.predict_reply(game)
+        if reply is None:
+            return
+
+        ctx = multiprocessing.get_context("fork")
+        self.position = game.forecast_move(reply)
+        self._stop = ctx.RawValue("b", 0)
+        self._conn, child_conn = ctx.Pipe(duplex=False)
+        self._results = []
+        self._process = ctx.Process(target=_ponder_worker,
+                                    args=(self.player, self.position, self._stop, child_conn))
+        self._process.daemon = True
+        self._process.start()
+        child_conn.close()
+
+    def wait(self, timeout=None):
+        """Wait until the worker completes its next iteration, and return
+        False if no new result arrived within `timeout` seconds.
+        """
+        if self._conn is None:
+            return False
+        try:
+            if not self._conn.poll(timeout):
+                return False
+            self._results.append(self._conn.recv())
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def stop(self):
+        """Stop the background search and return the position it searched
+        with the list of completed iterations, each a tuple (depth, move,
+        score, nodes, elapsed), or None if no iteration finished.
+        """
+        if self._process is None:
+            return None
+
+        self._stop.value = 1
+        self._process.join(self.join_timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+
+        try:
+            while self._conn.poll():
+                self._results.append(self._conn.recv())
+        except (EOFError, OSError):
+            pass
+        self._conn.close()
+        self._process = self._stop = self._conn = None
+
+        position, self.position = self.position, None
+        results, self._results = self._results, []
+        if not results:
+            return None
+        return position, results
+
+    def probe(self, game):
+        """Stop pondering and return the list of completed iterations if
+        they were computed for the position in `game`, or None otherwise.
+        """
+        result = self.stop()
+        if result is None:
+            return None
+        position, iterations = result
+        if same_position(position, game):
+            self.hits += 1
+            return iterations
+        self.misses += 1
+        return None
@@ -0,0 +1,337 @@
+"""
+All-play-all cross-tables and Bradley-Terry (Elo) ratings for many agents.
+
+Games between N agents are recorded in a `CrossTable`. The ratings are the
+maximum-likelihood estimate of the Bradley-Terry model, in which agent i
+beats agent j with probability
+
+    P(i beats j) = 1 / (1 + 10 ** ((elo_j - elo_i) / 400))
+
+fitted with the minorization-maximization (MM) algorithm of Hunter (2004).
+Every agent also plays `prior` virtual games (half won, half lost) against
+a fixed opponent rated 0, so that the ratings stay finite for agents that
+won or lost all of their games, and the ratings are reported relative to
+their mean. Confidence intervals come from the inverse of the Fisher
+information matrix of the fitted model.
+
+Matches are scheduled in batches with one of three schedulers:
+
+    roundrobin  every pair in turn
+    swiss       agents with close ratings, avoiding repeated pairings
+    adaptive    the pairs whose rating difference is least certain, i.e.,
+                the largest expected reduction of the variance of the
+                difference per game, var(d) * p * (1 - p)
+
+The adaptive scheduler separates agents of different strength with far
+fewer games than repeated round-robins, since it stops spending games on
+pairs whose order is already clear:
+
+    python ratings.py --schedule adaptive --matches 300
+"""
+
+import argparse
+import itertools
+import math
+import random
+
+from collections import namedtuple
+
+import openings
+import tournament
+
+from game_agent import CustomPlayer
+from game_agent import custom_score
+from move_cache import MoveCache
+from sample_players import RandomPlayer
+from sample_players import improved_score
+from sample_players import null_score
+from sample_players import open_move_score
+
+
+ELO_SCALE = 400. / math.log(10.)
+SCHEDULES = ["roundrobin", "swiss", "adaptive"]
+
+Rating = namedtuple("Rating", ["name", "elo", "low", "high", "games", "score"])
+
+
+class CrossTable(object):
+    """Pairwise results between a fixed list of agents.
+
+    Parameters
+    ----------
+    names : list<str>
+        The names of the agents; agents are referred to by their index.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        n = len(self.names)
+        self.wins = [[0] * n for _ in range(n)]
+
+    def add(self, i, j, wins_i, wins_j):
+        """ Record `wins_i` wins of agent i and `wins_j` of agent j against each other. """
+        self.wins[i][j] += wins_i
+        self.wins[j][i] += wins_j
+
+    def games(self, i, j):
+        return self.wins[i][j] + self.wins[j][i]
+
+    def total_games(self):
+        return sum(map(sum, self.wins))
+
+    def format(self, order=None):
+        """ Return the cross-table as text, with rows in the given order. """
+        order = list(range(len(self.names))) if order is None else order
+        width = max(len(name) for name in self.names)
+        lines = [" " * (width + 2) + "".join("{:>7}".format(k + 1) for k in range(len(order)))]
+        for k, i in enumerate(order):
+            cells = []
+            for j in order:
+                cells.append("{:>7}".format("-" if i == j else "{}/{}".format(
+                    self.wins[i][j], self.games(i, j))))
+            lines.append("{:>2} {:<{}}".format(k + 1, self.names[i], width) + "".join(cells))
+        return "\n".join(lines)
+
+
+def fit(wins, prior=1., iterations=10000, tolerance=1e-10):
+    """Fit the Bradley-Terry model to a matrix of wins with the MM
+    algorithm.
+
+    Parameters
+    ----------
+    wins : list<list<int>>
+        wins[i][j] is the number of games agent i won against agent j.
+
+    prior : float (optional)
+        The number of virtual games of every agent against an opponent of
+        strength 1, half of them won.
+
+    Returns
+    ----------
+    list<float>
+        The natural logarithm of the strength of every agent.
+    """
+    n = len(wins)
+    gamma = [1.] * n
+    won = [sum(wins[i]) + prior / 2. for i in range(n)]
+    for _ in range(iterations):
+        change = 0.
+        for i in range(n):
+            denominator = prior / (gamma[i] + 1.)
+            for j in range(n):
+                games = wins[i][j] + wins[j][i]
+                if games:
+                    denominator += games / (gamma[i] + gamma[j])
+            new = won[i] / denominator
+            change = max(change, abs(math.log(new / gamma[i])))
+            gamma[i] = new
+        if change < tolerance:
+            break
+    return [math.log(g) for g in gamma]
+
+
+def _invert(matrix):
+    """ Invert a symmetric positive definite matrix by Gauss-Jordan elimination. """
+    n = len(matrix)
+    a = [list(row) + [float(i == j) for j in range(n)] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        a[col], a[pivot] = a[pivot], a[col]
+        scale = a[col][col]
+        a[col] = [v / scale for v in a[col]]
+        for r in range(n):
+            if r != col and a[r][col]:
+                factor = a[r][col]
+                a[r] = [v - factor * p for v, p in zip(a[r], a[col])]
+    return [row[n:] for row in a]
+
+
+def covariance(theta, wins, prior=1.):
+    """Return the covariance matrix of the fitted log-strengths `theta`, the
+    inverse of the Fisher information of the model.
+    """
+    n = len(theta)
+    information = [[0.] * n for _ in range(n)]
+    for i in range(n):
+        p = 1. / (1. + math.exp(-theta[i]))
+        information[i][i] += prior * p * (1. - p)
+        for j in range(n):
+            games = wins[i][j] + wins[j][i]
+            if i != j and games:
+                p = 1. / (1. + math.exp(theta[j] - theta[i]))
+                information[i][i] += games * p * (1. - p)
+                information[i][j] -= games * p * (1. - p)
+    return _invert(information)
+
+
+def ratings(table, prior=1., z=1.96):
+    """Fit the ratings of a cross-table.
+
+    Returns
+    ----------
+    list<`Rating`>, list<list<float>>
+        The rating of every agent, sorted from the strongest, with the
+        bounds of its confidence interval (by default 95%) and its number
+        and fraction of games won; and the covariance matrix of the
+        log-strengths, indexed like the cross-table.
+    """
+    theta = fit(table.wins, prior)
+    cov = covariance(theta, table.wins, prior)
+    mean = sum(theta) / len(theta)
+    result = []
+    for i, name in enumerate(table.names):
+        elo = ELO_SCALE * (theta[i] - mean)
+        margin = z * ELO_SCALE * math.sqrt(max(cov[i][i], 0.))
+        games = sum(table.games(i, j) for j in range(len(theta)))
+        score = float(sum(table.wins[i])) / games if games else 0.
+        result.append(Rating(name, elo, elo - margin, elo + margin, games, score))
+    result.sort(key=lambda r: r.elo, reverse=True)
+    return result, cov
+
+
+def round_robin_pairs(table, count):
+    """ Return the next `count` pairs in the cycle over all pairs. """
+    pairs = list(itertools.combinations(range(len(table.names)), 2))
+    # continue the cycle from the pair with the fewest games
+    start = min(range(len(pairs)), key=lambda k: table.games(*pairs[k]))
+    return [pairs[(start + k) % len(pairs)] for k in range(count)]
+
+
+def swiss_pairs(table, count, theta):
+    """Pair agents with adjacent ratings, preferring pairs that have met
+    the least, for up to `count` pairs of distinct agents.
+    """
+    order = sorted(range(len(theta)), key=lambda i: -theta[i])
+    pairs = []
+    while len(order) >= 2 and len(pairs) < count:
+        i = order.pop(0)
+        # the closest few candidates by rating, fewest meetings first
+        j = min(order[:3], key=lambda j: (table.games(i, j), abs(theta[i] - theta[j])))
+        order.remove(j)
+        pairs.append((i, j))
+    return pairs
+
+
+def adaptive_pairs(table, count, theta, cov):
+    """Return the `count` pairs with the largest expected reduction of the
+    variance of their rating difference per game.
+    """
+    def gain(pair):
+        i, j = pair
+        p = 1. / (1. + math.exp(theta[j] - theta[i]))
+        return (cov[i][i] + cov[j][j] - 2 * cov[i][j]) * p * (1. - p)
+    pairs = itertools.combinations(range(len(theta)), 2)
+    return sorted(pairs, key=gain, reverse=True)[:count]
+
+
+def run(agents, matches, schedule="adaptive", batch=None, play=tournament.play_match,
+        prior=1., callback=None, suite=None):
+    """Play `matches` matches (two games each, see `tournament.play_match`)
+    between the agents and return the cross-table.
+
+    Parameters
+    ----------
+    agents : list<`tournament.Agent`>
+
+    schedule : {'roundrobin', 'swiss', 'adaptive'} (optional)
+        The pairing scheduler. The adaptive scheduler starts with a Swiss
+        round so that every agent has played.
+
+    batch : int (optional)
+        The number of matches scheduled between refits of the ratings; by
+        default half the number of agents.
+
+    play : callable (optional)
+        play(player1, player2) returns the wins of both players.
+
+    suite : list<`openings.Opening`> (optional)
+        Match k starts from opening k (modulo the size of the suite),
+        passed to `play` as the `opening` keyword argument.
+
+    callback : callable (optional)
+        Called with the cross-table after every batch.
+    """
+    table = CrossTable([agent.name for agent in agents])
+    batch = batch or max(1, len(agents) // 2)
+    played = 0
+    while played < matches:
+        count = min(batch, matches - played)
+        theta = fit(table.wins, prior)
+        if schedule == "roundrobin":
+            pairs = round_robin_pairs(table, count)
+        elif schedule == "swiss" or not played:
+            pairs = swiss_pairs(table, count, theta)
+        elif schedule == "adaptive":
+            pairs = adaptive_pairs(table, count, theta, covariance(theta, table.wins, prior))
+        else:
+            raise ValueError("unknown schedule: {!r}".format(schedule))
+        for k, (i, j) in enumerate(pairs):
+            if suite:
+                opening = suite[(played + k) % len(suite)].moves
+                wins_i, wins_j = play(agents[i].player, agents[j].player, opening=opening)
+            else:
+                wins_i, wins_j = play(agents[i].player, agents[j].player)
+            table.add(i, j, wins_i, wins_j)
+        played += len(pairs)
+        if callback is not None:
+            callback(table)
+    return table
+
+
+def report(table, prior=1.):
+    """ Return the rating list and cross-table as text. """
+    result, _ = ratings(table, prior)
+    index = dict((name, i) for i, name in enumerate(table.names))
+    lines = ["{:>2} {:<15}{:>8}{:>17}{:>7}{:>8}".format("", "agent", "elo", "95% interval",
+                                                       "games", "score")]
+    for k, r in enumerate(result):
+        lines.append("{:>2} {:<15}{:>8.0f}   [{:>5.0f}, {:>5.0f}]{:>7}{:>7.0f}%".format(
+            k + 1, r.name, r.elo, r.low, r.high, r.games, 100 * r.score))
+    lines.append("")
+    lines.append(table.format([index[r.name] for r in result]))
+    return "\n".join(lines)
+
+
+def default_agents():
+    """ The agents of `tournament.py`, for rating against each other. """
+    heuristics = [("Null", null_score), ("Open", open_move_score),
+                  ("Improved", improved_score)]
+    agents = [tournament.Agent(RandomPlayer(), "Random")]
+    for name, h in heuristics:
+        agents.append(tournament.Agent(CustomPlayer(3, h, False, "minimax"), "MM_" + name))
+    for name, h in heuristics:
+        agents.append(tournament.Agent(CustomPlayer(5, h, False, "alphabeta"), "AB_" + name))
+    agents.append(tournament.Agent(CustomPlayer(score_fn=improved_score, method="alphabeta"),
+                                   "ID_Improved"))
+    agents.append(tournament.Agent(CustomPlayer(score_fn=custom_score, method="alphabeta"),
+                                   "Student"))
+    return agents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rate agents against each other.")
+    parser.add_argument("--schedule", choices=SCHEDULES, default="adaptive")
+    parser.add_argument("--matches", type=int, default=200,
+                        help="number of matches (two games each)")
+    parser.add_argument("--batch", type=int, help="matches between refits")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--openings", help="file of openings generated by openings.py")
+    parser.add_argument("--move-cache",
+                        help="SQLite file caching the moves of the fixed-depth agents")
+    args = parser.parse_args(argv)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    agents = default_agents()
+    if args.move_cache:
+        cache = MoveCache(args.move_cache)
+        for agent in agents:
+            if isinstance(agent.player, CustomPlayer) and not agent.player.iterative:
+                agent.player.move_cache = cache
+    suite = openings.load(args.openings) if args.openings else None
+    table = run(agents, args.matches, args.schedule, args.batch, suite=suite)
+    print(report(table))
+
+
+if __name__ == "__main__":
+    main()
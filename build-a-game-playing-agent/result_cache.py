@@ -0,0 +1,102 @@
+"""
+Persistent cache of tournament match results.
+
+A match is identified by the fingerprints of both agents (see
+`fingerprint.py`; the first agent plays first in the first game), its
+opening, the seed of the random number generator at its start and a
+variant of the rules of play (e.g., "adjudicated" for games ended once
+their result is proven). With `tournament.py --result-cache FILE` every
+match is seeded, and matches whose identity is found in the cache are not
+played again, so only the pairings of agents whose code or parameters
+changed since the last run are replayed:
+
+    python tournament.py --result-cache results.sqlite --seed 0
+
+Results of time-limited agents depend on the machine and its load; the
+cache keeps the first result of every match, so delete the file to
+measure them again.
+"""
+
+import os
+import sqlite3
+
+import fingerprint
+
+
+def player_fingerprint(player):
+    """The fingerprint of a tournament player; players running in a worker
+    process (`isolation.workers.ProcessPlayer`) are identified by their agent.
+    """
+    return fingerprint.agent_fingerprint(getattr(player, "agent", player))
+
+
+class ResultCache(object):
+    """SQLite-backed store of match results.
+
+    Parameters
+    ----------
+    path : str
+        The database file; ":memory:" keeps the cache in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._players = {}
+        self._db = None
+        self._pid = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.update(_db=None, _pid=None, _players={})
+        return state
+
+    def _connect(self):
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30.)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (agent_1 TEXT, agent_2 TEXT, "
+                             "opening TEXT, seed INTEGER, variant TEXT, wins_1 INTEGER, "
+                             "wins_2 INTEGER, "
+                             "PRIMARY KEY (agent_1, agent_2, opening, seed, variant))")
+            self._db.commit()
+            self._pid = os.getpid()
+        return self._db
+
+    def _key(self, player1, player2, opening, seed, variant):
+        keys = []
+        for player in (player1, player2):
+            entry = self._players.get(id(player))
+            if entry is None or entry[0] is not player:
+                entry = self._players[id(player)] = (player, player_fingerprint(player))
+            keys.append(entry[1])
+        opening = "" if opening is None else " ".join("{},{}".format(*m) for m in opening)
+        return keys[0], keys[1], opening, seed, variant
+
+    def get(self, player1, player2, opening, seed, variant=""):
+        """ Return the cached (wins of player1, wins of player2), or None. """
+        row = self._connect().execute(
+            "SELECT wins_1, wins_2 FROM results WHERE agent_1 = ? AND agent_2 = ? AND "
+            "opening = ? AND seed = ? AND variant = ?",
+            self._key(player1, player2, opening, seed, variant)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tuple(row)
+
+    def put(self, player1, player2, opening, seed, wins_1, wins_2, variant=""):
+        """ Store the result of a match. """
+        db = self._connect()
+        db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                   self._key(player1, player2, opening, seed, variant) + (wins_1, wins_2))
+        db.commit()
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
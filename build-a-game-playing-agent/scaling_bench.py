@@ -0,0 +1,135 @@
+"""
+Per-node cost of the board and the search as the board grows.
+
+For every board size (7x7 to 31x31 by default) the benchmark samples
+positions from random games with a fixed fraction of the board filled, and
+reports the mean cost in microseconds of the operations performed at every
+search node:
+
+    copy        Board.copy()
+    forecast    Board.forecast_move() of a legal move
+    moves       Board.get_legal_moves()
+    opening     Board.forecast_move() of a placement and the legal moves of
+                the second player, who is not placed yet
+    <score>     one call of every score function in SCORE_FUNCTIONS
+    search      the time per node of a fixed-depth alpha-beta search
+
+Operations whose cost scales with the occupancy of the board rather than
+its area keep a flat profile across sizes; `copy` grows with the area, as
+the board is stored as one list of cells per row. The report is printed as
+JSON:
+
+    python scaling_bench.py
+    python scaling_bench.py --sizes 7 15 31 --output scaling.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import timeit
+
+from isolation import Board
+from game_agent import CustomPlayer
+from heuristics import SCORE_FUNCTIONS
+
+
+SIZES = [7, 11, 15, 19, 23, 27, 31]
+SCORES = ["improved", "custom"]
+
+
+def sample_positions(size, count, fill=0.15, seed=0):
+    """Sample positions from random games on a size x size board, with at
+    least `fill` of the cells blocked (or fewer if the game ends sooner).
+    """
+    rng = random.Random("{}:{}".format(seed, size))
+    positions = []
+    while len(positions) < count:
+        game = Board("player_1", "player_2", size, size)
+        for _ in range(max(2, int(fill * size * size))):
+            moves = game.get_legal_moves()
+            if not moves:
+                break
+            game.apply_move(rng.choice(moves))
+        if game.get_legal_moves():
+            positions.append(game)
+    return positions
+
+
+def per_call(fn, args, repeat=3):
+    """ Return the best mean time of fn(*a) over `args`, in microseconds. """
+    best = None
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        for a in args:
+            fn(*a)
+        elapsed = timeit.default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return 1e6 * best / len(args)
+
+
+def search_cost(positions, depth):
+    """ Return the time per node of an alpha-beta search, in microseconds. """
+    player = CustomPlayer(depth, SCORE_FUNCTIONS["improved"], False, "alphabeta")
+    player.time_left = lambda: float("inf")
+    elapsed = 0.
+    nodes = 0
+    for game in positions:
+        if game.active_player == game.__player_1__:
+            game = Board.deserialize(game.serialize(), player, "opponent")
+        else:
+            game = Board.deserialize(game.serialize(), "opponent", player)
+        player.nodes = 0
+        start = timeit.default_timer()
+        player.search_root(game, depth)
+        elapsed += timeit.default_timer() - start
+        nodes += player.nodes
+    return 1e6 * elapsed / nodes
+
+
+def run(sizes=SIZES, count=200, depth=3, scores=SCORES):
+    """ Measure every size and return a JSON-serializable report. """
+    results = []
+    for size in sizes:
+        positions = sample_positions(size, count)
+        forecasts = [(game, game.get_legal_moves()[0]) for game in positions]
+        # as at the root of a search, the legal moves of the empty board are
+        # generated once before its children are expanded
+        empty = Board("player_1", "player_2", size, size)
+        empty.get_legal_moves()
+        result = {
+            "size": size,
+            "copy": per_call(Board.copy, [(game,) for game in positions]),
+            "forecast": per_call(Board.forecast_move, forecasts),
+            "moves": per_call(Board.get_legal_moves, [(game,) for game in positions]),
+            "opening": per_call(lambda g: g.forecast_move((0, 0)).get_legal_moves(),
+                                [(empty,)] * 20),
+        }
+        for name in scores:
+            score_fn = SCORE_FUNCTIONS[name]
+            result[name] = per_call(score_fn, [(g, g.active_player) for g in positions])
+        result["search"] = search_cost(positions[:max(1, count // 20)], depth)
+        results.append(dict((k, round(v, 3)) for k, v in result.items()))
+    return {"benchmark": "scaling", "python": platform.python_version(),
+            "positions": count, "depth": depth, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-node cost across board sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--positions", type=int, default=200,
+                        help="sampled positions per size")
+    parser.add_argument("--depth", type=int, default=3, help="alpha-beta search depth")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.positions, args.depth)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as stream:
+            stream.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Benchmark harness for `CustomPlayer` search.
+
+Tournament win rates are too noisy to catch performance regressions, so this
+script measures the search itself on a fixed corpus of midgame positions for
+every combination of search method and registered score function (see
+`heuristics.SCORE_FUNCTIONS`):
+
+    fixed-depth  nodes searched, time and best move at a fixed depth
+    fixed-time   depth reached and nodes per second with iterative
+                 deepening under a fixed time limit per move
+
+Node counts and best moves are deterministic, so any change is reported.
+Selective search options (--lmr, --pvs, --extend-forced) can be enabled to
+measure their effect on node counts and depth against a baseline run.
+Times are repeated and compared with Welch's t-test, and only slowdowns that
+are both statistically significant and larger than a minimum effect size are
+flagged:
+
+    python search_bench.py run --output baseline.json
+    python search_bench.py run --output new.json
+    python search_bench.py compare baseline.json new.json
+"""
+
+import argparse
+import json
+import math
+import platform
+import sys
+import timeit
+
+from isolation import Board
+from game_agent import CustomPlayer
+from heuristics import SCORE_FUNCTIONS
+
+
+# Midgame positions on a 7x7 board, as the moves played from an empty board
+CORPUS = [
+    [(5, 0), (6, 0), (4, 2), (4, 1), (6, 1), (3, 3), (5, 3), (4, 5), (3, 2), (2, 4)],
+    [(2, 5), (6, 4), (0, 6), (5, 2), (1, 4), (6, 0), (0, 2), (4, 1), (2, 1), (3, 3),
+     (1, 3), (1, 2), (3, 4)],
+    [(6, 3), (3, 4), (4, 2), (1, 5), (5, 0), (2, 3), (6, 2), (4, 4), (4, 1), (2, 5)],
+    [(4, 5), (3, 6), (6, 6), (2, 4), (5, 4), (4, 3), (4, 2), (3, 5), (6, 1), (1, 4),
+     (5, 3)],
+    [(2, 4), (3, 4), (3, 2), (5, 3), (1, 3), (6, 5), (0, 1), (4, 6), (2, 2), (2, 5),
+     (4, 3), (0, 6), (3, 1), (1, 4), (2, 3)],
+    [(5, 4), (0, 1), (6, 2), (1, 3), (4, 3), (2, 5), (5, 1), (3, 3), (6, 3), (1, 4)],
+    [(5, 3), (3, 6), (4, 5), (4, 4), (6, 4), (6, 5), (4, 3), (4, 6), (6, 2), (5, 4),
+     (4, 1), (3, 5)],
+    [(2, 5), (4, 1), (0, 6), (2, 2), (1, 4), (0, 3), (0, 2), (2, 4), (1, 0), (4, 5),
+     (3, 1), (2, 6), (5, 0), (3, 4), (4, 2), (1, 3)],
+    [(0, 6), (6, 1), (2, 5), (5, 3), (4, 6), (3, 2), (3, 4), (5, 1), (2, 6), (3, 0),
+     (4, 5), (4, 2), (3, 3)],
+    [(2, 6), (3, 2), (3, 4), (2, 4), (1, 3), (0, 3), (2, 1), (2, 2), (3, 3), (1, 4),
+     (4, 1), (0, 6), (5, 3), (2, 5), (4, 5), (4, 4), (6, 4)],
+    [(4, 0), (2, 3), (5, 2), (0, 4), (6, 4), (1, 6), (4, 5), (3, 5), (2, 4), (1, 4),
+     (0, 3), (2, 6), (2, 2), (0, 5), (3, 0), (1, 3), (4, 2), (2, 5)],
+    [(4, 2), (5, 5), (2, 1), (3, 6), (1, 3), (1, 5), (3, 2), (2, 3), (5, 1), (0, 4),
+     (3, 0), (1, 6), (1, 1), (2, 4), (0, 3), (0, 5), (2, 2), (2, 6)],
+]
+
+METHODS = ["minimax", "alphabeta"]
+DEPTHS = {"minimax": 3, "alphabeta": 5}
+TIME_LIMIT = 50
+TIMEOUT = 10.
+
+# Selective search options of CustomPlayer that can be enabled from the CLI
+SEARCH_OPTIONS = ["lmr", "pvs", "extend_forced"]
+
+
+def make_board(player, moves):
+    """ Create a corpus position with `player` holding initiative. """
+    if len(moves) % 2:
+        board = Board("opponent", player)
+    else:
+        board = Board(player, "opponent")
+    for move in moves:
+        board.apply_move(move)
+    return board
+
+
+def make_timer(time_limit):
+    """ Return a time_left function for a turn starting now. """
+    start = timeit.default_timer()
+    return lambda: time_limit - 1000 * (timeit.default_timer() - start)
+
+
+def fixed_depth(method, heuristic, depth, corpus, repeat, options=None):
+    """Search every corpus position to a fixed depth.
+
+    Returns
+    ----------
+    dict
+        Per-position node counts and best moves, and the total time of the
+        corpus for every repetition (in milliseconds).
+    """
+    player = CustomPlayer(depth, SCORE_FUNCTIONS[heuristic], False, method, **(options or {}))
+    player.time_left = lambda: float("inf")
+    nodes, moves, times = [], [], []
+    for run in range(repeat):
+        total = 0.
+        for position in corpus:
+            game = make_board(player, position)
+            player.nodes = 0
+            player.root_results = {}
+            start = timeit.default_timer()
+            _, move = player.search_root(game, depth)
+            total += 1000 * (timeit.default_timer() - start)
+            if run == 0:
+                nodes.append(player.nodes)
+                moves.append(move)
+        times.append(total)
+    return {"mode": "fixed-depth", "method": method, "heuristic": heuristic,
+            "depth": depth, "nodes": nodes, "moves": moves, "times": times}
+
+
+def fixed_time(method, heuristic, time_limit, corpus, repeat, options=None):
+    """Search every corpus position with iterative deepening for a fixed
+    time per move.
+
+    Returns
+    ----------
+    dict
+        The depth reached for every position and repetition, and the mean
+        nodes per second over the corpus for every repetition.
+    """
+    player = CustomPlayer(score_fn=SCORE_FUNCTIONS[heuristic], iterative=True,
+                          method=method, timeout=TIMEOUT, **(options or {}))
+    depths, nps = [], []
+    for _ in range(repeat):
+        run_depths, run_nodes, run_time = [], 0, 0.
+        for position in corpus:
+            game = make_board(player, position)
+            player.nodes = 0
+            time_left = make_timer(time_limit)
+            player.get_move(game, game.get_legal_moves(), time_left)
+            run_time += (time_limit - time_left()) / 1000.
+            run_nodes += player.nodes
+            run_depths.append(player.last_depth)
+        depths.append(run_depths)
+        nps.append(run_nodes / run_time)
+    return {"mode": "fixed-time", "method": method, "heuristic": heuristic,
+            "time_limit": time_limit, "depths": depths, "nps": nps}
+
+
+def run(methods=METHODS, heuristics=list(SCORE_FUNCTIONS), depths=DEPTHS,
+        time_limit=TIME_LIMIT, corpus=CORPUS, repeat=5, options=None):
+    """Run both benchmark modes and return a JSON-serializable report.
+
+    `options` are extra `CustomPlayer` arguments, e.g. {"lmr": True} to
+    measure the effect of a selective search option.
+    """
+    options = options or {}
+    results = []
+    for method in methods:
+        for heuristic in heuristics:
+            results.append(fixed_depth(method, heuristic, depths[method], corpus, repeat,
+                                       options))
+            results.append(fixed_time(method, heuristic, time_limit, corpus, repeat,
+                                      options))
+    return {"benchmark": "search", "python": platform.python_version(),
+            "positions": len(corpus), "repeat": repeat, "options": options,
+            "results": results}
+
+
+def _betacf(a, b, x):
+    """ Continued fraction for the incomplete beta function. """
+    qab, qap, qam = a + b, a + 1., a - 1.
+    c, d = 1., 1. - qab * x / qap
+    d = 1. / (d or 1e-300)
+    h = d
+    for m in range(1, 201):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1. / ((1. + aa * d) or 1e-300)
+        c = (1. + aa / c) or 1e-300
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1. / ((1. + aa * d) or 1e-300)
+        c = (1. + aa / c) or 1e-300
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.) < 1e-12:
+            break
+    return h
+
+
+def _betainc(a, b, x):
+    """ Regularized incomplete beta function I_x(a, b). """
+    if x <= 0.:
+        return 0.
+    if x >= 1.:
+        return 1.
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) +
+                     a * math.log(x) + b * math.log(1. - x))
+    if x < (a + 1.) / (a + b + 2.):
+        return front * _betacf(a, b, x) / a
+    return 1. - front * _betacf(b, a, 1. - x) / b
+
+
+def welch_test(sample_a, sample_b):
+    """Welch's unequal variances t-test.
+
+    Returns
+    ----------
+    (float, float)
+        The t statistic of mean(b) - mean(a) and the two-sided p-value.
+    """
+    n_a, n_b = len(sample_a), len(sample_b)
+    if n_a < 2 or n_b < 2:
+        return 0., 1.
+    mean_a, mean_b = sum(sample_a) / n_a, sum(sample_b) / n_b
+    var_a = sum((x - mean_a) ** 2 for x in sample_a) / (n_a - 1)
+    var_b = sum((x - mean_b) ** 2 for x in sample_b) / (n_b - 1)
+    se2 = var_a / n_a + var_b / n_b
+    if se2 == 0.:
+        # constant samples (e.g., node counts): any difference is certain
+        if mean_a == mean_b:
+            return 0., 1.
+        return math.copysign(float("inf"), mean_b - mean_a), 0.
+    t = (mean_b - mean_a) / math.sqrt(se2)
+    df = se2 ** 2 / ((var_a / n_a) ** 2 / (n_a - 1) + (var_b / n_b) ** 2 / (n_b - 1))
+    return t, _betainc(df / 2., .5, df / (df + t * t))
+
+
+def compare(baseline, report, alpha=0.01, min_effect=0.05):
+    """Compare a report with a baseline.
+
+    Returns
+    ----------
+    list<str>
+        One line per flagged difference: changed node counts, best moves or
+        depths, and statistically significant slowdowns larger than
+        `min_effect`.
+    """
+    def key(result):
+        return result["mode"], result["method"], result["heuristic"]
+
+    previous = dict((key(r), r) for r in baseline["results"])
+    flags = []
+    for result in report["results"]:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        name = "{} {} {}".format(*key(result))
+        if result["mode"] == "fixed-depth":
+            if result["nodes"] != old["nodes"]:
+                flags.append("{}: node counts changed ({} -> {})".format(
+                    name, sum(old["nodes"]), sum(result["nodes"])))
+            if [list(m) for m in result["moves"]] != [list(m) for m in old["moves"]]:
+                flags.append("{}: best moves changed".format(name))
+            # slower means larger times
+            t, p = welch_test(old["times"], result["times"])
+            ratio = mean(result["times"]) / mean(old["times"])
+            if t > 0 and p < alpha and ratio > 1. + min_effect:
+                flags.append("{}: {:.1%} slower (p={:.2g})".format(name, ratio - 1., p))
+        else:
+            # slower means fewer nodes per second
+            t, p = welch_test(old["nps"], result["nps"])
+            ratio = mean(old["nps"]) / mean(result["nps"])
+            if t < 0 and p < alpha and ratio > 1. + min_effect:
+                flags.append("{}: {:.1%} slower (p={:.2g})".format(name, ratio - 1., p))
+            old_depth = mean([mean(d) for d in old["depths"]])
+            new_depth = mean([mean(d) for d in result["depths"]])
+            if new_depth < old_depth - .5:
+                flags.append("{}: mean depth dropped from {:.2f} to {:.2f}".format(
+                    name, old_depth, new_depth))
+    return flags
+
+
+def mean(values):
+    """ Return the arithmetic mean of a non-empty sequence. """
+    return float(sum(values)) / len(values)
+
+
+def summary(report):
+    """ Return a printable table of a report. """
+    lines = ["{:<12}{:<10}{:<10}{:>12}{:>12}{:>10}".format(
+        "mode", "method", "heuristic", "nodes/depth", "ms/nps", "")]
+    for r in report["results"]:
+        if r["mode"] == "fixed-depth":
+            lines.append("{:<12}{:<10}{:<10}{:>12}{:>12.1f}".format(
+                r["mode"], r["method"], r["heuristic"], sum(r["nodes"]), mean(r["times"])))
+        else:
+            lines.append("{:<12}{:<10}{:<10}{:>12.2f}{:>12.0f}".format(
+                r["mode"], r["method"], r["heuristic"],
+                mean([mean(d) for d in r["depths"]]), mean(r["nps"])))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CustomPlayer search.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser("run", help="run the benchmark")
+    run_parser.add_argument("--output", help="write the JSON report to this file")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--method", action="append", choices=METHODS)
+    run_parser.add_argument("--heuristic", action="append", choices=list(SCORE_FUNCTIONS))
+    run_parser.add_argument("--time-limit", type=float, default=TIME_LIMIT)
+    run_parser.add_argument("--positions", type=int, default=len(CORPUS),
+                            help="number of corpus positions to use")
+    for option in SEARCH_OPTIONS:
+        run_parser.add_argument("--" + option.replace("_", "-"), action="store_true",
+                                help="enable the CustomPlayer `{}` option".format(option))
+
+    compare_parser = subparsers.add_parser("compare", help="compare two reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("report")
+    compare_parser.add_argument("--alpha", type=float, default=0.01,
+                                help="significance level of the slowdown test")
+    compare_parser.add_argument("--min-effect", type=float, default=0.05,
+                                help="smallest relative slowdown to flag")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run(args.method or METHODS, args.heuristic or list(SCORE_FUNCTIONS),
+                     DEPTHS, args.time_limit, CORPUS[:args.positions], args.repeat,
+                     dict((o, True) for o in SEARCH_OPTIONS if getattr(args, o)))
+        if args.output:
+            with open(args.output, "w") as stream:
+                json.dump(report, stream, indent=1)
+        print(summary(report))
+        return
+
+    with open(args.baseline) as stream:
+        baseline = json.load(stream)
+    with open(args.report) as stream:
+        report = json.load(stream)
+    flags = compare(baseline, report, args.alpha, args.min_effect)
+    for line in flags:
+        print(line)
+    if flags:
+        sys.exit(1)
+    print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
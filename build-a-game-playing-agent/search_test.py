@@ -0,0 +1,851 @@
+"""
+This file contains test cases for the search extensions of `CustomPlayer`
+and the tools built around them (tracing, time management, solvers).
+"""
+import asyncio
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import threading
+import timeit
+import unittest
+
+import adjudication
+import isolation
+import analysis_server
+import distributed
+import engine_protocol
+import game_agent
+import fingerprint
+import heuristic_bench
+import openings
+import pn_search
+import ratings
+import search_bench
+import search_trace
+import solve_small
+import tournament
+import tuning
+
+from heuristics import TunableScore
+from move_cache import MoveCache
+from result_cache import ResultCache
+from sample_players import RandomPlayer
+from sample_players import improved_score
+from time_manager import TimeManager
+
+
+def make_board(agent, loc1=(3, 3), loc2=(0, 0), w=7, h=7):
+    """Create a board with the agent as player 1 and both players placed."""
+    board = isolation.Board(agent, "null_agent", w, h)
+    board.apply_move(loc1)
+    board.apply_move(loc2)
+    return board
+
+
+class SearchTraceTest(unittest.TestCase):
+
+    def test_ring_buffer_is_bounded(self):
+        """ The trace keeps only the newest `capacity` records """
+        trace = search_trace.SearchTrace(capacity=10, max_ply=None)
+        agent = game_agent.CustomPlayer(3, improved_score, False, "alphabeta",
+                                        trace=trace)
+        agent.time_left = lambda: 1e3
+        board = make_board(agent)
+        trace.begin("alphabeta", 3, board)
+        agent.alphabeta(board, 3)
+
+        self.assertGreater(trace.total, 10)
+        self.assertEqual(len(trace.records()), 10)
+        self.assertEqual(trace.dropped, trace.total - 10)
+
+    def test_dump_and_rebuild(self):
+        """ A dumped trace can be read back into the explored tree """
+        trace = search_trace.SearchTrace(capacity=10000, max_ply=None)
+        agent = game_agent.CustomPlayer(2, improved_score, False, "minimax",
+                                        trace=trace)
+        agent.time_left = lambda: 1e3
+        board = make_board(agent)
+        trace.begin("minimax", 2, board)
+        agent.minimax(board, 2)
+
+        stream = io.StringIO()
+        trace.dump(stream)
+
+        # every line must be strict JSON, without Infinity or NaN constants
+        def reject(constant):
+            raise ValueError(constant)
+        for line in stream.getvalue().splitlines():
+            json.loads(line, parse_constant=reject)
+
+        stream.seek(0)
+        searches = search_trace.read_trace(stream)
+        roots = search_trace.build_tree(searches[1]["nodes"])
+
+        self.assertEqual(searches[1]["header"]["depth"], 2)
+        self.assertEqual(len(roots), 1)
+        self.assertEqual(len(roots[0]["children"]), len(board.get_legal_moves()))
+        self.assertEqual(trace.total, 0)
+
+    def test_infinite_bounds_round_trip(self):
+        """ Infinite alpha-beta bounds are written as strict JSON """
+        trace = search_trace.SearchTrace(capacity=10000, max_ply=None)
+        agent = game_agent.CustomPlayer(2, improved_score, False, "alphabeta",
+                                        trace=trace)
+        agent.time_left = lambda: 1e3
+        board = make_board(agent)
+        trace.begin("alphabeta", 2, board)
+        agent.alphabeta(board, 2)
+
+        stream = io.StringIO()
+        trace.dump(stream)
+        self.assertNotIn("Infinity", stream.getvalue())
+
+        stream.seek(0)
+        root = search_trace.read_trace(stream)[1]["nodes"][-1]
+        self.assertEqual(root["alpha"], float("-inf"))
+        self.assertEqual(root["beta"], float("inf"))
+
+    def test_max_ply_limits_recording(self):
+        """ Nodes beyond max_ply of the root are not recorded """
+        trace = search_trace.SearchTrace(capacity=10000, max_ply=1)
+        agent = game_agent.CustomPlayer(3, improved_score, False, "alphabeta",
+                                        trace=trace)
+        agent.time_left = lambda: 1e3
+        board = make_board(agent)
+        trace.begin("alphabeta", 3, board)
+        agent.alphabeta(board, 3)
+
+        depths = set(item[2] for item in trace.records() if item[0] != "S")
+        self.assertEqual(depths, {2, 3})
+
+
+class FakeTimer(object):
+    """Timer that only advances when told to, so time management decisions
+    can be tested without depending on the speed of the machine.
+    """
+    def __init__(self, time_limit):
+        self.remaining = time_limit
+
+    def time_left(self):
+        return self.remaining
+
+
+class TimeManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.board = make_board("agent")
+        self.legal_moves = self.board.get_legal_moves()
+
+    def test_stops_when_next_iteration_cannot_finish(self):
+        """ The next iteration is predicted from the branching factor """
+        timer = FakeTimer(50.)
+        manager = TimeManager(safety=1.)
+        manager.start(self.board, self.legal_moves, timer.time_left, 8.)
+
+        timer.remaining -= 2.
+        manager.complete(1, 10, 0.)
+        timer.remaining -= 8.
+        manager.complete(2, 40, 0.)
+
+        # 8 ms at a branching factor of 4 needs 32 ms; 32 ms are left
+        self.assertEqual(manager.branching_factor(), 4.)
+        self.assertFalse(manager.should_continue())
+
+        timer.remaining = 41.
+        self.assertTrue(manager.should_continue())
+
+    def test_critical_positions_get_more_time(self):
+        """ Few legal moves allow a longer search """
+        timer = FakeTimer(50.)
+        manager = TimeManager(safety=2., critical_safety=1.)
+        manager.start(self.board, self.legal_moves, timer.time_left, 0.)
+        timer.remaining -= 20.
+        manager.complete(1, 10, 3.)
+        self.assertFalse(manager.critical)
+        self.assertFalse(manager.should_continue())
+
+        manager.start(self.board, self.legal_moves[:1], timer.time_left, 0.)
+        self.assertTrue(manager.critical)
+
+    def test_score_drop_is_compared_once_per_move(self):
+        """ The score of the previous move is compared at the same horizon,
+        and oscillation between consecutive depths is ignored """
+        timer = FakeTimer(50.)
+        manager = TimeManager(score_drop=2.)
+        manager.start(self.board, self.legal_moves, timer.time_left, 0.)
+        for depth, score in [(1, 4.), (2, 0.), (3, 4.), (4, 0.)]:
+            manager.complete(depth, 10, score)
+        self.assertFalse(manager.critical)
+
+        # two plies later the depth 4 result is compared with depth 2
+        board = self.board.forecast_move(self.legal_moves[0])
+        board = board.forecast_move(board.get_legal_moves()[0])
+        manager.start(board, self.legal_moves, timer.time_left, 0.)
+        manager.complete(1, 10, -5.)
+        self.assertFalse(manager.critical)
+        manager.complete(2, 10, -1.)
+        self.assertFalse(manager.critical)
+
+        board = board.forecast_move(board.get_legal_moves()[0])
+        board = board.forecast_move(board.get_legal_moves()[0])
+        manager.start(board, self.legal_moves, timer.time_left, 0.)
+        manager.complete(1, 10, 3.)
+        self.assertFalse(manager.critical)
+        manager.complete(2, 10, -4.)
+        self.assertTrue(manager.critical)
+
+    def test_get_move_returns_before_timeout(self):
+        """ Iterative deepening with the time manager stops before the next
+        iteration would exceed the time limit """
+        timer = FakeTimer(60.)
+
+        def score(game, player):
+            # every evaluation costs 0.05 ms on the fake clock
+            timer.remaining -= 0.05
+            return improved_score(game, player)
+
+        agent = game_agent.CustomPlayer(score_fn=score, method="alphabeta")
+        board = make_board(agent)
+        legal_moves = board.get_legal_moves()
+        move = agent.get_move(board, legal_moves, timer.time_left)
+
+        iterations = agent.time_manager.iterations
+        self.assertIn(move, legal_moves)
+        self.assertGreater(len(iterations), 1)
+        self.assertGreater(timer.time_left(), agent.TIMER_THRESHOLD)
+        self.assertGreaterEqual(
+            agent.time_manager.predict() * agent.time_manager.safety,
+            timer.time_left() - agent.TIMER_THRESHOLD)
+
+
+class RootSearchTest(unittest.TestCase):
+
+    def test_root_moves_reordered_by_previous_iteration(self):
+        """ Alpha-beta searches the previous best move first, followed by
+        the other root moves by decreasing score and subtree size """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method="alphabeta")
+        agent.time_left = lambda: 1e3
+        board = make_board(agent)
+        legal_moves = board.get_legal_moves()
+        agent.root_results = dict((m, (0., i)) for i, m in enumerate(legal_moves))
+        agent.root_results[legal_moves[1]] = (5., 0)
+
+        order = []
+        forecast_move = board.forecast_move
+        def record(move):
+            order.append(move)
+            return forecast_move(move)
+        board.forecast_move = record
+
+        _, move = agent.search_root(board, 2, legal_moves[0])
+
+        self.assertEqual(order, [legal_moves[0], legal_moves[1]] +
+                         legal_moves[:1:-1])
+        self.assertEqual(set(agent.root_results), set(legal_moves))
+        self.assertTrue(all(nodes > 0 for _, nodes in agent.root_results.values()))
+        self.assertIn(move, legal_moves)
+
+    def test_alphabeta_move_has_reported_score(self):
+        """ Root moves that fail low with a tied bound never replace the
+        best move, so its exact value is the reported score """
+        for position in search_bench.CORPUS:
+            for depth in (2, 3, 4):
+                values = {}
+                for method in ("minimax", "alphabeta"):
+                    agent = game_agent.CustomPlayer(depth, improved_score, False, method)
+                    agent.time_left = lambda: 1e3
+                    values[method] = agent.search_root(search_bench.make_board(agent, position),
+                                                       depth)
+                    if method == "minimax":
+                        exact = agent.root_results
+                score, move = values["alphabeta"]
+                self.assertEqual(exact[move][0], score)
+
+    def test_partial_iteration_contributes_move(self):
+        """ After the previous best move is searched to the new depth, a
+        timeout returns the best completed root move """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method="minimax")
+        board = make_board(agent)
+        legal_moves = board.get_legal_moves()
+        agent.time_left = lambda: 1e3
+        scores = [agent.minimax(board.forecast_move(m), 2, False)[0]
+                  for m in legal_moves[:3]]
+
+        # expire the timer once the first three root moves are complete
+        agent.search_root(board, 3, legal_moves[0])
+        limit = 1 + sum(agent.root_results[m][1] for m in legal_moves[:3])
+        agent.nodes = 0
+        agent.time_left = lambda: 1e3 if agent.nodes < limit else -1.
+        with self.assertRaises(game_agent.Timeout):
+            agent.search_root(board, 3, legal_moves[0])
+
+        best = max(range(3), key=lambda i: (scores[i], -i))
+        self.assertEqual(agent.partial, (scores[best], legal_moves[best]))
+
+    def test_partial_iteration_requires_previous_best(self):
+        """ The unfinished iteration is ignored until the previous best move
+        has been searched """
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method="minimax")
+        board = make_board(agent)
+        legal_moves = board.get_legal_moves()
+        agent.time_left = lambda: 1e3 if agent.nodes < 50 else -1.
+        with self.assertRaises(game_agent.Timeout):
+            agent.search_root(board, 3, legal_moves[-1])
+        self.assertIsNone(agent.partial)
+
+
+class PonderTest(unittest.TestCase):
+
+    def make_agent(self):
+        agent = game_agent.CustomPlayer(score_fn=improved_score,
+                                        method="alphabeta", ponder=True)
+        # pondering is disabled on single core machines for fairness; the
+        # tests exercise the mechanism regardless of the number of cores
+        agent.ponderer.enabled = True
+        return agent
+
+    def test_ponder_hit(self):
+        """ Pondering on the predicted reply is reused by get_move """
+        agent = self.make_agent()
+        board = isolation.Board("null_agent", agent)
+        board.apply_move((3, 3))
+        board.apply_move((0, 0))
+
+        # the opponent holds initiative while the agent ponders
+        agent.ponder(board.copy())
+        self.assertTrue(agent.ponderer.wait(timeout=5.))
+        reply = agent.ponderer.predict_reply(board)
+        board.apply_move(reply)
+
+        start = timeit.default_timer()
+        time_left = lambda: 150 - 1000 * (timeit.default_timer() - start)
+        move = agent.get_move(board, board.get_legal_moves(), time_left)
+
+        self.assertIn(move, board.get_legal_moves())
+        self.assertGreater(time_left(), 0)
+        self.assertEqual(agent.ponderer.hits, 1)
+        self.assertGreater(len(agent.time_manager.iterations), 0)
+
+    def test_ponder_miss(self):
+        """ A different reply discards the pondered result """
+        agent = self.make_agent()
+        board = isolation.Board("null_agent", agent)
+        board.apply_move((3, 3))
+        board.apply_move((0, 0))
+
+        agent.ponder(board.copy())
+        self.assertTrue(agent.ponderer.wait(timeout=5.))
+        reply = agent.ponderer.predict_reply(board)
+        other = [m for m in board.get_legal_moves() if m != reply][0]
+        board.apply_move(other)
+
+        start = timeit.default_timer()
+        time_left = lambda: 150 - 1000 * (timeit.default_timer() - start)
+        move = agent.get_move(board, board.get_legal_moves(), time_left)
+
+        self.assertIn(move, board.get_legal_moves())
+        self.assertEqual(agent.ponderer.hits, 0)
+        self.assertEqual(agent.ponderer.misses, 1)
+
+    def test_play_with_pondering(self):
+        """ Board.play stops the background searches when the game ends """
+        agent_1 = self.make_agent()
+        agent_2 = game_agent.CustomPlayer(score_fn=improved_score,
+                                          method="alphabeta")
+        board = isolation.Board(agent_1, agent_2, 5, 5)
+        winner, _, _ = board.play(time_limit=50, ponder=True)
+
+        self.assertIn(winner, (agent_1, agent_2))
+        self.assertIsNone(agent_1.ponderer._process)
+
+
+class SearchBenchTest(unittest.TestCase):
+
+    def test_welch_test(self):
+        """ Welch's test matches the reference p-value """
+        t, p = search_bench.welch_test([1, 2, 3, 4, 5], [6, 7, 8, 9, 10])
+        self.assertAlmostEqual(t, 5.)
+        self.assertAlmostEqual(p, 0.0010528, places=6)
+        self.assertEqual(search_bench.welch_test([3, 3, 3], [4, 4, 4]), (float("inf"), 0.))
+        self.assertEqual(search_bench.welch_test([4, 4, 4], [3, 3, 3]), (float("-inf"), 0.))
+        self.assertEqual(search_bench.welch_test([3, 3, 3], [3, 3, 3]), (0., 1.))
+
+    def test_compare_flags_changes(self):
+        """ Changed node counts and significant slowdowns are flagged """
+        baseline = search_bench.run(["alphabeta"], ["improved"], {"alphabeta": 3},
+                                    20, search_bench.CORPUS[:2], 3)
+        self.assertEqual(search_bench.compare(baseline, baseline), [])
+
+        baseline["results"][0]["times"] = [10., 10.5, 9.5]
+        report = json.loads(json.dumps(baseline))
+        fixed_depth = report["results"][0]
+        fixed_depth["nodes"][0] += 1
+        fixed_depth["times"] = [20., 21., 19.]
+        flags = search_bench.compare(baseline, report)
+        self.assertEqual(len(flags), 2)
+        self.assertIn("node counts changed", flags[0])
+        self.assertIn("slower", flags[1])
+
+
+class HeuristicBenchTest(unittest.TestCase):
+
+    def test_cost_table(self):
+        """ The table reports cost and depth lost for every heuristic """
+        report = heuristic_bench.run(["null", "improved"], num_positions=20, num_matches=0)
+        rows = dict((row["heuristic"], row) for row in report["results"])
+        self.assertEqual(set(rows), {"null", "improved"})
+        self.assertEqual(min(row["depth_lost"] for row in rows.values()), 0.)
+        self.assertGreater(rows["improved"]["latency_us"], 0.)
+        self.assertIsNone(rows["null"]["win_rate"])
+        self.assertAlmostEqual(heuristic_bench.estimate_depth(1., 10., 1.), 3.)
+
+
+class TuningTest(unittest.TestCase):
+
+    def test_default_parameters(self):
+        """ TunableScore evaluates custom_score with its parameters """
+        score, tuned = TunableScore(), TunableScore(overlap=1., near=.5)
+        for game in heuristic_bench.sample_positions(50):
+            for player in (game.active_player, game.inactive_player):
+                self.assertEqual(score(game, player), game_agent.custom_score(game, player))
+                self.assertEqual(tuned(game, player),
+                                 game_agent.custom_score(game, player, overlap=1., near=.5))
+
+    def test_checkpoint_resume(self):
+        """ A tuner resumes from its checkpoint """
+        path = os.path.join(tempfile.mkdtemp(), "spsa.json")
+        tuner = tuning.SPSATuner(matches=1, checkpoint=path)
+        tuner.run(1, processes=1)
+        resumed = tuning.SPSATuner(matches=4, checkpoint=path)
+        self.assertEqual(resumed.iteration, 1)
+        self.assertEqual(resumed.matches, 1)
+        self.assertEqual(resumed.params(), tuner.params())
+        self.assertEqual(resumed.games, 2)
+
+
+class BatchedScore(object):
+    """ `improved_score` with a batched path that counts its calls. """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, game, player):
+        return improved_score(game, player)
+
+    def batch(self, games, player):
+        self.calls += 1
+        return [improved_score(game, player) for game in games]
+
+
+class BatchedLeavesTest(unittest.TestCase):
+
+    def test_alphabeta_batched_leaves(self):
+        """ Alpha-beta with a batched score function finds the same scores and moves """
+        for position in search_bench.CORPUS[:4]:
+            results = []
+            for score_fn in (improved_score, BatchedScore()):
+                agent = game_agent.CustomPlayer(3, score_fn, False, "alphabeta")
+                agent.time_left = lambda: float("inf")
+                results.append(agent.search_root(search_bench.make_board(agent, position), 3))
+            self.assertEqual(results[0], results[1])
+            self.assertGreater(score_fn.calls, 0)
+
+
+class SelectiveSearchTest(unittest.TestCase):
+
+    def search(self, position, **options):
+        agent = game_agent.CustomPlayer(4, improved_score, False, "alphabeta", **options)
+        agent.time_left = lambda: float("inf")
+        score, _ = agent.search_root(search_bench.make_board(agent, position), 4)
+        return score, agent.nodes
+
+    def test_null_window_keeps_scores(self):
+        """ Null-window verification returns the plain alpha-beta score """
+        for position in search_bench.CORPUS[:4]:
+            self.assertEqual(self.search(position, pvs=True)[0], self.search(position)[0])
+
+    def test_reductions_and_extensions(self):
+        """ Reductions search fewer nodes and forced-line extensions more """
+        plain = sum(self.search(p)[1] for p in search_bench.CORPUS)
+        reduced = sum(self.search(p, lmr=True)[1] for p in search_bench.CORPUS)
+        extended = sum(self.search(p, extend_forced=True)[1] for p in search_bench.CORPUS)
+        self.assertLess(reduced, plain)
+        self.assertGreater(extended, plain)
+
+
+class AnalysisServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = analysis_server.AnalysisServer(workers=2)
+        self.address = self.loop.run_until_complete(self.server.start())
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+
+    def test_streams_iterations_and_caches(self):
+        """ Iterations are streamed and a repeated query hits the cache """
+        request = {"id": 7, "engine": "improved", "moves": [[2, 3], [4, 4]],
+                   "depth": 3, "time": 10000}
+        replies = analysis_server.query(self.address, request, timeout=30)
+        self.assertEqual([r["depth"] for r in replies[:-1]], [1, 2, 3])
+        best = replies[-1]
+        self.assertEqual((best["type"], best["id"], best["cached"]), ("bestmove", 7, False))
+        self.assertEqual(best["move"], replies[-2]["move"])
+
+        again = analysis_server.query(self.address, request, timeout=30)
+        self.assertEqual(len(again), 1)
+        self.assertTrue(again[0]["cached"])
+        self.assertEqual(again[0]["move"], best["move"])
+
+    def test_invalid_requests(self):
+        """ Malformed positions and unknown engines are reported as errors """
+        cells = "00" * 49
+        bad_states = [[7, 7, 2, "00", [0, 0], [1, 1], "knight"],
+                      [7, 7, 2, cells, [0, 0], [1, 1], "knight"],
+                      [7, 7, 2, "01" + "00" * 7 + "02" + cells[20:], [0, 0], [9, 1], "knight"],
+                      [0, 7, 0, "", None, None, "knight"],
+                      [7, 7, 0, cells, None, None, "bishop"],
+                      [7, 7]]
+        requests = [{"moves": [[2, 3], [2, 3]]}, {"engine": "nope"},
+                    {"width": -1, "moves": []}]
+        for request in requests + [{"state": state} for state in bad_states]:
+            reply, = analysis_server.query(self.address, request, timeout=30)
+            self.assertEqual(reply["type"], "error")
+        good = [7, 7, 2, "01" + "00" * 7 + "02" + cells[18:], [0, 0], [1, 1], "knight"]
+        replies = analysis_server.query(self.address, {"state": good, "depth": 1}, timeout=30)
+        self.assertEqual(replies[-1]["type"], "bestmove")
+
+
+class EngineProtocolTest(unittest.TestCase):
+
+    def test_position_round_trip(self):
+        """ Positions are encoded losslessly in the position command """
+        board = make_board("p1", w=5, h=6)
+        board.apply_move(board.get_legal_moves()[0])
+        line = engine_protocol.format_position(board.serialize())
+        self.assertEqual(engine_protocol.parse_position(line.split()), board.serialize())
+        empty = isolation.Board("p1", "p2").serialize()
+        line = engine_protocol.format_position(empty)
+        self.assertEqual(engine_protocol.parse_position(line.split()), empty)
+
+    def test_server_session(self):
+        """ The server answers a scripted session with info and bestmove lines """
+        board = make_board("p1")
+        commands = ["isolation", "isready",
+                    engine_protocol.format_position(board.serialize()),
+                    "go movetime 100000", "stop", "quit"]
+        player = game_agent.CustomPlayer(2, improved_score, False, "alphabeta")
+        output = io.StringIO()
+        engine_protocol.EngineServer(player, "test").run(iter(commands), output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[:3], ["id name test", "isolationok", "readyok"])
+        self.assertTrue(lines[3].startswith("info depth 2 score "))
+        move = engine_protocol.parse_move(lines[4].split()[1])
+        self.assertIn(move, board.get_legal_moves())
+
+    def test_engine_player_plays_games(self):
+        """ An engine process is reused across games played with Board.play """
+        engine = engine_protocol.EnginePlayer(engine_protocol.engine_command(
+            "--score", "improved", "--fixed-depth", "--depth", "2"))
+        try:
+            for _ in range(2):
+                opponent = RandomPlayer()
+                game = isolation.Board(engine, opponent)
+                winner, _, termination = game.play(time_limit=2000)
+                # games end when the loser has no legal move to return
+                self.assertEqual(termination, "illegal move")
+                self.assertFalse(game.get_legal_moves())
+                pid = engine._process.pid
+            self.assertEqual(engine.name, "alphabeta_improved")
+            self.assertEqual(engine._process.pid, pid)
+        finally:
+            engine.close()
+
+
+class RatingsTest(unittest.TestCase):
+
+    def test_maximum_likelihood(self):
+        """ Without a prior, 3 wins in 4 games is a 3:1 strength ratio """
+        theta = ratings.fit([[0, 3], [1, 0]], prior=0.)
+        self.assertAlmostEqual(ratings.ELO_SCALE * (theta[0] - theta[1]),
+                               400 * math.log10(3), places=6)
+
+    def test_adaptive_schedule_ranks_agents(self):
+        """ Simulated agents are ranked by strength with confidence intervals """
+        rng = random.Random(0)
+        strength = [-300, -100, 100, 300]
+        agents = [tournament.Agent(i, "a{}".format(i)) for i in range(len(strength))]
+
+        def play(a, b):
+            p = 1. / (1. + 10 ** ((strength[b] - strength[a]) / 400.))
+            wins = sum(rng.random() < p for _ in range(2))
+            return wins, 2 - wins
+
+        table = ratings.run(agents, 150, "adaptive", play=play)
+        self.assertEqual(table.total_games(), 300)
+        result, _ = ratings.ratings(table)
+        self.assertEqual([r.name for r in result], ["a3", "a2", "a1", "a0"])
+        for r in result:
+            self.assertLess(r.low, r.elo)
+            self.assertGreater(r.high, r.elo)
+
+
+class OpeningsTest(unittest.TestCase):
+
+    def test_symmetry_classes(self):
+        """ Openings are reduced to one per class of symmetric openings """
+        classes = openings.canonical_openings(3, 3)
+        # Burnside: 72 ordered pairs, and 6 fixed by each of the 4 reflections
+        self.assertEqual(len(classes), 12)
+        self.assertEqual(len(openings.canonical_openings(4, 3)), 36)
+
+    def test_suite_round_trip_and_matches(self):
+        """ A generated suite is saved, loaded and played by play_match """
+        suite = openings.generate(3, games=6, depth=2, max_score=float("inf"), candidates=10,
+                                  width=5, height=5, processes=1)
+        self.assertEqual(len(suite), 3)
+        self.assertEqual(sorted(suite, key=lambda o: abs(o.score)), suite)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "openings.txt")
+            openings.save(path, suite, width=5, height=5, depth=3)
+            self.assertEqual(openings.load(path), suite)
+
+        starts = []
+
+        class Recorder(RandomPlayer):
+            def get_move(self, game, legal_moves, time_left):
+                if game.move_count == 2:
+                    starts.append((game.get_player_location(game.__player_1__),
+                                   game.get_player_location(game.__player_2__)))
+                return RandomPlayer.get_move(self, game, legal_moves, time_left)
+
+        tournament.play_match(Recorder(), Recorder(), opening=((3, 3), (0, 1)))
+        self.assertEqual(starts, [((3, 3), (0, 1))] * 2)
+
+    def test_scores_separate_openings(self):
+        """ Sampled games score openings apart, repeatably for a seed """
+        pool = openings.canonical_openings(5, 5)[:12]
+        args = (6, 2, openings.NOISE, "improved", 5, 5)
+        scores = [openings.play_opening((moves,) + args + (0,)) for moves in pool]
+        self.assertGreater(len(set(scores)), 2)
+        self.assertTrue(all(-1 <= score <= 1 for score in scores))
+        self.assertEqual(openings.play_opening((pool[0],) + args + (0,)), scores[0])
+
+        suite = [openings.Opening(moves, 0.) for moves in pool[:4]]
+        balanced, unbalanced = openings.compare(suite, *args, seed=2, processes=1)
+        self.assertGreaterEqual(balanced, 0.)
+        self.assertGreaterEqual(unbalanced, 0.)
+
+
+class MoveCacheTest(unittest.TestCase):
+
+    def test_fingerprints(self):
+        """ Fingerprints change with the configuration and score function """
+        def fp(*args, **kwargs):
+            return fingerprint.agent_fingerprint(game_agent.CustomPlayer(*args, **kwargs))
+        self.assertEqual(fp(3, improved_score), fp(3, improved_score))
+        self.assertNotEqual(fp(3, improved_score), fp(4, improved_score))
+        self.assertNotEqual(fp(3, improved_score), fp(3, game_agent.custom_score))
+        self.assertNotEqual(fingerprint.callable_fingerprint(TunableScore()),
+                            fingerprint.callable_fingerprint(TunableScore(overlap=1.)))
+
+    def test_cached_moves_are_shared(self):
+        """ Completed fixed-depth searches are reused by an equal agent """
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = MoveCache(os.path.join(tmp, "moves.sqlite"))
+            agent = game_agent.CustomPlayer(3, improved_score, False, "alphabeta",
+                                            move_cache=cache)
+            board = make_board(agent)
+            move = agent.get_move(board, board.get_legal_moves(), lambda: float("inf"))
+            self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 1, 1))
+
+            # a timed out search is not stored
+            timed_out = make_board(agent, (2, 2), (4, 4))
+            agent.get_move(timed_out, timed_out.get_legal_moves(), lambda: 0.)
+            self.assertEqual(len(cache), 1)
+
+            other = game_agent.CustomPlayer(3, improved_score, False, "alphabeta",
+                                            move_cache=MoveCache(cache.path))
+            other.time_left = None
+            board = make_board(other)
+            self.assertEqual(other.get_move(board, board.get_legal_moves(), None), move)
+            self.assertEqual(other.nodes, 0)
+            cache.close()
+            other.move_cache.close()
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def test_only_changed_pairings_are_replayed(self):
+        """ Cached matches are reused until an agent's parameters change """
+        def agents(depth):
+            return [tournament.Agent(game_agent.CustomPlayer(1, improved_score, False,
+                                                             "alphabeta"), "AB1"),
+                    tournament.Agent(game_agent.CustomPlayer(1, improved_score, False,
+                                                             "minimax"), "MM1"),
+                    tournament.Agent(game_agent.CustomPlayer(depth, improved_score, False,
+                                                             "alphabeta"), "UT")]
+
+        cache = ResultCache(":memory:")
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = tournament.play_round(agents(2), 2, results=cache)
+            self.assertEqual((cache.hits, len(cache)), (0, 8))
+            self.assertEqual(tournament.play_round(agents(2), 2, results=cache), first)
+            self.assertEqual(cache.hits, 8)
+            tournament.play_round(agents(3), 2, results=cache)
+        self.assertEqual((cache.hits, len(cache)), (8, 16))
+
+
+def random_endgame(rng, blanks, w=5, h=5, rules=isolation.KNIGHT):
+    """ Play random moves until `blanks` cells are left or the game ends. """
+    game = isolation.Board("p1", "p2", w, h, rules=rules)
+    while w * h - game.move_count > blanks and game.get_legal_moves():
+        game.apply_move(rng.choice(game.get_legal_moves()))
+    return game
+
+
+class ProofSolverTest(unittest.TestCase):
+
+    def test_agrees_with_exhaustive_solver(self):
+        """ Proofs match a full-width solver, also with a tiny table """
+        rng = random.Random(5)
+        for k in range(30):
+            rules = [isolation.KNIGHT, isolation.KING, isolation.QUEEN][k % 3]
+            game = random_endgame(rng, 12, rules=rules)
+            solver = pn_search.ProofSolver(max_entries=1 << 20 if k % 2 else 20)
+            wins = adjudication.solve(game, 10 ** 7)
+            self.assertEqual(solver.solve(game), wins)
+            move = solver.winning_move(game)
+            if wins:
+                self.assertIs(adjudication.solve(game.forecast_move(move), 10 ** 7), False)
+            else:
+                self.assertIsNone(move)
+            self.assertLessEqual(len(solver.table), solver.max_entries)
+
+    def test_player_plays_proven_win(self):
+        """ A player with a solver plays a winning move of decided positions """
+        rng = random.Random(3)
+        game = random_endgame(rng, 20, 7, 7)
+        while not adjudication.solve(game, 10 ** 7):
+            game = random_endgame(rng, 20, 7, 7)
+        player = game_agent.CustomPlayer(1, improved_score, False, "alphabeta",
+                                         solver=pn_search.ProofSolver())
+        game = isolation.Board.deserialize(game.serialize(), player, "p2") \
+            if game.move_count % 2 == 0 else \
+            isolation.Board.deserialize(game.serialize(), "p1", player)
+        move = player.get_move(game, game.get_legal_moves(), lambda: 1000.)
+        self.assertEqual(player.last_score, float("inf"))
+        self.assertIs(adjudication.solve(game.forecast_move(move), 10 ** 7), False)
+
+    def test_solver_leaves_time_to_search(self):
+        """ A solver that runs out of time still leaves a legal move """
+        rng = random.Random(4)
+        game = random_endgame(rng, 40, 7, 7)
+        clock = [0.]
+
+        def time_left():
+            clock[0] += 0.01
+            return 1000. - clock[0]
+
+        solver = pn_search.ProofSolver(max_nodes=None, max_blanks=49)
+        original = solver._mid
+
+        def slow_mid(*args):
+            # every node costs a millisecond of the clock
+            clock[0] += 1.
+            return original(*args)
+
+        solver._mid = slow_mid
+        player = game_agent.CustomPlayer(score_fn=improved_score, method="alphabeta",
+                                         adaptive_time=False, solver=solver)
+        board = isolation.Board.deserialize(game.serialize(), "p1", player)
+        self.assertIs(board.active_player, player)
+        move = player.get_move(board, board.get_legal_moves(), time_left)
+        self.assertIn(move, board.get_legal_moves())
+        self.assertGreater(solver.nodes, 0)
+        self.assertLess(solver.nodes, 1000)
+        self.assertGreater(player.last_depth, 0)
+
+        # a clock that has already run out still gives a legal move
+        for depth, iterative in ((1, True), (3, False)):
+            player = game_agent.CustomPlayer(depth, improved_score, iterative, "alphabeta",
+                                             solver=pn_search.ProofSolver())
+            board = isolation.Board.deserialize(game.serialize(), "p1", player)
+            move = player.get_move(board, board.get_legal_moves(), lambda: 0.)
+            self.assertIn(move, board.get_legal_moves())
+
+
+class SolveSmallTest(unittest.TestCase):
+
+    def test_resumed_solution_matches_exhaustive_solver(self):
+        """ An interrupted solution resumes from its table and gives an exact oracle """
+        with tempfile.TemporaryDirectory() as directory:
+            table = os.path.join(directory, "small.sqlite")
+            partial, _ = solve_small.solve(4, 4, table=table, processes=1, limit=10)
+            self.assertLess(len(partial), 240)
+            solved = []
+            solution, nodes = solve_small.solve(
+                4, 4, table=table, processes=1, callback=lambda *result: solved.append(result))
+            self.assertEqual((len(solution), len(solved)), (240, 23))
+            path = os.path.join(directory, "oracle.txt")
+            solve_small.save(path, solution, 4, 4, "knight", nodes)
+            oracle = solve_small.Oracle(path)
+
+        for (first, second), wins in sorted(solution.items())[::7]:
+            game = isolation.Board("p1", "p2", 4, 4)
+            game.apply_move(first)
+            self.assertEqual(oracle.probe(game), adjudication.solve(game, 10 ** 7))
+            game.apply_move(second)
+            self.assertEqual(adjudication.solve(game, 10 ** 7), wins)
+            self.assertEqual(oracle.probe(game), wins)
+        game = isolation.Board("p1", "p2", 4, 4)
+        self.assertEqual(oracle.probe(game), adjudication.solve(game, 10 ** 7))
+
+
+class DistributedTest(unittest.TestCase):
+
+    def test_workers_match_serial_runner(self):
+        """ Jobs of dead workers are retried and results match the serial runner """
+        jobs = distributed.make_jobs(["random", "greedy", "mm3_open"], 2, seed=3)
+        coordinator = distributed.Coordinator(jobs)
+        address = coordinator.start()
+        try:
+            # a worker that takes a job and dies without reporting it
+            with socket.create_connection(address) as sock:
+                sock.sendall(b'{"type": "request"}\n')
+                self.assertEqual(json.loads(sock.makefile().readline())["id"], 0)
+            # workers seed the global random number generator, so run them
+            # in processes as they would be deployed
+            workers = [multiprocessing.Process(target=distributed.run_worker,
+                                               args=(address,)) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            results = coordinator.wait(60.)
+            for worker in workers:
+                worker.join(10.)
+        finally:
+            coordinator.close()
+        self.assertEqual(coordinator.queue.retries, 1)
+        self.assertEqual(results, distributed.run_serial(jobs))
+        self.assertEqual(sum(sum(w) for w in distributed.aggregate(jobs, results).values()),
+                         2 * len(jobs))
+
+
+if __name__ == '__main__':
+    unittest.main()
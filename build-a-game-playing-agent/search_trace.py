@@ -0,0 +1,296 @@
+"""
+This file contains a lightweight tracer for the `CustomPlayer` search methods
+and a command line tool to inspect the traces it writes.
+
+A `SearchTrace` keeps a bounded sample of the nodes explored by `minimax` and
+`alphabeta` in a fixed-size ring buffer, so it can stay enabled during real
+tournament games.  Each node is recorded once, when the search returns from
+it, which means the records of a search appear in post-order; the tree can
+be rebuilt offline from the remaining search depth stored in every record.
+
+The trace is written as JSON Lines (one record per line) so that several
+dumps can be appended to the same file and read back as a stream. Scores
+and bounds of +/-infinity are not valid JSON numbers, so they are written as
+the strings "inf" and "-inf" and converted back by `read_trace`:
+
+    python search_trace.py summary trace.jsonl
+    python search_trace.py dot trace.jsonl --search 3 > tree.dot
+    python search_trace.py json trace.jsonl --search 3 > tree.json
+"""
+
+import argparse
+import json
+import sys
+
+from collections import Counter
+from collections import defaultdict
+
+
+# Cutoff reasons recorded for each node
+EXACT = "exact"        # all children searched
+LEAF = "leaf"          # evaluated with the heuristic at the search horizon
+TERMINAL = "terminal"  # the player to move has no legal moves
+BETA = "beta"          # fail-high cutoff on a maximizing layer
+ALPHA = "alpha"        # fail-low cutoff on a minimizing layer
+
+NODE_FIELDS = ["search", "move", "depth", "alpha", "beta", "score", "reason"]
+
+INFINITIES = {float("inf"): "inf", float("-inf"): "-inf"}
+NUMERIC_FIELDS = ["alpha", "beta", "score"]
+
+
+def _encode(value):
+    """ Replace infinite values, which JSON cannot represent, by strings. """
+    if value in INFINITIES:
+        return INFINITIES[value]
+    return value
+
+
+def _decode(value):
+    """ Invert `_encode`. """
+    if value == "inf" or value == "-inf":
+        return float(value)
+    return value
+
+
+class SearchTrace(object):
+    """Bounded ring buffer of search tree records.
+
+    Parameters
+    ----------
+    capacity : int (optional)
+        The maximum number of records kept in memory. Once the buffer is
+        full the oldest records are overwritten.
+
+    max_ply : int (optional)
+        Only nodes within `max_ply` plies of the root of each search are
+        recorded; deeper nodes are skipped with a single comparison. Use
+        None to record the whole tree.
+    """
+
+    def __init__(self, capacity=4096, max_ply=3):
+        self.capacity = capacity
+        self.max_ply = max_ply
+        self.search_id = 0
+        self.min_depth = 0
+        self.total = 0
+        self._buffer = [None] * capacity
+
+    def begin(self, method, depth, game):
+        """Mark the start of a new search from the root of `game`.
+
+        Parameters
+        ----------
+        method : str
+            The name of the search method (e.g., "minimax" or "alphabeta").
+
+        depth : int
+            The depth limit of the search.
+
+        game : `isolation.Board`
+            The game state at the root of the search.
+        """
+        self.search_id += 1
+        if self.max_ply is None:
+            self.min_depth = float("-inf")
+        else:
+            self.min_depth = depth - self.max_ply
+        self._append(("S", self.search_id, method, depth, game.move_count))
+
+    def record(self, game, depth, alpha, beta, score, reason):
+        """Record the result of a search node. The move leading to the node
+        is the location of the player that moved last in `game`.
+
+        Nodes deeper than `max_ply` plies from the root are ignored.
+        """
+        if depth < self.min_depth:
+            return
+        move = game.get_player_location(game.inactive_player)
+        self._append((self.search_id, move, depth, alpha, beta, score, reason))
+
+    def _append(self, item):
+        self._buffer[self.total % self.capacity] = item
+        self.total += 1
+
+    @property
+    def dropped(self):
+        """ The number of records overwritten since the buffer was cleared. """
+        return max(0, self.total - self.capacity)
+
+    def records(self):
+        """ Return the buffered records from oldest to newest. """
+        if self.total <= self.capacity:
+            return self._buffer[:self.total]
+        start = self.total % self.capacity
+        return self._buffer[start:] + self._buffer[:start]
+
+    def clear(self):
+        """ Discard all buffered records. """
+        self.total = 0
+        self._buffer = [None] * self.capacity
+
+    def dump(self, stream, clear=True):
+        """Write the buffered records to an open text stream in JSON Lines
+        format, appending to any records already written.
+
+        Parameters
+        ----------
+        stream : file-like object
+            A text stream opened for writing.
+
+        clear : bool (optional)
+            Flag indicating whether the buffer should be emptied after the
+            records are written.
+
+        Returns
+        ----------
+        int
+            The number of records written.
+        """
+        records = self.records()
+        if self.dropped:
+            stream.write(json.dumps({"dropped": self.dropped}) + "\n")
+        for item in records:
+            if item[0] == "S":
+                _, search, method, depth, move_count = item
+                line = {"search": search, "method": method, "depth": depth,
+                        "move_count": move_count}
+            else:
+                search, move, depth, alpha, beta, score, reason = item
+                line = [search, move, depth, _encode(alpha), _encode(beta),
+                        _encode(score), reason]
+            stream.write(json.dumps(line, allow_nan=False) + "\n")
+        if clear:
+            self.clear()
+        return len(records)
+
+
+def read_trace(stream):
+    """Read a trace written by `SearchTrace.dump`.
+
+    Returns
+    ----------
+    dict
+        A mapping from search id to a dict with the search header (which may
+        be missing if it was overwritten in the ring buffer) and the list of
+        node records in post-order.
+    """
+    searches = defaultdict(lambda: {"header": None, "nodes": []})
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line)
+        if isinstance(item, dict):
+            if "search" in item:
+                searches[item["search"]]["header"] = item
+            continue
+        node = dict(zip(NODE_FIELDS, item))
+        node["move"] = tuple(node["move"]) if node["move"] else None
+        for field in NUMERIC_FIELDS:
+            node[field] = _decode(node[field])
+        searches[node["search"]]["nodes"].append(node)
+    return searches
+
+
+def _encode_node(node):
+    """ Encode a rebuilt tree node and its children for JSON output. """
+    node = dict(node, children=[_encode_node(child) for child in node["children"]])
+    for field in NUMERIC_FIELDS:
+        node[field] = _encode(node[field])
+    return node
+
+
+def build_tree(nodes):
+    """Rebuild the search tree from post-ordered node records.
+
+    Every child is recorded (one ply deeper, with depth one less than its
+    parent) before its parent, so a stack of unclaimed nodes is enough to
+    reattach them.  Nodes whose parents were dropped become extra roots.
+
+    Returns
+    ----------
+    list<dict>
+        The root nodes, each with a "children" list.
+    """
+    stack = []
+    for node in nodes:
+        node = dict(node, children=[])
+        children = []
+        while stack and stack[-1]["depth"] == node["depth"] - 1:
+            children.append(stack.pop())
+        node["children"] = children[::-1]
+        stack.append(node)
+    return stack
+
+
+def summarize(searches):
+    """ Return a printable summary of every search in a trace. """
+    lines = []
+    for search_id in sorted(searches):
+        header = searches[search_id]["header"] or {}
+        nodes = searches[search_id]["nodes"]
+        reasons = Counter(node["reason"] for node in nodes)
+        plies = Counter(node["depth"] for node in nodes)
+        lines.append("search {} method={} depth={} move_count={} nodes={}".format(
+            search_id, header.get("method", "?"), header.get("depth", "?"),
+            header.get("move_count", "?"), len(nodes)))
+        lines.append("    reasons: " + ", ".join(
+            "{}={}".format(k, reasons[k]) for k in sorted(reasons)))
+        lines.append("    nodes by remaining depth: " + ", ".join(
+            "{}={}".format(k, plies[k]) for k in sorted(plies, reverse=True)))
+    return "\n".join(lines)
+
+
+def to_dot(roots, name="search"):
+    """ Render a rebuilt search tree in Graphviz DOT format. """
+    out = ["digraph {} {{".format(name), "  node [shape=box, fontsize=10];"]
+    counter = [0]
+
+    def visit(node):
+        counter[0] += 1
+        node_id = "n{}".format(counter[0])
+        label = "{} d={}\\n[{}, {}] {} {}".format(
+            node["move"], node["depth"], node["alpha"], node["beta"],
+            node["score"], node["reason"])
+        style = ', style=dashed' if node["reason"] in (ALPHA, BETA) else ''
+        out.append('  {} [label="{}"{}];'.format(node_id, label, style))
+        for child in node["children"]:
+            out.append("  {} -> {};".format(node_id, visit(child)))
+        return node_id
+
+    for root in roots:
+        visit(root)
+    out.append("}")
+    return "\n".join(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect CustomPlayer search traces.")
+    parser.add_argument("command", choices=["summary", "dot", "json"])
+    parser.add_argument("trace", help="trace file written by SearchTrace.dump")
+    parser.add_argument("--search", type=int, default=None,
+                        help="search id to render (default: the last one)")
+    args = parser.parse_args(argv)
+
+    with open(args.trace) as stream:
+        searches = read_trace(stream)
+
+    if args.command == "summary":
+        print(summarize(searches))
+        return
+
+    if not searches:
+        sys.exit("trace contains no searches")
+    search_id = args.search if args.search is not None else max(searches)
+    roots = build_tree(searches[search_id]["nodes"])
+
+    if args.command == "dot":
+        print(to_dot(roots, name="search_{}".format(search_id)))
+    else:
+        print(json.dumps([_encode_node(root) for root in roots], indent=1,
+                         allow_nan=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Self-play data generation.
+
+Plays games between configurable agents in parallel worker processes and
+streams one record per position into sharded, gzip-compressed JSON lines
+files:
+
+    {"state": [width, height, move_count, cells, loc1, loc2, rules],
+     "player": 1, "score": 2.5, "result": 1}
+
+`state` is `Board.serialize()` with the cells as a hex string, `player` is
+the seat (1 or 2) of the side to move, `score` is the score of the search
+that chose the next move from the point of view of the side to move (None
+for agents without a search), and `result` is +1 if the side to move won the
+game and -1 otherwise.
+
+Games are split into shards of a fixed number of games. Every shard is
+written by one worker to a temporary file that is renamed when the shard is
+complete, so memory stays bounded by one game and an interrupted run resumes
+by generating only the missing shards (see `generate`). Game i is seeded
+from the run seed and i alone, so the output does not depend on the number
+of workers. Agents that do not use the clock (see `uses_clock`: the
+fixed-depth "mm*" and "ab*" agents, the random and greedy agents) move
+without a deadline, so their records are deterministic; iterative deepening
+agents move under the time limit, and their records depend on the machine
+load.
+
+    python selfplay.py --games 1000 --agents ab5_improved ab5_custom --output data/
+"""
+
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import random
+import timeit
+
+from isolation import Board
+from game_agent import CustomPlayer
+from game_agent import custom_score
+from sample_players import GreedyPlayer
+from sample_players import RandomPlayer
+from sample_players import improved_score
+from sample_players import open_move_score
+
+import tournament
+
+
+AGENTS = {
+    "random": lambda: RandomPlayer(),
+    "greedy": lambda: GreedyPlayer(improved_score),
+    "mm3_open": lambda: CustomPlayer(3, open_move_score, False, "minimax"),
+    "mm3_improved": lambda: CustomPlayer(3, improved_score, False, "minimax"),
+    "ab5_improved": lambda: CustomPlayer(5, improved_score, False, "alphabeta"),
+    "ab5_custom": lambda: CustomPlayer(5, custom_score, False, "alphabeta"),
+    "id_improved": lambda: CustomPlayer(score_fn=improved_score, method="alphabeta"),
+    "id_custom": lambda: CustomPlayer(score_fn=custom_score, method="alphabeta"),
+}
+
+SHARD_NAME = "shard-{:05d}.jsonl.gz"
+MANIFEST = "manifest.json"
+
+
+def encode_state(state):
+    """ Make a `Board.serialize()` encoding JSON-serializable. """
+    state = list(state)
+    state[3] = state[3].hex()
+    return state
+
+
+def decode_state(data):
+    """ Invert `encode_state`. """
+    width, height, move_count, cells, loc1, loc2 = data[:6]
+    return (width, height, move_count, bytes.fromhex(cells),
+            tuple(loc1) if loc1 is not None else None,
+            tuple(loc2) if loc2 is not None else None) + tuple(data[6:])
+
+
+def uses_clock(player):
+    """Return True if the moves of `player` depend on its time limit
+    (iterative deepening agents), rather than on the position alone.
+    """
+    return bool(getattr(player, "iterative", False))
+
+
+def play_game(player_1, player_2, rng, time_limit=tournament.TIME_LIMIT,
+              width=7, height=7):
+    """Play one game from a random opening and return its records.
+
+    The first move of each player is drawn from `rng`, like the random
+    starting positions of `tournament.play_match`. Players that do not use
+    the clock move without a deadline.
+    """
+    limits = dict((player, time_limit if uses_clock(player) else float("inf"))
+                  for player in (player_1, player_2))
+    game = Board(player_1, player_2, width, height)
+    for _ in range(2):
+        game.apply_move(rng.choice(game.get_legal_moves()))
+
+    positions = []
+    while True:
+        player = game.active_player
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            winner = game.inactive_player
+            break
+        start = timeit.default_timer()
+        limit = limits[player]
+        time_left = lambda: limit - 1000 * (timeit.default_timer() - start)
+        move = player.get_move(game.copy(), legal_moves, time_left)
+        if move not in legal_moves:
+            winner = game.inactive_player
+            break
+        positions.append((game.serialize(), 1 if player is player_1 else 2,
+                          getattr(player, "last_score", None)))
+        game.apply_move(move)
+
+    winner_seat = 1 if winner is player_1 else 2
+    records = []
+    for state, seat, score in positions:
+        if score is not None and abs(score) == float("inf"):
+            score = 1e9 if score > 0 else -1e9
+        records.append({"state": encode_state(state), "player": seat, "score": score,
+                        "result": 1 if seat == winner_seat else -1})
+    return records
+
+
+def generate_shard(job):
+    """Play the games of one shard and write them to `path`.
+
+    Returns
+    ----------
+    (int, int, int)
+        The shard index, and the number of games and positions.
+    """
+    index, path, first_game, num_games, agents, seed, time_limit = job
+    positions = 0
+    with gzip.open(path + ".tmp", "wt") as stream:
+        for game in range(first_game, first_game + num_games):
+            rng = random.Random("{}:{}".format(seed, game))
+            # agents alternate seats, and agents with randomness (e.g.,
+            # RandomPlayer) draw from the seeded global generator
+            random.seed("{}:{}:agents".format(seed, game))
+            name_1, name_2 = agents[game % len(agents)], agents[(game + 1) % len(agents)]
+            for record in play_game(AGENTS[name_1](), AGENTS[name_2](), rng, time_limit):
+                stream.write(json.dumps(record) + "\n")
+                positions += 1
+    os.replace(path + ".tmp", path)
+    return index, num_games, positions
+
+
+def _write_manifest(path, manifest):
+    with open(path + ".tmp", "w") as stream:
+        json.dump(manifest, stream, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def generate(output, games, agents, seed=0, games_per_shard=50, processes=None,
+             time_limit=tournament.TIME_LIMIT):
+    """Generate `games` self-play games into shards in the `output`
+    directory, skipping shards that are already complete.
+
+    The settings and the number of games of every complete shard are kept
+    in a manifest file, so a run can be resumed or extended to more games
+    with the same settings.
+
+    Returns
+    ----------
+    dict
+        The number of shards, games and positions generated by this call,
+        and the throughput in positions per second.
+    """
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    settings = {"agents": list(agents), "seed": seed, "shard_games": games_per_shard,
+                "time_limit": time_limit}
+    manifest_path = os.path.join(output, MANIFEST)
+    manifest = dict(settings, shards={})
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as stream:
+            manifest = json.load(stream)
+        if dict((k, manifest[k]) for k in settings) != settings:
+            raise ValueError("{} was generated with different settings".format(output))
+
+    jobs = []
+    for index, first in enumerate(range(0, games, games_per_shard)):
+        path = os.path.join(output, SHARD_NAME.format(index))
+        count = min(games_per_shard, games - first)
+        # a shard is regenerated if it is missing or was the last, partial
+        # shard of a shorter run
+        if manifest["shards"].get(str(index)) != count or not os.path.exists(path):
+            jobs.append((index, path, first, count, agents, seed, time_limit))
+
+    start = timeit.default_timer()
+    num_games = num_positions = 0
+    if processes == 1:
+        results = map(generate_shard, jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(generate_shard, jobs)
+    try:
+        for index, shard_games, shard_positions in results:
+            num_games += shard_games
+            num_positions += shard_positions
+            manifest["shards"][str(index)] = shard_games
+            _write_manifest(manifest_path, manifest)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    elapsed = timeit.default_timer() - start
+    return {"shards": len(jobs), "games": num_games, "positions": num_positions,
+            "seconds": elapsed,
+            "positions_per_second": num_positions / elapsed if elapsed else 0.}
+
+
+def read_records(paths):
+    """ Yield the records of the given shard files (or directories). """
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path)
+                           if f.endswith(".jsonl.gz"))
+        else:
+            files = [path]
+        for name in files:
+            with gzip.open(name, "rt") as stream:
+                for line in stream:
+                    yield json.loads(line)
+
+
+def load_positions(paths):
+    """Yield (game, player, record) for every record in the shards, where
+    `game` is the position with players 1 and 2 and `player` is the side
+    to move.
+    """
+    for record in read_records(paths):
+        game = Board.deserialize(decode_state(record["state"]), 1, 2)
+        yield game, record["player"], record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate self-play training data.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--agents", nargs="+", default=["ab5_improved", "ab5_custom"],
+                        choices=sorted(AGENTS),
+                        help="agents playing in rotation (seats alternate)")
+    parser.add_argument("--output", default="selfplay")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shard-games", type=int, default=50,
+                        help="games per shard file")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--time-limit", type=float, default=tournament.TIME_LIMIT,
+                        help="milliseconds per move")
+    args = parser.parse_args(argv)
+
+    summary = generate(args.output, args.games, args.agents, args.seed, args.shard_games,
+                       args.processes, args.time_limit)
+    print("{shards} shards, {games} games, {positions} positions in {seconds:.1f} s "
+          "({positions_per_second:.0f} positions/s)".format(**summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Strong solution of small Isolation boards.
+
+On 4x4 and 5x5 boards the game can be solved from every pair of first
+moves (the placements of both players): the position after the opening is
+solved with a `pn_search.ProofSolver` without a node budget, which gives
+the winner under perfect play. Openings that are equivalent under the
+symmetries of the board (see `openings.symmetries`; all movement rules are
+symmetric) have the same winner, so one opening of every class is solved,
+in parallel worker processes.
+
+Results are stored in a SQLite table as they arrive, so an interrupted run
+resumes with the openings it had not solved yet. Once every class is
+solved the results are expanded to all openings and written to an oracle
+file, one opening per line with a 1 if the first player wins it:
+
+    # oracle height=5 nodes=1234567 rules=knight width=5
+    0,0 0,1 1
+    0,0 0,2 0
+    ...
+
+`Oracle` reads the file and tells whether the player to move wins any
+position of the board under perfect play: openings are looked up, earlier
+positions follow from them, and later positions are solved on demand.
+
+    python solve_small.py solve --size 5 --table small.sqlite --output oracle-5x5.txt
+    python solve_small.py show oracle-5x5.txt
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+
+from isolation import Board
+from isolation.rules import get_rules
+
+import openings
+import pn_search
+
+
+def _format(moves):
+    return " ".join("{},{}".format(*m) for m in moves)
+
+
+def _parse(text):
+    return tuple(tuple(int(x) for x in field.split(",")) for field in text.split())
+
+
+def solve_opening(job):
+    """Return (opening, True if the first player wins after it, nodes) for
+    a job (opening, width, height, rules name, max_entries).
+    """
+    moves, width, height, rules, max_entries = job
+    game = Board("player1", "player2", width, height, rules=get_rules(rules))
+    for move in moves:
+        game.apply_move(move)
+    solver = pn_search.ProofSolver(max_nodes=None, max_entries=max_entries)
+    return moves, solver.solve(game), solver.nodes
+
+
+class ResultTable(object):
+    """SQLite-backed table of solved openings.
+
+    Parameters
+    ----------
+    path : str
+        The database file; ":memory:" keeps the table in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30.)
+        self._db.execute("CREATE TABLE IF NOT EXISTS results (width INTEGER, height INTEGER, "
+                         "rules TEXT, opening TEXT, wins INTEGER, nodes INTEGER, "
+                         "PRIMARY KEY (width, height, rules, opening))")
+        self._db.commit()
+
+    def get(self, width, height, rules):
+        """ Return {opening: (first player wins, nodes)} of a board. """
+        rows = self._db.execute("SELECT opening, wins, nodes FROM results WHERE width = ? AND "
+                                "height = ? AND rules = ?", (width, height, rules))
+        return dict((_parse(opening), (bool(wins), nodes)) for opening, wins, nodes in rows)
+
+    def put(self, width, height, rules, opening, wins, nodes):
+        self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                         (width, height, rules, _format(opening), int(wins), nodes))
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+def solve(width, height, rules="knight", table=":memory:", processes=None, limit=None,
+          max_entries=1 << 20, callback=None):
+    """Solve one opening of every symmetry class of a board, skipping the
+    classes already in `table`, and return ({opening: True if the first
+    player wins} of every opening of the board, the total number of nodes
+    searched to solve the classes).
+
+    Parameters
+    ----------
+    table : str or `ResultTable` (optional)
+        The table that keeps the results of every class as it is solved.
+
+    limit : int (optional)
+        Solve at most this many new classes (e.g., to spread a solution
+        over several runs); openings of unsolved classes are left out of
+        the result.
+
+    callback : callable (optional)
+        Called with (opening, wins, nodes) after every solved class.
+    """
+    results = table if isinstance(table, ResultTable) else ResultTable(table)
+    try:
+        solved = results.get(width, height, rules)
+        jobs = [(moves, width, height, rules, max_entries)
+                for moves in openings.canonical_openings(width, height) if moves not in solved]
+        if limit is not None:
+            jobs = jobs[:limit]
+        workers = None if processes == 1 else multiprocessing.Pool(processes)
+        try:
+            solutions = map(solve_opening, jobs) if workers is None else \
+                workers.imap_unordered(solve_opening, jobs)
+            for moves, wins, nodes in solutions:
+                results.put(width, height, rules, moves, wins, nodes)
+                solved[moves] = (wins, nodes)
+                if callback is not None:
+                    callback(moves, wins, nodes)
+        finally:
+            if workers is not None:
+                workers.close()
+                workers.join()
+    finally:
+        if results is not table:
+            results.close()
+
+    # every opening has the result of its class
+    maps = openings.symmetries(width, height)
+    cells = [(r, c) for r in range(height) for c in range(width)]
+    solution = {}
+    for first in cells:
+        for second in cells:
+            if first != second:
+                canonical = min(tuple(f(*m) for m in (first, second)) for f in maps)
+                if canonical in solved:
+                    solution[(first, second)] = solved[canonical][0]
+    return solution, sum(nodes for _, nodes in solved.values())
+
+
+def save(path, solution, width, height, rules, nodes):
+    """ Write the oracle file of a complete solution. """
+    with open(path + ".tmp", "w") as stream:
+        stream.write("# oracle height={} nodes={} rules={} width={}\n".format(
+            height, nodes, rules, width))
+        for moves, wins in sorted(solution.items()):
+            stream.write("{} {:d}\n".format(_format(moves), wins))
+    os.replace(path + ".tmp", path)
+
+
+class Oracle(object):
+    """Perfect play on a board solved by `solve`.
+
+    Parameters
+    ----------
+    path : str
+        An oracle file written by `save`.
+    """
+
+    def __init__(self, path):
+        self.wins = {}
+        self.settings = {}
+        with open(path) as stream:
+            for line in stream:
+                if line.startswith("#"):
+                    self.settings = dict(field.split("=") for field in line.split()[2:])
+                elif line.strip():
+                    fields = line.split()
+                    self.wins[_parse(" ".join(fields[:2]))] = fields[2] == "1"
+        self.width = int(self.settings["width"])
+        self.height = int(self.settings["height"])
+        self.rules = self.settings["rules"]
+        self.solver = pn_search.ProofSolver(max_nodes=None)
+
+    def probe(self, game):
+        """ Return True if the player to move in `game` wins under perfect play. """
+        if (game.width, game.height, game.rules.name) != (self.width, self.height, self.rules):
+            raise ValueError("the oracle solves {}x{} boards with {} rules".format(
+                self.width, self.height, self.rules))
+        if game.move_count == 0:
+            # the first player wins with a placement that wins every reply
+            firsts = set(first for first, _ in self.wins)
+            return any(all(wins for (f, _), wins in self.wins.items() if f == first)
+                       for first in firsts)
+        first = game.get_player_location(game.inactive_player if game.move_count % 2
+                                         else game.active_player)
+        if game.move_count == 1:
+            return any(not wins for (f, _), wins in self.wins.items() if f == first)
+        if game.move_count == 2:
+            second = game.get_player_location(game.inactive_player)
+            return self.wins[(first, second)]
+        return self.solver.solve(game)
+
+    def best_move(self, game):
+        """ Return a legal move that keeps a win, or None if the position is lost. """
+        for move in game.get_legal_moves():
+            if not self.probe(game.forecast_move(move)):
+                return move
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Strongly solve small Isolation boards.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    run = subparsers.add_parser("solve")
+    run.add_argument("--size", type=int, default=4)
+    run.add_argument("--rules", default="knight")
+    run.add_argument("--table", default="small.sqlite",
+                     help="database of solved openings, for resuming")
+    run.add_argument("--processes", type=int)
+    run.add_argument("--limit", type=int, help="solve at most this many openings")
+    run.add_argument("--output", help="oracle file (default: oracle-SIZExSIZE-RULES.txt)")
+    show = subparsers.add_parser("show")
+    show.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        oracle = Oracle(args.path)
+        won = sum(oracle.wins.values())
+        print("{}x{} {}: the first player wins {} of {} openings; {} wins the game".format(
+            oracle.width, oracle.height, oracle.rules, won, len(oracle.wins),
+            "the first player" if oracle.probe(Board("player1", "player2", oracle.width,
+                                                     oracle.height,
+                                                     rules=get_rules(oracle.rules)))
+            else "the second player"))
+        return
+
+    total = len(openings.canonical_openings(args.size, args.size))
+
+    def progress(moves, wins, nodes):
+        print("{:<10} {} {:>10} nodes".format(_format(moves), "win " if wins else "loss",
+                                              nodes))
+
+    solution, nodes = solve(args.size, args.size, args.rules, args.table, args.processes,
+                            args.limit, callback=progress)
+    cells = args.size * args.size
+    if len(solution) < cells * (cells - 1):
+        print("{} of {} openings solved; run again to resume".format(
+            len(solution), cells * (cells - 1)))
+        return
+    output = args.output or "oracle-{0}x{0}-{1}.txt".format(args.size, args.rules)
+    save(output, solution, args.size, args.size, args.rules, nodes)
+    print("{} classes ({} openings) solved in {} nodes, written to {}".format(
+        total, len(solution), nodes, output))
+
+
+if __name__ == "__main__":
+    main()
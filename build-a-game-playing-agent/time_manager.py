@@ -0,0 +1,160 @@
+"""
+This file contains the `TimeManager` class used by `CustomPlayer` to decide
+when iterative deepening should stop.
+
+Without a time manager the search keeps deepening until the timer raises
+`Timeout`, and the unfinished iteration is thrown away. The time manager
+predicts the cost of the next iteration from the effective branching factor
+observed in the completed iterations, and stops the search when the next
+iteration cannot finish in the remaining time. Critical positions (few legal
+moves, or a score that dropped since the previous move) are allowed to use a
+larger share of the per-move limit.
+
+The score drop is measured once per move: the deepest result of the previous
+move is compared with the iteration of the current move that reaches the
+same horizon (two plies shallower, since two plies have been played), so the
+odd/even oscillation of the scores between consecutive depths is ignored.
+"""
+
+
+class TimeManager(object):
+    """Per-move time allocation for iterative deepening.
+
+    Parameters
+    ----------
+    safety : float (optional)
+        Multiplier applied to the predicted cost of the next iteration in
+        normal positions. The next iteration is started only if the padded
+        prediction fits in the remaining time.
+
+    critical_safety : float (optional)
+        Multiplier used instead of `safety` in critical positions, so that
+        more of the per-move limit is spent searching them.
+
+    critical_moves : int (optional)
+        Positions where the player has at most this many legal moves are
+        considered critical.
+
+    score_drop : float (optional)
+        Positions where the search score dropped by at least this amount
+        since the previous move (compared at the same search horizon) are
+        considered critical.
+
+    min_branching : float (optional)
+        Lower bound for the estimated effective branching factor.
+    """
+
+    def __init__(self, safety=1.5, critical_safety=0.75, critical_moves=2,
+                 score_drop=2., min_branching=1.5):
+        self.safety = safety
+        self.critical_safety = critical_safety
+        self.critical_moves = critical_moves
+        self.score_drop = score_drop
+        self.min_branching = min_branching
+        self.time_left = None
+        self.threshold = 0.
+        self.critical = False
+        self.iterations = []
+        self.previous = None
+        self.last_move_count = None
+        self._compare_depth = None
+        self._mark = 0.
+
+    def start(self, game, legal_moves, time_left, threshold):
+        """Reset the manager at the start of a move.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            The game state at the root of the search.
+
+        legal_moves : list<(int, int)>
+            The legal moves of the searching player.
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn.
+
+        threshold : float
+            Time (in milliseconds) that must be left on the timer when the
+            search returns.
+        """
+        # keep the deepest result of the previous move of this game as the
+        # reference for the score drop check
+        self.previous = None
+        self._compare_depth = None
+        if self.iterations and game.move_count == self.last_move_count + 2:
+            depth, _, _, score = self.iterations[-1]
+            self.previous = (depth, score)
+            self._compare_depth = depth - 2 if depth > 2 else depth
+        self.last_move_count = game.move_count
+        self.time_left = time_left
+        self.threshold = threshold
+        self.iterations = []
+        self.critical = len(legal_moves) <= self.critical_moves
+        self._mark = time_left()
+
+    def complete(self, depth, nodes, score):
+        """Record a completed iteration of iterative deepening.
+
+        Parameters
+        ----------
+        depth : int
+            The depth of the completed iteration.
+
+        nodes : int
+            The number of nodes searched during the iteration.
+
+        score : float
+            The score of the best move found by the iteration.
+        """
+        now = self.time_left()
+        elapsed, self._mark = self._mark - now, now
+        self.record(depth, elapsed, nodes, score)
+
+    def record(self, depth, elapsed, nodes, score):
+        """Record an iteration that was searched outside of the current
+        turn (e.g., while pondering), so that its cost is used to predict
+        the next iteration.
+
+        Parameters
+        ----------
+        depth : int
+            The depth of the iteration.
+
+        elapsed : float
+            The duration of the iteration in milliseconds.
+
+        nodes : int
+            The number of nodes searched during the iteration.
+
+        score : float
+            The score of the best move found by the iteration.
+        """
+        self.iterations.append((depth, elapsed, nodes, score))
+
+        if depth == self._compare_depth:
+            if self.previous[1] - score >= self.score_drop:
+                self.critical = True
+            self._compare_depth = None
+
+    def branching_factor(self):
+        """ Estimate the effective branching factor from the node counts of
+        the last two completed iterations. """
+        if len(self.iterations) < 2 or not self.iterations[-2][2]:
+            return self.min_branching
+        return max(self.min_branching,
+                   float(self.iterations[-1][2]) / self.iterations[-2][2])
+
+    def predict(self):
+        """ Predict the time (in milliseconds) of the next iteration. """
+        if not self.iterations:
+            return 0.
+        return self.iterations[-1][1] * self.branching_factor()
+
+    def should_continue(self):
+        """ Return True if the next iteration is expected to finish before
+        the time limit of the current move. """
+        remaining = self.time_left() - self.threshold
+        factor = self.critical_safety if self.critical else self.safety
+        return self.predict() * factor < remaining
@@ -19,19 +19,26 @@ initiative in the second match with agentB at (5, 2) as player 1 and agentA at
 (1, 3) as player 2.
 """
 
+import argparse
 import itertools
 import random
 import warnings
 
 from collections import namedtuple
 
+from adjudication import Adjudicator
 from isolation import Board
+from isolation.workers import ProcessPlayer
 from sample_players import RandomPlayer
 from sample_players import null_score
 from sample_players import open_move_score
 from sample_players import improved_score
 from game_agent import CustomPlayer
 from game_agent import custom_score
+from move_cache import MoveCache
+from result_cache import ResultCache
+
+import openings
 
 NUM_MATCHES = 20  # number of matches against each opponent
 TIME_LIMIT = 50  # number of milliseconds before timeout
@@ -57,34 +64,52 @@ same opponents.
 Agent = namedtuple("Agent", ["player", "name"])
 
 
-def play_match(player1, player2):
+def play_match(player1, player2, ponder=False, opening=None, adjudicate=None,
+               time_limit=TIME_LIMIT):
     """
     Play a "fair" set of matches between two agents by playing two games
     between the players, forcing each agent to play from randomly selected
     positions. This should control for differences in outcome resulting from
     advantage due to starting position on the board.
+
+    Agents that support pondering search on their opponent's time when
+    `ponder` is True.
+
+    `opening` is a sequence of moves played at the start of both games
+    instead of the random moves (e.g., an opening of `openings.py`).
+
+    `adjudicate` is passed to `Board.play` to end games once their result
+    is proven (see `adjudication.Adjudicator`).
+
+    `time_limit` is the number of milliseconds per move; float("inf")
+    plays without a deadline.
     """
     num_wins = {player1: 0, player2: 0}
     num_timeouts = {player1: 0, player2: 0}
     num_invalid_moves = {player1: 0, player2: 0}
     games = [Board(player1, player2), Board(player2, player1)]
 
-    # initialize both games with a random move and response
-    for _ in range(2):
-        move = random.choice(games[0].get_legal_moves())
+    # initialize both games with the opening, by default a random move and
+    # response
+    for k in range(2 if opening is None else len(opening)):
+        if opening is None:
+            move = random.choice(games[0].get_legal_moves())
+        else:
+            move = tuple(opening[k])
         games[0].apply_move(move)
         games[1].apply_move(move)
 
     # play both games and tally the results
     for game in games:
-        winner, _, termination = game.play(time_limit=TIME_LIMIT)
+        winner, _, termination = game.play(time_limit=time_limit, ponder=ponder,
+                                           adjudicate=adjudicate)
 
         if player1 == winner:
             num_wins[player1] += 1
 
             if termination == "timeout":
                 num_timeouts[player2] += 1
-            else:
+            elif termination == "illegal move":
                 num_invalid_moves[player2] += 1
 
         elif player2 == winner:
@@ -93,7 +118,7 @@ def play_match(player1, player2):
 
             if termination == "timeout":
                 num_timeouts[player1] += 1
-            else:
+            elif termination == "illegal move":
                 num_invalid_moves[player1] += 1
 
     if sum(num_timeouts.values()) != 0:
@@ -102,10 +127,26 @@ def play_match(player1, player2):
     return num_wins[player1], num_wins[player2]
 
 
-def play_round(agents, num_matches):
+def play_round(agents, num_matches, suite=None, results=None, seed=None,
+               adjudicate=None):
     """
     Play one round (i.e., a single match between each pair of opponents)
+
+    With a `suite` of openings (see `openings.load`), match k of every
+    pairing starts from opening k (modulo the size of the suite) instead of
+    random moves.
+
+    With a `seed`, the random number generator is seeded with `seed` + k
+    before match k of every pairing. With a `results` cache (see
+    `result_cache.ResultCache`) matches are seeded (from 0 by default) and
+    the matches found in the cache are not played again.
+
+    `adjudicate` ends games once their result is proven (see `play_match`).
     """
+    if results is not None and seed is None:
+        seed = 0
+    # adjudicated results are cached apart from the results of played games
+    variant = "adjudicated" if adjudicate is not None else ""
     agent_1 = agents[-1]
     wins = 0.
     total = 0.
@@ -118,11 +159,25 @@ def play_round(agents, num_matches):
         counts = {agent_1.player: 0., agent_2.player: 0.}
         names = [agent_1.name, agent_2.name]
         print("  Match {}: {!s:^11} vs {!s:^11}".format(idx + 1, *names), end=' ')
+        cached = 0
 
         # Each player takes a turn going first
         for p1, p2 in itertools.permutations((agent_1.player, agent_2.player)):
-            for _ in range(num_matches):
-                score_1, score_2 = play_match(p1, p2)
+            for k in range(num_matches):
+                opening = suite[k % len(suite)].moves if suite else None
+                result = None
+                if results is not None:
+                    result = results.get(p1, p2, opening, seed + k, variant)
+                if result is not None:
+                    cached += 1
+                    score_1, score_2 = result
+                else:
+                    if seed is not None:
+                        random.seed(seed + k)
+                    score_1, score_2 = play_match(p1, p2, opening=opening,
+                                                  adjudicate=adjudicate)
+                    if results is not None:
+                        results.put(p1, p2, opening, seed + k, score_1, score_2, variant)
                 counts[p1] += score_1
                 counts[p2] += score_2
                 total += score_1 + score_2
@@ -130,13 +185,33 @@ def play_round(agents, num_matches):
         wins += counts[agent_1.player]
 
         print("\tResult: {} to {}".format(int(counts[agent_1.player]),
-                                          int(counts[agent_2.player])))
+                                          int(counts[agent_2.player])),
+              "({} cached)".format(cached) if cached else "")
 
     return 100. * wins / total
 
 
 def main():
 
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--isolate", action="store_true",
+                        help="run every agent in a persistent worker process "
+                             "that is stopped when it exceeds the time limit")
+    parser.add_argument("--move-cache",
+                        help="SQLite file caching the moves of the fixed-depth agents "
+                             "across games and runs")
+    parser.add_argument("--result-cache",
+                        help="SQLite file caching match results by agent fingerprint; "
+                             "only matches of new or changed agents are played")
+    parser.add_argument("--seed", type=int,
+                        help="seed match k of every pairing with SEED + k")
+    parser.add_argument("--adjudicate", action="store_true",
+                        help="end games as soon as their result is proven")
+    parser.add_argument("--openings",
+                        help="file of openings generated by openings.py; match k "
+                             "of every pairing starts from opening k")
+    args = parser.parse_args()
+
     HEURISTICS = [("Null", null_score),
                   ("Open", open_move_score),
                   ("Improved", improved_score)]
@@ -155,6 +230,11 @@ def main():
                        "AB_" + name) for name, h in HEURISTICS]
     random_agents = [Agent(RandomPlayer(), "Random")]
 
+    if args.move_cache:
+        cache = MoveCache(args.move_cache)
+        for agent in mm_agents + ab_agents:
+            agent.player.move_cache = cache
+
     # improved_agents = [Agent(CustomPlayer(score_fn=h, **CUSTOM_ARGS),
     #                    "IP_" + name) for name, h in HEURISTICS]
 
@@ -168,6 +248,15 @@ def main():
     
     # test_agents = [Agent(CustomPlayer(score_fn=custom_score, **CUSTOM_ARGS), "Student")]
 
+    if args.isolate:
+        wrap = lambda agents: [Agent(ProcessPlayer(a.player), a.name) for a in agents]
+        mm_agents, ab_agents = wrap(mm_agents), wrap(ab_agents)
+        random_agents, test_agents = wrap(random_agents), wrap(test_agents)
+
+    suite = openings.load(args.openings) if args.openings else None
+    results = ResultCache(args.result_cache) if args.result_cache else None
+    adjudicate = Adjudicator() if args.adjudicate else None
+
     print(DESCRIPTION)
     for agentUT in test_agents:
         print("")
@@ -177,12 +266,16 @@ def main():
 
         agents = random_agents + mm_agents + ab_agents + [agentUT]
         # agents = improved_agents + [agentUT]
-        win_ratio = play_round(agents, NUM_MATCHES)
+        win_ratio = play_round(agents, NUM_MATCHES, suite, results, args.seed, adjudicate)
 
         print("\n\nResults:")
         print("----------")
         print("{!s:<15}{:>10.2f}%".format(agentUT.name, win_ratio))
 
+    if args.isolate:
+        for agent in random_agents + mm_agents + ab_agents + test_agents:
+            agent.player.close()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,208 @@
+"""
+Self-play tuning of the `custom_score` constants with SPSA.
+
+Simultaneous perturbation stochastic approximation (SPSA) estimates the
+gradient of the win rate with respect to all parameters of
+`heuristics.TunableScore` from a single pair of perturbed players: every
+iteration draws a random sign vector delta, plays matches between the
+agents using theta + c * delta and theta - c * delta, and moves theta along
+delta by the difference of their scores. Parameters are tuned in units of
+their scale in `PARAMETERS`, so one step has a similar effect on each.
+
+The matches of an iteration are played across a process pool with
+`tournament.play_match`. The perturbations and the random openings of every
+match are seeded from the run seed, the iteration and the match index, so
+they do not depend on the number of workers (the games themselves are
+played under a time limit and vary with the machine load). The state is
+written to a JSON checkpoint after every iteration, and a run started with
+an existing checkpoint resumes from it:
+
+    python tuning.py --iterations 200 --matches 32 --checkpoint spsa.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import timeit
+
+from collections import OrderedDict
+
+from game_agent import CustomPlayer
+from heuristics import TunableScore
+
+import tournament
+
+
+# Parameter name -> (initial value, scale of one SPSA unit, lower, upper); the
+# initial values are the defaults of `custom_score`
+PARAMETERS = OrderedDict([
+    ("overlap", (TunableScore.DEFAULTS["overlap"], 0.5, 0., 5.)),
+    ("distance", (TunableScore.DEFAULTS["distance"], 0.5, 0., 5.)),
+    ("near", (TunableScore.DEFAULTS["near"], 0.1, 0.05, 1.)),
+    ("fill", (TunableScore.DEFAULTS["fill"], 0.1, 0.05, 0.95)),
+])
+
+PLAYER_ARGS = {"method": "alphabeta", "iterative": True}
+
+
+def spsa_gains(k, a=0.5, c=1., A=10, alpha=0.602, gamma=0.101):
+    """ Return the step size a_k and perturbation size c_k of iteration k. """
+    return a / (k + 1 + A) ** alpha, c / (k + 1) ** gamma
+
+
+def to_params(theta):
+    """ Convert normalized coordinates into clipped parameter values. """
+    params = {}
+    for x, (name, (initial, scale, low, high)) in zip(theta, PARAMETERS.items()):
+        params[name] = min(high, max(low, initial + scale * x))
+    return params
+
+
+def play_pair(job):
+    """Play one match (two games) between the plus and minus players.
+
+    Returns
+    ----------
+    (int, int)
+        The number of games won by the plus and the minus player.
+    """
+    params_plus, params_minus, seed = job
+    random.seed(seed)
+    plus = CustomPlayer(score_fn=TunableScore(**params_plus), **PLAYER_ARGS)
+    minus = CustomPlayer(score_fn=TunableScore(**params_minus), **PLAYER_ARGS)
+    return tournament.play_match(plus, minus)
+
+
+class SPSATuner(object):
+    """SPSA optimizer of the `TunableScore` parameters by self-play.
+
+    Parameters
+    ----------
+    matches : int (optional)
+        Matches (of two games each) played per iteration.
+
+    seed : int (optional)
+        Seed of the perturbations and of every match.
+
+    checkpoint : str (optional)
+        Path of the JSON checkpoint. If the file exists the tuner resumes
+        from it.
+    """
+
+    def __init__(self, matches=16, seed=0, checkpoint=None):
+        self.matches = matches
+        self.seed = seed
+        self.checkpoint = checkpoint
+        self.iteration = 0
+        self.theta = [0.] * len(PARAMETERS)
+        self.history = []
+        self.games = 0
+        self.elapsed = 0.
+        if checkpoint and os.path.exists(checkpoint):
+            self.load(checkpoint)
+
+    def params(self):
+        """ Return the current parameter values. """
+        return to_params(self.theta)
+
+    def load(self, path):
+        with open(path) as stream:
+            state = json.load(stream)
+        if list(state["parameters"]) != list(PARAMETERS):
+            raise ValueError("checkpoint parameters do not match: {}".format(path))
+        self.matches, self.seed = state["matches"], state["seed"]
+        self.iteration, self.theta = state["iteration"], state["theta"]
+        self.history, self.games = state["history"], state["games"]
+        self.elapsed = state["elapsed"]
+
+    def save(self, path):
+        state = {"parameters": list(PARAMETERS), "matches": self.matches,
+                 "seed": self.seed, "iteration": self.iteration, "theta": self.theta,
+                 "params": self.params(), "history": self.history,
+                 "games": self.games, "elapsed": self.elapsed}
+        # write to a temporary file first so an interrupted run never leaves
+        # a truncated checkpoint
+        with open(path + ".tmp", "w") as stream:
+            json.dump(state, stream, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def games_per_hour(self):
+        return 3600. * self.games / self.elapsed if self.elapsed else 0.
+
+    def step(self, pool=None):
+        """ Run one SPSA iteration and return the score of the plus player. """
+        k = self.iteration
+        a_k, c_k = spsa_gains(k)
+        rng = random.Random("{}:{}".format(self.seed, k))
+        delta = [rng.choice((-1, 1)) for _ in self.theta]
+        plus = to_params([x + c_k * d for x, d in zip(self.theta, delta)])
+        minus = to_params([x - c_k * d for x, d in zip(self.theta, delta)])
+        jobs = [(plus, minus, "{}:{}:{}".format(self.seed, k, i)) for i in range(self.matches)]
+
+        start = timeit.default_timer()
+        results = (pool.map if pool else map)(play_pair, jobs)
+        wins_plus = wins_minus = 0
+        for score_plus, score_minus in results:
+            wins_plus += score_plus
+            wins_minus += score_minus
+        self.elapsed += timeit.default_timer() - start
+        self.games += 2 * self.matches
+
+        # score difference of the plus player in [-1, 1]
+        diff = float(wins_plus - wins_minus) / (2 * self.matches)
+        self.theta = [x + a_k * diff / (2 * c_k * d) for x, d in zip(self.theta, delta)]
+        self.iteration += 1
+        self.history.append({"iteration": k, "score": (1. + diff) / 2,
+                             "params": self.params()})
+        if self.checkpoint:
+            self.save(self.checkpoint)
+        return (1. + diff) / 2
+
+    def run(self, iterations, processes=None, callback=None):
+        """Run until `iterations` iterations are complete in total, playing
+        the matches on a pool of `processes` workers (None uses every core,
+        1 plays in this process). `callback` is called with the tuner and
+        the score of the plus player after every iteration.
+        """
+        pool = multiprocessing.Pool(processes) if processes != 1 else None
+        try:
+            while self.iteration < iterations:
+                score = self.step(pool)
+                if callback:
+                    callback(self, score)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        return self.params()
+
+
+def report(tuner, score):
+    print("iteration {:>4}  plus score {:.3f}  {:.0f} games/hour  {}".format(
+        tuner.iteration, score, tuner.games_per_hour(),
+        ", ".join("{}={:.3f}".format(*p) for p in sorted(tuner.params().items()))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the custom_score constants with SPSA.")
+    parser.add_argument("--iterations", type=int, default=100,
+                        help="total number of iterations, including resumed ones")
+    parser.add_argument("--matches", type=int, default=16,
+                        help="matches of two games per iteration")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint", default="spsa.json",
+                        help="JSON checkpoint, resumed if it exists")
+    args = parser.parse_args(argv)
+
+    tuner = SPSATuner(args.matches, args.seed, args.checkpoint)
+    params = tuner.run(args.iterations, args.processes, report)
+    print(TunableScore(**params))
+    print("to use them in the default agent, set the defaults of game_agent.custom_score "
+          "to " + ", ".join("{}={!r}".format(name, params[name]) for name in PARAMETERS))
+
+if __name__ == "__main__":
+    main()